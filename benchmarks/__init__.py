@@ -0,0 +1 @@
+"""Offline benchmark harness for the chatbot (see run_benchmark.py)"""
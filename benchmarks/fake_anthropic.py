@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Anthropic Messages API.
+
+Serves POST /v1/messages (plain and streaming) after a configurable delay,
+so the real `anthropic` client, the pooled httpx transport and the agent
+loop in LLMService all run unchanged against it. Point the site at it with
+`anthropic_base_url`.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "Here is a short answer to your question about company HR policies. "
+    "Please reach out to the HR team if you need anything more specific."
+)
+
+
+class FakeAnthropicServer:
+    """
+    Args:
+        latency (float): Seconds before the first byte of every response
+        jitter (float): Extra random delay, uniformly 0..jitter seconds
+        tool_rate (float): Share of first turns that answer with a tool call
+        token_delay (float): Seconds between streamed text chunks
+    """
+
+    def __init__(self, latency=0.3, jitter=0.1, tool_rate=0.0, token_delay=0.01, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tool_rate = tool_rate
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -- responses -----------------------------------------------------------
+
+    def _reply(self, request):
+        """Content blocks and stop reason for one request"""
+        messages = request.get("messages") or []
+        last = messages[-1]["content"] if messages else ""
+        answered_tools = isinstance(last, list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result" for block in last
+        )
+
+        if request.get("tools") and not answered_tools and random.random() < self.tool_rate:
+            tool = request["tools"][0]["name"]
+            return [{"type": "tool_use", "id": f"toolu_{random.getrandbits(48):x}", "name": tool, "input": {}}], "tool_use"
+        return [{"type": "text", "text": ANSWER}], "end_turn"
+
+    @staticmethod
+    def _usage(request, output_text):
+        prompt = json.dumps(request.get("system") or "") + json.dumps(request.get("messages") or [])
+        return {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(output_text) // 4 + 1,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+
+    def _message(self, request, content, stop_reason):
+        text = "".join(block.get("text", "") for block in content)
+        return {
+            "id": f"msg_{random.getrandbits(64):x}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": self._usage(request, text),
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/v1/messages"):
+                    self.send_error(404)
+                    return
+
+                request = json.loads(self.rfile.read(int(self.headers.get("content-length") or 0)) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+
+                content, stop_reason = server._reply(request)
+                message = server._message(request, content, stop_reason)
+                if request.get("stream"):
+                    self._stream(message)
+                else:
+                    self._json(message)
+
+            def _json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _event(self, name, data):
+                chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, message):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+
+                content = message["content"]
+                start = dict(message, content=[], stop_reason=None, usage=dict(message["usage"], output_tokens=1))
+                self._event("message_start", {"type": "message_start", "message": start})
+
+                for index, block in enumerate(content):
+                    if block["type"] == "text":
+                        self._event("content_block_start", {"type": "content_block_start", "index": index,
+                                                            "content_block": {"type": "text", "text": ""}})
+                        words = block["text"].split(" ")
+                        for n in range(0, len(words), 4):
+                            piece = " ".join(words[n:n + 4]) + (" " if n + 4 < len(words) else "")
+                            self._event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                                "delta": {"type": "text_delta", "text": piece}})
+                            time.sleep(server.token_delay)
+                    else:
+                        self._event("content_block_start", {"type": "content_block_start", "index": index,
+                                                            "content_block": dict(block, input={})})
+                        self._event("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                            "delta": {"type": "input_json_delta",
+                                                                      "partial_json": json.dumps(block["input"])}})
+                    self._event("content_block_stop", {"type": "content_block_stop", "index": index})
+
+                self._event("message_delta", {"type": "message_delta",
+                                              "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                                              "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+                self._event("message_stop", {"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,876 @@
+"""
+In-memory stand-in for the parts of Frappe the chatbot uses.
+
+`install()` registers a `frappe` module backed by SQLite (the database) and
+a dict (Redis), so the production modules in itchamps.api can be imported
+and exercised unchanged. It is not a general Frappe emulation: only the
+calls the chatbot makes are implemented, with the same return shapes.
+Lua scripts (register_script) run with the lupa package.
+"""
+import datetime
+import glob
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import string
+import sys
+import threading
+import time
+import traceback
+import types
+
+APP_DOCTYPE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "itchamps", "itchamps", "doctype")
+
+SITE = "bench.localhost"
+
+
+class _dict(dict):
+    """frappe._dict: attribute access, missing keys are None"""
+
+    def __getattr__(self, key):
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def copy(self):
+        return _dict(self)
+
+
+class DoesNotExistError(Exception):
+    pass
+
+
+class ValidationError(Exception):
+    pass
+
+
+class PermissionError(Exception):
+    pass
+
+
+class DuplicateEntryError(Exception):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+_OPERATORS = {"=", "!=", "<", ">", "<=", ">=", "like", "not like", "in", "not in", "between", "is"}
+
+
+def _to_sqlite(query, values):
+    """`%(name)s` placeholders -> `:name`, expanding list/tuple params for `in`"""
+    values = dict(values or {})
+    expanded = {}
+
+    def replace(match):
+        name = match.group(1)
+        value = values.get(name)
+        if isinstance(value, (list, tuple, set)):
+            names = []
+            for index, item in enumerate(value):
+                expanded[f"{name}__{index}"] = item
+                names.append(f":{name}__{index}")
+            return "(" + (", ".join(names) or "null") + ")"
+        expanded[name] = value
+        return f":{name}"
+
+    return _PARAM.sub(replace, query), expanded
+
+
+def _adapt(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return str(value)
+    return value
+
+
+class CallbackManager:
+    """frappe.db.after_commit: callables queued by the calling thread's transaction"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def _functions(self):
+        if not hasattr(self._local, "functions"):
+            self._local.functions = []
+        return self._local.functions
+
+    def add(self, func):
+        self._functions.append(func)
+
+    def run(self):
+        functions, self._local.functions = self._functions, []
+        for func in functions:
+            func()
+
+    def reset(self):
+        self._local.functions = []
+
+
+class FakeDB:
+    """frappe.db over one shared SQLite connection"""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.queries = 0
+        self.after_commit = CallbackManager()
+
+    # -- raw SQL ------------------------------------------------------------
+
+    def sql(self, query, values=None, as_dict=False, pluck=False):
+        query, params = _to_sqlite(query, values)
+        params = {k: _adapt(v) for k, v in params.items()}
+        with self.lock:
+            self.queries += 1
+            cursor = self.conn.execute(query, params)
+            rows = cursor.fetchall()
+
+        if pluck:
+            return [row[0] for row in rows]
+        if as_dict:
+            return [_dict(zip(row.keys(), row)) for row in rows]
+        return [tuple(row) for row in rows]
+
+    def executemany(self, query, rows):
+        with self.lock:
+            self.conn.executemany(query, rows)
+
+    def commit(self):
+        # Statements are autocommitted; only the callbacks are transactional
+        self.after_commit.run()
+
+    def rollback(self):
+        self.after_commit.reset()
+
+    # -- query builder --------------------------------------------------------
+
+    @staticmethod
+    def _condition(field, value, params):
+        column = f"`{field}`"
+        operator = "="
+        if isinstance(value, (list, tuple)) and len(value) == 2 and str(value[0]).lower() in _OPERATORS:
+            operator, value = str(value[0]).lower(), value[1]
+
+        key = f"p{len(params)}"
+        if operator in ("in", "not in"):
+            params[key] = list(value)
+            return f"{column} {operator} %({key})s"
+        if operator == "between":
+            params[key], params[key + "b"] = value
+            return f"{column} between %({key})s and %({key}b)s"
+        if operator == "is":
+            return f"ifnull({column}, '') {'!=' if value == 'set' else '='} ''"
+
+        params[key] = value
+        return f"{column} {operator} %({key})s"
+
+    def _where(self, filters, or_filters, params):
+        clauses = []
+        if isinstance(filters, str):
+            filters = {"name": filters}
+        if isinstance(filters, list):
+            filters = {f[1] if len(f) == 4 else f[0]: f[-2:] for f in filters}
+        for field, value in (filters or {}).items():
+            clauses.append(self._condition(field, value, params))
+
+        if or_filters:
+            if isinstance(or_filters, list):
+                or_filters = {f[0]: f[1:] if len(f) > 2 else f[1] for f in or_filters}
+            ors = [self._condition(field, value, params) for field, value in or_filters.items()]
+            clauses.append("(" + " or ".join(ors) + ")")
+
+        return (" where " + " and ".join(clauses)) if clauses else ""
+
+    def get_all(self, doctype, filters=None, fields=None, or_filters=None, order_by=None,
+            limit=None, limit_page_length=None, start=0, page_length=None, limit_start=None,
+            pluck=None, **kwargs):
+        if pluck:
+            fields = [pluck]
+        fields = fields or ["name"]
+        if isinstance(fields, str):
+            fields = [fields]
+
+        params = {}
+        columns = ", ".join(f if (" " in f or "(" in f or f == "*") else f"`{f}`" for f in fields)
+        query = f"select {columns} from `tab{doctype}`" + self._where(filters, or_filters, params)
+        if order_by:
+            query += f" order by {order_by}"
+
+        page = page_length if page_length is not None else limit_page_length if limit_page_length is not None else limit
+        if page is None and not pluck:
+            page = 20   # frappe.get_all's default page length
+        offset = limit_start if limit_start is not None else start
+        if page:
+            query += f" limit {int(page)} offset {int(offset or 0)}"
+
+        rows = self.sql(query, params, as_dict=True)
+        if pluck:
+            return [row[pluck] for row in rows]
+        return rows
+
+    def get_value(self, doctype, filters=None, fieldname="name", as_dict=False, **kwargs):
+        if filters is None:
+            return None
+        fields = [fieldname] if isinstance(fieldname, str) else list(fieldname)
+        rows = self.get_all(doctype, filters=filters, fields=fields, limit=1)
+        if not rows:
+            return None
+        row = rows[0]
+        if as_dict:
+            return row
+        if isinstance(fieldname, str):
+            return row[fieldname]
+        return tuple(row[f] for f in fields)
+
+    def exists(self, doctype, filters=None):
+        return self.get_value(doctype, filters or {}, "name")
+
+    def set_value(self, doctype, name, fieldname, value=None, update_modified=True):
+        values = fieldname if isinstance(fieldname, dict) else {fieldname: value}
+        assignments = ", ".join(f"`{field}` = %(v_{field})s" for field in values)
+        params = {f"v_{field}": val for field, val in values.items()}
+        params["name"] = name
+        self.sql(f"update `tab{doctype}` set {assignments} where name = %(name)s", params)
+
+    def delete(self, doctype, filters=None):
+        params = {}
+        self.sql(f"delete from `tab{doctype}`" + self._where(filters, None, params), params)
+
+    def insert(self, doctype, values):
+        columns = ", ".join(f"`{field}`" for field in values)
+        placeholders = ", ".join(f"%(v_{field})s" for field in values)
+        try:
+            self.sql(
+                f"insert into `tab{doctype}` ({columns}) values ({placeholders})",
+                {f"v_{field}": val for field, val in values.items()}
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateEntryError(str(e))
+
+    def columns(self, doctype):
+        return [row[1] for row in self.sql(f"pragma table_info(`tab{doctype}`)")]
+
+
+class Document(_dict):
+    """Just enough of frappe.model.document.Document for inserts and reads"""
+
+    def insert(self, ignore_permissions=False, ignore_if_duplicate=False, **kwargs):
+        db = _state.db
+        if not self.get("name"):
+            autoname = _autonames().get(self.doctype, "")
+            if autoname.startswith("field:"):
+                self["name"] = self.get(autoname[len("field:"):])
+            else:
+                self["name"] = generate_hash(length=10)
+
+        columns = set(db.columns(self.doctype))
+        values = {k: _adapt(v) for k, v in self.items() if k in columns}
+        values.setdefault("creation", str(datetime.datetime.now()))
+        if "docstatus" in columns:
+            values.setdefault("docstatus", 0)
+        try:
+            db.insert(self.doctype, values)
+        except DuplicateEntryError:
+            if not ignore_if_duplicate:
+                raise
+        return self
+
+    def save(self, **kwargs):
+        columns = set(_state.db.columns(self.doctype))
+        _state.db.set_value(self.doctype, self.name, {k: _adapt(v) for k, v in self.items() if k in columns and k != "name"})
+        return self
+
+    def as_dict(self):
+        return _dict(self)
+
+
+_autoname_cache = {}
+
+
+def _autonames():
+    """autoname of the app's own DocTypes, read from their JSON definitions"""
+    if not _autoname_cache:
+        for path in glob.glob(os.path.join(APP_DOCTYPE_DIR, "*", "*.json")):
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("doctype") == "DocType":
+                _autoname_cache[meta["name"]] = meta.get("autoname") or ""
+    return _autoname_cache
+
+
+# ---------------------------------------------------------------------------
+# Redis
+# ---------------------------------------------------------------------------
+
+def _bytes(value):
+    if value is None or isinstance(value, bytes):
+        return value
+    if isinstance(value, float):
+        value = repr(value)
+    return str(value).encode()
+
+
+_clock_offset = [0.0]
+
+
+def _clock():
+    """The fake Redis clock (expiries and TIME); see advance_clock"""
+    return time.monotonic() + _clock_offset[0]
+
+
+def advance_clock(seconds):
+    """Move the fake Redis clock forward, e.g. to expire keys or refill rate limit buckets"""
+    _clock_offset[0] += seconds
+
+
+class FakeScript:
+    """
+    Script returned by register_script. Runs the Lua source with lupa, with
+    redis.call bound to the fake's commands; like Redis, nothing else runs
+    while a script does.
+    """
+
+    def __init__(self, core, source):
+        from lupa import LuaRuntime     # only needed by code that registers scripts
+
+        self.core = core
+        self.lua = LuaRuntime(unpack_returned_tuples=False)
+        self.lua.globals().redis = self.lua.table_from({"call": self._call})
+        self.fn = self.lua.eval(f"function(KEYS, ARGV) {source} end")
+
+    def __call__(self, keys=None, args=None, client=None):
+        keys = self.lua.table(*[k.decode() if isinstance(k, bytes) else str(k) for k in keys or ()])
+        args = self.lua.table(*[str(a) for a in args or ()])
+        with self.core._lock:
+            return self._to_python(self.fn(keys, args))
+
+    def _call(self, command, *args):
+        command = command.lower()
+        if command == "time":
+            seconds, micros = self.core.time()
+            return self.lua.table(str(seconds), str(micros))
+        if command == "hset":
+            fields = dict(zip(args[1::2], args[2::2]))
+            return self.core.hset(args[0], mapping=fields)
+        result = getattr(self.core, command)(*args)
+        if isinstance(result, list):
+            # nil bulk replies reach Lua as false
+            return self.lua.table(*[False if v is None else v for v in result])
+        return result
+
+    def _to_python(self, value):
+        """Lua reply conversion: numbers are truncated to integers, tables become lists"""
+        if value is None or value is False:
+            return None
+        if value is True:
+            return 1
+        if isinstance(value, float):
+            return int(value)
+        if isinstance(value, (int, str, bytes)):
+            return value
+        return [self._to_python(v) for v in value.values()]
+
+
+class FakeRedisCore:
+    """Raw Redis commands (no key prefixing), as on a redis-py client or pipeline"""
+
+    def __init__(self, store=None, lock=None):
+        self._store = {} if store is None else store    # key -> [value, expires_at]
+        self._lock = lock or threading.RLock()
+
+    def _get(self, key):
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] < _clock():
+            del self._store[key]
+            return None
+        return entry[0]
+
+    def _put(self, key, value, ex=None):
+        self._store[key] = [value, _clock() + ex if ex else None]
+
+    def get(self, key):
+        with self._lock:
+            return _bytes(self._get(key))
+
+    def set(self, key, value, ex=None, nx=False, **kwargs):
+        with self._lock:
+            if nx and self._get(key) is not None:
+                return None
+            self._put(key, _bytes(value), ex)
+            return True
+
+    def mget(self, keys, *args):
+        keys = list(keys) + list(args)
+        with self._lock:
+            values = [self._get(k) for k in keys]
+        return [None if isinstance(v, (list, set, dict)) else _bytes(v) for v in values]
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._store.pop(k, None) is not None)
+
+    def exists(self, key):
+        with self._lock:
+            return int(self._get(key) is not None)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry:
+                entry[1] = _clock() + seconds
+            return bool(entry)
+
+    def ttl(self, key):
+        with self._lock:
+            entry = self._store.get(key)
+            if not entry:
+                return -2
+            return -1 if entry[1] is None else max(0, int(entry[1] - _clock()))
+
+    def incrby(self, key, amount=1):
+        with self._lock:
+            value = int(self._get(key) or 0) + int(amount)
+            entry = self._store.get(key)
+            self._store[key] = [_bytes(value), entry[1] if entry else None]
+            return value
+
+    def incr(self, key, amount=1):
+        return self.incrby(key, amount)
+
+    def decr(self, key, amount=1):
+        return self.incrby(key, -amount)
+
+    def incrbyfloat(self, key, amount=1.0):
+        with self._lock:
+            value = float(self._get(key) or 0) + float(amount)
+            entry = self._store.get(key)
+            self._store[key] = [_bytes(value), entry[1] if entry else None]
+            return value
+
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._get(key)
+            if items is None:
+                items = []
+                self._put(key, items)
+            items.extend(_bytes(v) for v in values)
+            return len(items)
+
+    def _slice(self, items, start, end):
+        length = len(items)
+        start = start + length if start < 0 else start
+        end = end + length if end < 0 else end
+        return max(start, 0), min(end, length - 1)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self._get(key) or []
+            start, end = self._slice(items, start, end)
+            return list(items[start:end + 1])
+
+    def ltrim(self, key, start, end):
+        with self._lock:
+            items = self._get(key)
+            if items is None:
+                return True
+            start, end = self._slice(items, start, end)
+            items[:] = items[start:end + 1]
+            return True
+
+    def llen(self, key):
+        with self._lock:
+            return len(self._get(key) or [])
+
+    def sadd(self, key, *values):
+        with self._lock:
+            members = self._get(key)
+            if members is None:
+                members = set()
+                self._put(key, members)
+            before = len(members)
+            members.update(_bytes(v) for v in values)
+            return len(members) - before
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._get(key) or ())
+
+    # Hashes and sorted sets are dicts (field -> value, member -> score)
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            fields = self._get(key)
+            if fields is None:
+                fields = {}
+                self._put(key, fields)
+            mapping = dict(mapping or {})
+            if field is not None:
+                mapping[field] = value
+            added = sum(1 for f in mapping if _bytes(f) not in fields)
+            fields.update({_bytes(f): _bytes(v) for f, v in mapping.items()})
+            return added
+
+    def hmget(self, key, *fields):
+        with self._lock:
+            values = self._get(key) or {}
+            return [values.get(_bytes(f)) for f in fields]
+
+    def time(self):
+        now = time.time() + _clock_offset[0]
+        return int(now), int(now % 1 * 1000000)
+
+    def register_script(self, source):
+        return FakeScript(self, source)
+
+    # Sorted sets are dicts of member -> score
+    def zadd(self, key, mapping, **kwargs):
+        with self._lock:
+            members = self._get(key)
+            if members is None:
+                members = {}
+                self._put(key, members)
+            added = sum(1 for m in mapping if _bytes(m) not in members)
+            members.update({_bytes(m): float(score) for m, score in mapping.items()})
+            return added
+
+    def zrem(self, key, *values):
+        with self._lock:
+            members = self._get(key) or {}
+            return sum(1 for v in values if members.pop(_bytes(v), None) is not None)
+
+    def zcount(self, key, low, high):
+        with self._lock:
+            return sum(1 for score in (self._get(key) or {}).values() if float(low) <= score <= float(high))
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._get(key) or {})
+
+    def zremrangebyscore(self, key, low, high):
+        with self._lock:
+            members = self._get(key) or {}
+            stale = [m for m, score in members.items() if float(low) <= score <= float(high)]
+            for member in stale:
+                del members[member]
+            return len(stale)
+
+    def flushall(self):
+        with self._lock:
+            self._store.clear()
+
+
+class FakePipeline(FakeRedisCore):
+    """Queues raw commands and runs them together on execute()"""
+
+    def __init__(self, core):
+        super().__init__(core._store, core._lock)
+        self._queued = []
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name.startswith("_") or name in ("execute", "reset") or not callable(attr):
+            return attr
+
+        def queue(*args, **kwargs):
+            self._queued.append((attr, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._lock:
+            results = [fn(*args, **kwargs) for fn, args, kwargs in self._queued]
+        self._queued = []
+        return results
+
+    def reset(self):
+        self._queued = []
+
+
+class FakeRedis(FakeRedisCore):
+    """frappe.cache(): RedisWrapper's site-prefixed helpers on top of raw commands"""
+
+    def make_key(self, key, user=None, shared=False):
+        if shared:
+            return key
+        return f"{_state.local.site}|{key}".encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    # RedisWrapper helpers prefix keys themselves
+    def get_value(self, key, generator=None, user=None, expires=False, shared=False):
+        with self._lock:
+            value = self._get(self.make_key(key, shared=shared))
+        if value is None and generator:
+            value = generator()
+            self.set_value(key, value, shared=shared)
+        return value
+
+    def set_value(self, key, val, user=None, expires_in_sec=None, shared=False):
+        with self._lock:
+            self._put(self.make_key(key, shared=shared), val, expires_in_sec)
+
+    def delete_value(self, keys, user=None, make_keys=True, shared=False):
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        with self._lock:
+            for key in keys:
+                self._store.pop(self.make_key(key, shared=shared) if make_keys else key, None)
+
+    def rpush(self, key, value):
+        return super().rpush(self.make_key(key), value)
+
+    def lrange(self, key, start, stop):
+        return super().lrange(self.make_key(key), start, stop)
+
+    def ltrim(self, key, start, stop):
+        return super().ltrim(self.make_key(key), start, stop)
+
+    def llen(self, key):
+        return super().llen(self.make_key(key))
+
+    def sadd(self, key, *values):
+        return super().sadd(self.make_key(key), *values)
+
+    def smembers(self, key):
+        return super().smembers(self.make_key(key))
+
+
+# ---------------------------------------------------------------------------
+# frappe module
+# ---------------------------------------------------------------------------
+
+class _State:
+    def __init__(self):
+        self.db = FakeDB()
+        self.cache = FakeRedis()
+        self.local = threading.local()
+        self.conf = _dict()
+        self.error_log = []
+        self.realtime_events = 0
+        self.enqueued = 0
+
+
+_state = _State()
+
+
+def generate_hash(txt=None, length=10):
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def _init_local(site=SITE, user="Administrator"):
+    local = _state.local
+    local.site = site
+    local.sites_path = "."
+    local.session = _dict(user=user, sid=generate_hash())
+    local.flags = _dict()
+    local.conf = _state.conf
+    local.db = _state.db
+
+
+class FrappeModule(types.ModuleType):
+    """Module type so `frappe.local` / `frappe.session` resolve per thread like Frappe's Local proxies"""
+
+    @property
+    def local(self):
+        if not hasattr(_state.local, "site"):
+            _init_local()
+        return _state.local
+
+    @property
+    def session(self):
+        return self.local.session
+
+    @property
+    def flags(self):
+        return self.local.flags
+
+    @property
+    def conf(self):
+        return _state.conf
+
+    @property
+    def db(self):
+        return _state.db
+
+
+def _build_module():
+    frappe = FrappeModule("frappe")
+    frappe.__path__ = []
+    frappe._dict = _dict
+    frappe.DoesNotExistError = DoesNotExistError
+    frappe.ValidationError = ValidationError
+    frappe.PermissionError = PermissionError
+    frappe.DuplicateEntryError = DuplicateEntryError
+    frappe.generate_hash = generate_hash
+    frappe._ = lambda text, *args, **kwargs: text
+
+    def whitelist(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+    frappe.whitelist = whitelist
+
+    def init(site=SITE, sites_path=".", **kwargs):
+        _init_local(site)
+    frappe.init = init
+    frappe.connect = lambda *args, **kwargs: None
+
+    def destroy():
+        _state.local.__dict__.clear()
+    frappe.destroy = destroy
+
+    def set_user(user):
+        frappe.local.session = _dict(user=user, sid=generate_hash())
+    frappe.set_user = set_user
+
+    frappe.cache = lambda: _state.cache
+    frappe.get_all = lambda doctype, *args, **kwargs: _state.db.get_all(doctype, *args, **kwargs)
+    frappe.get_list = frappe.get_all
+
+    def get_doc(doctype, name=None, **kwargs):
+        if isinstance(doctype, dict):
+            return Document(doctype)
+        row = _state.db.get_value(doctype, name, "*", as_dict=True) if name else None
+        if not row:
+            raise DoesNotExistError(f"{doctype} {name} not found")
+        return Document(row, doctype=doctype)
+    frappe.get_doc = get_doc
+    frappe.get_cached_doc = get_doc
+
+    def get_roles(user=None):
+        user = user or frappe.session.user
+        roles = _state.db.get_all("Has Role", filters={"parent": user}, pluck="role")
+        return roles + ["All", "Guest"] if user != "Guest" else ["Guest"]
+    frappe.get_roles = get_roles
+
+    def only_for(roles, message=False):
+        roles = [roles] if isinstance(roles, str) else roles
+        if "Administrator" != frappe.session.user and not set(roles) & set(get_roles()):
+            raise PermissionError("Not permitted")
+    frappe.only_for = only_for
+
+    def throw(msg, exc=ValidationError, title=None, **kwargs):
+        raise exc(msg)
+    frappe.throw = throw
+
+    def get_traceback(with_context=False):
+        if sys.exc_info()[0] is None:
+            return ""
+        return traceback.format_exc()
+    frappe.get_traceback = get_traceback
+
+    def log_error(message=None, title=None, **kwargs):
+        _state.error_log.append((title, message))
+    frappe.log_error = log_error
+
+    def logger(module=None, **kwargs):
+        log = logging.getLogger(f"bench.{module}")
+        if not log.handlers:
+            log.addHandler(logging.NullHandler())
+            log.propagate = False
+        return log
+    frappe.logger = logger
+
+    def publish_realtime(event=None, message=None, user=None, **kwargs):
+        _state.realtime_events += 1
+    frappe.publish_realtime = publish_realtime
+
+    def enqueue(method, queue="default", timeout=None, **kwargs):
+        """Runs the job inline; there is no worker in the harness"""
+        _state.enqueued += 1
+        if isinstance(method, str):
+            module_name, _, fn_name = method.rpartition(".")
+            method = getattr(__import__(module_name, fromlist=[fn_name]), fn_name)
+        kwargs.pop("job_id", None)
+        kwargs.pop("enqueue_after_commit", None)
+        return method(**kwargs)
+    frappe.enqueue = enqueue
+
+    frappe.as_json = lambda obj, indent=1, **kwargs: json.dumps(obj, indent=indent, default=str)
+    frappe.parse_json = lambda value: json.loads(value) if isinstance(value, str) else value
+    frappe.get_hooks = lambda *args, **kwargs: []
+
+    return frappe
+
+
+def _build_utils(frappe):
+    utils = types.ModuleType("frappe.utils")
+    utils.__path__ = []
+
+    def getdate(value=None):
+        if value is None:
+            return datetime.date.today()
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        return datetime.date.fromisoformat(str(value)[:10])
+
+    utils.getdate = getdate
+    utils.today = lambda: str(datetime.date.today())
+    utils.nowdate = utils.today
+    utils.now_datetime = datetime.datetime.now
+    utils.now = lambda: str(datetime.datetime.now())
+    utils.get_datetime = lambda value=None: datetime.datetime.fromisoformat(str(value)) if value else datetime.datetime.now()
+    utils.add_days = lambda date, days: getdate(date) + datetime.timedelta(days=days)
+    utils.date_diff = lambda a, b: (getdate(a) - getdate(b)).days
+    utils.cint = lambda value, default=0: int(float(value)) if value not in (None, "") else default
+    utils.flt = lambda value, precision=None: round(float(value or 0), precision) if precision is not None else float(value or 0)
+    utils.cstr = lambda value: "" if value is None else str(value)
+    utils.formatdate = lambda value=None, format_string=None: getdate(value).strftime("%d-%m-%Y")
+
+    background_jobs = types.ModuleType("frappe.utils.background_jobs")
+    background_jobs.get_queue = lambda queue, **kwargs: types.SimpleNamespace(count=0, name=queue)
+    utils.background_jobs = background_jobs
+
+    frappe.utils = utils
+    return utils, background_jobs
+
+
+def install(conf=None):
+    """
+    Register the fake as `frappe` (and `frappe.utils`) in sys.modules.
+
+    Returns:
+        FrappeModule
+    """
+    if isinstance(sys.modules.get("frappe"), FrappeModule):
+        frappe = sys.modules["frappe"]
+    else:
+        frappe = _build_module()
+        utils, background_jobs = _build_utils(frappe)
+        sys.modules["frappe"] = frappe
+        sys.modules["frappe.utils"] = utils
+        sys.modules["frappe.utils.background_jobs"] = background_jobs
+
+    _state.conf.update(conf or {})
+    return frappe
+
+
+def get_db():
+    return _state.db
+
+
+def get_cache():
+    return _state.cache
+
+
+def get_error_log():
+    return _state.error_log
+
+
+def reset_local(user="Administrator"):
+    """Fresh per-request state for the calling thread, as Frappe does per HTTP request"""
+    _state.local.__dict__.clear()
+    _init_local(SITE, user)
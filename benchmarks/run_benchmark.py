@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark / load test for the chatbot.
+
+Imports the production modules (itchamps.api.chatbot and everything behind
+it) against the in-memory Frappe stand-in, seeds synthetic HR data and
+answers LLM questions from a local fake Anthropic server. Reports
+throughput and latency per intent, and can fail on regressions against a
+saved baseline.
+
+    python -m benchmarks.run_benchmark --employees 10000 --requests 2000 --concurrency 8
+    python -m benchmarks.run_benchmark --save baseline.json
+    python -m benchmarks.run_benchmark --baseline baseline.json --threshold 0.2
+
+Needs the app's Python dependencies (anthropic, httpx) but no bench, MariaDB
+or Redis. The fake database is one SQLite connection behind a lock, so
+absolute numbers under concurrency are pessimistic; compare runs with each
+other, not with production.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_frappe, seed  # noqa: E402
+from benchmarks.fake_anthropic import FakeAnthropicServer  # noqa: E402
+
+# Messages per intent; "llm" falls through to Claude
+MESSAGES = {
+    "leave_balance": ["Show my leave balance", "How many leaves do I have?", "check leave for sick leave", "how much PTO do I have left"],
+    "leave_apply": ["apply casual leave tomorrow", "I want to take sick leave from 3rd to 5th next month"],
+    "leave_history": ["Show my recent leaves", "leave history please"],
+    "manager_info": ["Who is my manager?", "who is my skip level manager", "who is my supervisor"],
+    "team_info": ["Who are my direct reports?", "what is my team size"],
+    "my_info": ["Show my profile", "my details"],
+    "employee_search": ["Find employee nusrath", "who works in marketing", "search for sarah williams"],
+    "greeting": ["hi", "Hello there!"],
+    "help": ["what can you do?", "help"],
+    "llm": ["What is the remote work policy?", "How do I claim travel expenses?", "Explain the maternity leave policy"],
+}
+
+# Intents that need a privileged (Manager) user
+PRIVILEGED_INTENTS = ("employee_search", "team_info")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_workload(args, rng):
+    """[(intent, message, user), ...] following the intent mix"""
+    intents = [i for i in MESSAGES if not args.intents or i in args.intents]
+    weights = [args.llm_weight if intent == "llm" else 1.0 for intent in intents]
+    managers = list(range(0, args.employees, seed.FANOUT))
+
+    workload = []
+    for _ in range(args.requests):
+        intent = rng.choices(intents, weights)[0]
+        index = rng.choice(managers) if intent in PRIVILEGED_INTENTS else rng.randrange(args.employees)
+        workload.append((intent, rng.choice(MESSAGES[intent]), seed.user_for(index)))
+    return workload
+
+
+def run_one(chatbot, after_request, intent, message, user, cold):
+    """One chat turn as one HTTP request would run it"""
+    if cold:
+        fake_frappe.get_cache().flushall()
+    fake_frappe.reset_local(user)
+
+    started = time.perf_counter()
+    response = chatbot.get_response(message)
+    elapsed = time.perf_counter() - started
+
+    # Frappe commits at the end of a POST request, which runs after_commit callbacks
+    fake_frappe.get_db().commit()
+
+    for hook in after_request:
+        hook()
+
+    text = (response or {}).get("message") or ""
+    return intent, elapsed, text.startswith("Error:")
+
+
+def report(results, wall_time):
+    by_intent = {}
+    for intent, elapsed, failed in results:
+        entry = by_intent.setdefault(intent, {"latencies": [], "errors": 0})
+        entry["latencies"].append(elapsed)
+        entry["errors"] += int(failed)
+
+    summary = {}
+    for intent, entry in sorted(by_intent.items()):
+        latencies = sorted(entry["latencies"])
+        summary[intent] = {
+            "count": len(latencies),
+            "errors": entry["errors"],
+            "throughput_rps": round(len(latencies) / wall_time, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+    return summary
+
+
+def print_summary(summary, wall_time, total, extra):
+    header = f"{'intent':<16} {'count':>6} {'err':>4} {'req/s':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for intent, s in summary.items():
+        print(f"{intent:<16} {s['count']:>6} {s['errors']:>4} {s['throughput_rps']:>8} {s['mean_ms']:>9} "
+              f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['max_ms']:>9}")
+    print("-" * len(header))
+    print(f"{total} requests in {wall_time:.2f}s = {total / wall_time:.1f} req/s (latencies in ms)")
+    for key, value in extra.items():
+        print(f"{key}: {value}")
+
+
+def compare(summary, baseline, threshold):
+    """Intents whose p95 got more than `threshold` (fraction) slower than the baseline"""
+    regressions = []
+    for intent, current in summary.items():
+        before = baseline.get("intents", {}).get(intent)
+        if before and before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append((intent, before["p95_ms"], current["p95_ms"]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1000, help="synthetic employees (1k-100k)")
+    parser.add_argument("--requests", type=int, default=500, help="measured chat turns")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured turns first (index builds, cache fill)")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel chat turns")
+    parser.add_argument("--intents", nargs="*", choices=list(MESSAGES), help="only these intents")
+    parser.add_argument("--llm-weight", type=float, default=1.0, help="relative share of LLM questions")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake Anthropic delay (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="extra random delay (s)")
+    parser.add_argument("--tool-rate", type=float, default=0.2, help="share of LLM turns that call a tool first")
+    parser.add_argument("--cold", action="store_true", help="flush Redis and disable the LLM cache for every turn")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="write results as JSON (use as a later --baseline)")
+    parser.add_argument("--baseline", help="compare p95 per intent against a saved run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 slowdown vs baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    server = FakeAnthropicServer(latency=args.llm_latency, jitter=args.llm_jitter, tool_rate=args.tool_rate).start()
+    fake_frappe.install({
+        "anthropic_api_key": "sk-bench",
+        "anthropic_base_url": server.base_url,
+        "chatbot_llm_cache_enabled": 0 if args.cold else 1,
+        "chatbot_metrics_sample_rate": 0,
+        "chatbot_log_level": "warning",
+        # The harness measures the pipeline, not the limiter
+        "chatbot_rate_limit_enabled": 0,
+    })
+
+    started = time.perf_counter()
+    counts = seed.seed(fake_frappe.get_db(), args.employees, args.seed)
+    print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+    # Production code, imported only once `frappe` is the stand-in
+    from itchamps.api import chat_logger, chatbot, metrics
+    after_request = [metrics.flush_trace, chat_logger.flush]
+
+    workload = build_workload(args, rng)
+    warmup = build_workload(argparse.Namespace(**dict(vars(args), requests=args.warmup)), rng)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda w: run_one(chatbot, after_request, *w, args.cold), warmup))
+
+        db_queries = fake_frappe.get_db().queries
+        llm_requests = server.requests
+        started = time.perf_counter()
+        results = list(pool.map(lambda w: run_one(chatbot, after_request, *w, args.cold), workload))
+        wall_time = time.perf_counter() - started
+
+    server.stop()
+
+    summary = report(results, wall_time)
+    extra = {
+        "db queries / turn": round((fake_frappe.get_db().queries - db_queries) / len(results), 2),
+        "LLM requests": server.requests - llm_requests,
+        "Error Log rows": len(fake_frappe.get_error_log()),
+    }
+    print_summary(summary, wall_time, len(results), extra)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "intents": summary, **extra}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.threshold)
+        for intent, before, after in regressions:
+            print(f"REGRESSION {intent}: p95 {before} ms -> {after} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Schema and synthetic data for the benchmark harness.
+
+Only the columns the chatbot reads are created. Data is deterministic for a
+given (employees, seed) so runs are comparable.
+"""
+import datetime
+import random
+
+SCHEMA = {
+    "User": "name text primary key, email text, first_name text, last_name text, full_name text, "
+            "user_image text, enabled int default 1, creation text",
+    "Has Role": "name text primary key, parent text, role text",
+    "Department": "name text primary key, department_name text",
+    "Leave Type": "name text primary key, leave_type_name text",
+    "Holiday List": "name text primary key, from_date text, to_date text",
+    "Holiday": "name text primary key, parent text, holiday_date text, description text",
+    "Employee": "name text primary key, employee_name text, first_name text, user_id text, prefered_email text, "
+                "company_email text, personal_email text, department text, designation text, reports_to text, "
+                "status text, date_of_joining text, company text, holiday_list text, creation text, modified text",
+    "Leave Allocation": "name text primary key, employee text, leave_type text, from_date text, to_date text, "
+                        "total_leaves_allocated real, new_leaves_allocated real, docstatus int, creation text",
+    "Leave Application": "name text primary key, employee text, employee_name text, leave_type text, from_date text, "
+                         "to_date text, total_leave_days real, half_day int default 0, description text, status text, "
+                         "docstatus int, posting_date text, leave_approver text, company text, creation text",
+    "Leave Ledger Entry": "name text primary key, employee text, leave_type text, transaction_type text, "
+                          "transaction_name text, leaves real, from_date text, to_date text, docstatus int, "
+                          "is_expired int default 0, creation text",
+    "Leave Balance Summary": "name text primary key, leave_allocation text unique, employee text, leave_type text, "
+                             "from_date text, to_date text, allocated real, used real, balance real, "
+                             "last_reconciled text, creation text",
+    "Chatbot Employee Link": "name text primary key, user text unique, employee text, matched_on text, creation text",
+}
+
+INDEXES = [
+    ("Has Role", "parent"),
+    ("Employee", "user_id"), ("Employee", "prefered_email"), ("Employee", "company_email"),
+    ("Employee", "personal_email"), ("Employee", "reports_to"), ("Employee", "status"),
+    ("Leave Allocation", "employee"), ("Leave Application", "employee"),
+    ("Leave Ledger Entry", "employee"), ("Holiday", "parent"), ("Chatbot Employee Link", "employee"),
+]
+
+FIRST_NAMES = "aarav aisha arjun carlos chen diya fatima hana ivan james jane john kavya lena liam maria " \
+              "mei nusrath olga omar priya rahul ravi sara sarah sofia tariq wei yusuf zara".split()
+LAST_NAMES = "brown chen das garcia gupta ivanova khan kim lee martin nguyen patel rao reddy " \
+             "sharma singh smith tan williams".split()
+DEPARTMENTS = ["Marketing", "Sales", "Human Resources", "Information Technology", "Finance", "Operations", "Production"]
+DESIGNATIONS = ["Engineer", "Senior Engineer", "Analyst", "Manager", "Director", "Associate", "Intern"]
+LEAVE_TYPES = {"Casual Leave": 12, "Sick Leave": 10, "Privilege Leave": 18}
+
+COMPANY = "Bench Co"
+HOLIDAY_LIST = "Bench Holidays"
+FANOUT = 8      # direct reports per manager
+
+
+def create_schema(db):
+    for doctype, columns in SCHEMA.items():
+        db.sql(f"create table if not exists `tab{doctype}` ({columns})")
+    for doctype, column in INDEXES:
+        index = f"idx_{doctype}_{column}".replace(" ", "_")
+        db.sql(f"create index if not exists `{index}` on `tab{doctype}` (`{column}`)")
+
+
+def user_for(index):
+    return f"emp{index}@bench.example.com"
+
+
+def seed(db, employees=1000, seed_value=42):
+    """
+    Create `employees` active employees in a reporting tree, one User each,
+    one allocation per leave type for the current year, a few applications,
+    their ledger entries and the materialised Leave Balance Summary.
+
+    Returns:
+        dict: row counts per DocType
+    """
+    rng = random.Random(seed_value)
+    create_schema(db)
+
+    today = datetime.date.today()
+    year_start = datetime.date(today.year, 1, 1)
+    year_end = datetime.date(today.year, 12, 31)
+    now = str(datetime.datetime.now())
+
+    db.executemany("insert into `tabDepartment` values (?, ?)", [(d, d) for d in DEPARTMENTS])
+    db.executemany("insert into `tabLeave Type` values (?, ?)", [(t, t) for t in LEAVE_TYPES])
+    db.executemany("insert into `tabHoliday List` values (?, ?, ?)", [(HOLIDAY_LIST, str(year_start), str(year_end))])
+    holidays = [datetime.date(today.year, 1, 1), datetime.date(today.year, 5, 1), datetime.date(today.year, 12, 25)]
+    db.executemany(
+        "insert into `tabHoliday` values (?, ?, ?, ?)",
+        [(f"HOL-{i}", HOLIDAY_LIST, str(d), "Holiday") for i, d in enumerate(holidays)]
+    )
+
+    users, roles, employees_rows = [], [], []
+    allocations, applications, ledger = [], [], []
+
+    for i in range(employees):
+        first = rng.choice(FIRST_NAMES).title()
+        last = rng.choice(LAST_NAMES).title()
+        user = user_for(i)
+        employee = f"HR-EMP-{i:06d}"
+        manager = f"HR-EMP-{(i - 1) // FANOUT:06d}" if i else None
+
+        users.append((user, user, first, last, f"{first} {last}", None, 1, now))
+        roles.append((f"{user}-Employee", user, "Employee"))
+        if i % FANOUT == 0:
+            roles.append((f"{user}-Manager", user, "Manager"))
+        if i % 97 == 0:
+            roles.append((f"{user}-HR", user, "HR Manager"))
+
+        employees_rows.append((
+            employee, f"{first} {last}", first, user, None, user, None,
+            rng.choice(DEPARTMENTS), rng.choice(DESIGNATIONS), manager, "Active",
+            str(year_start - datetime.timedelta(days=rng.randint(30, 3000))), COMPANY, HOLIDAY_LIST, now, now
+        ))
+
+        for leave_type, days in LEAVE_TYPES.items():
+            allocation = f"{employee}-{leave_type[:2].upper()}"
+            allocations.append((allocation, employee, leave_type, str(year_start), str(year_end), days, days, 1, now))
+            ledger.append((f"LLE-{allocation}", employee, leave_type, "Leave Allocation", allocation,
+                           days, str(year_start), str(year_end), 1, 0, now))
+
+        for n in range(rng.randint(0, 3)):
+            leave_type = rng.choice(list(LEAVE_TYPES))
+            start = year_start + datetime.timedelta(days=rng.randint(0, 330))
+            length = rng.randint(1, 3)
+            status = rng.choice(["Approved", "Approved", "Open"])
+            docstatus = 1 if status == "Approved" else 0
+            application = f"{employee}-LA-{n}"
+            applications.append((
+                application, employee, f"{first} {last}", leave_type, str(start),
+                str(start + datetime.timedelta(days=length - 1)), length, 0, None, status, docstatus,
+                str(start - datetime.timedelta(days=7)), None, COMPANY, now
+            ))
+            if docstatus:
+                ledger.append((f"LLE-{application}", employee, leave_type, "Leave Application", application,
+                               -length, str(start), str(start + datetime.timedelta(days=length - 1)), 1, 0, now))
+
+    db.executemany("insert into `tabUser` values (?, ?, ?, ?, ?, ?, ?, ?)", users)
+    db.executemany("insert into `tabHas Role` values (?, ?, ?)", roles)
+    db.executemany("insert into `tabEmployee` values (" + ", ".join("?" * 16) + ")", employees_rows)
+    db.executemany("insert into `tabLeave Allocation` values (?, ?, ?, ?, ?, ?, ?, ?, ?)", allocations)
+    db.executemany("insert into `tabLeave Application` values (" + ", ".join("?" * 15) + ")", applications)
+    db.executemany("insert into `tabLeave Ledger Entry` values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", ledger)
+
+    # Same aggregation as LeaveBalanceStore._aggregate, for every allocation at once
+    db.sql(
+        """
+        insert into `tabLeave Balance Summary`
+            (name, leave_allocation, employee, leave_type, from_date, to_date, allocated, used, balance,
+             last_reconciled, creation)
+        select alloc.name, alloc.name, alloc.employee, alloc.leave_type, alloc.from_date, alloc.to_date,
+            sum(case when lle.transaction_type = 'Leave Allocation' then lle.leaves else 0 end),
+            -sum(case when lle.transaction_type = 'Leave Application' then lle.leaves else 0 end),
+            sum(lle.leaves), %(now)s, %(now)s
+        from `tabLeave Allocation` alloc
+        join `tabLeave Ledger Entry` lle
+            on lle.employee = alloc.employee and lle.leave_type = alloc.leave_type
+            and lle.from_date >= alloc.from_date and lle.to_date <= alloc.to_date
+        where alloc.docstatus = 1
+        group by alloc.name
+        """,
+        {"now": now}
+    )
+
+    return {
+        "Employee": len(employees_rows),
+        "User": len(users),
+        "Leave Allocation": len(allocations),
+        "Leave Application": len(applications),
+        "Leave Ledger Entry": len(ledger),
+    }
+
+
+def seed_once(db, employees=200, seed_value=42):
+    """seed() unless the database already has employees (test modules share one fake database)"""
+    create_schema(db)
+    if db.sql("select count(*) from `tabEmployee`")[0][0]:
+        return None
+    return seed(db, employees, seed_value)
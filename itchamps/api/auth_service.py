@@ -1,5 +1,7 @@
 import frappe
-from itchamps.api.constants import UserRole
+from itchamps.api.constants import RoleSet
+from itchamps.api.context_cache import ContextCache
+from itchamps.api.employee_resolver import EmployeeResolver
 
 class AuthService:
     """
@@ -11,6 +13,7 @@ class AuthService:
     def get_user_context(user_id=None):
         """
         Get rich user context including Employee details and Roles.
+        Served from ContextCache (per-request memo + Redis TTL cache).
         
         Args:
             user_id (str, optional): User email/ID. Defaults to frappe.session.user.
@@ -24,6 +27,11 @@ class AuthService:
         if user_id == 'Guest':
             return None
 
+        return ContextCache.get(user_id, AuthService._build_user_context)
+
+    @staticmethod
+    def _build_user_context(user_id):
+        """Build the context from the database (cache miss path)"""
         # 1. Basic User Data
         user_doc = frappe.db.get_value("User", user_id, 
             ["name", "email", "first_name", "last_name", "full_name", "user_image"], 
@@ -34,13 +42,12 @@ class AuthService:
             return None
 
         # 2. Fetch Employee Record
-        # Logic matches the previous chatbot.py logic but centralized here
+        # Single indexed lookup via the persisted link, one OR query on a miss
         employee = AuthService._get_employee_record(user_id)
         
-        # 3. Fetch Roles
-        roles = UserRole.get_active_roles(user_id)
-        role_values = [r.value for r in roles] # List of strings for frontend
-        is_privileged = UserRole.is_privileged_user(user_id)
+        # 3. Fetch Roles (single frappe.get_roles call, flags precomputed)
+        role_set = RoleSet.for_user(user_id)
+        role_values = [r.value for r in role_set.active_roles] # List of strings for frontend
 
         # 4. Construct Rich Object
         context = {
@@ -53,11 +60,11 @@ class AuthService:
             },
             "roles": {
                 "list": role_values,
-                "is_privileged": is_privileged,
-                "is_admin": UserRole.ADMIN in roles,
-                "is_hr": UserRole.HR_MANAGER in roles or UserRole.HR_USER in roles,
-                "is_manager": UserRole.MANAGER in roles,
-                "is_employee": UserRole.EMPLOYEE in roles
+                "is_privileged": role_set.is_privileged,
+                "is_admin": role_set.is_admin,
+                "is_hr": role_set.is_hr,
+                "is_manager": role_set.is_manager,
+                "is_employee": role_set.is_employee
             },
             "employee": None
         }
@@ -76,16 +83,5 @@ class AuthService:
 
     @staticmethod
     def _get_employee_record(user_id):
-        """Try multiple fields to find the linked Employee record"""
-        employee = frappe.db.get_value("Employee", {"user_id": user_id}, ["*"], as_dict=True)
-        
-        if not employee:
-            employee = frappe.db.get_value("Employee", {"prefered_email": user_id}, ["*"], as_dict=True)
-            
-        if not employee:
-            employee = frappe.db.get_value("Employee", {"company_email": user_id}, ["*"], as_dict=True)
-            
-        if not employee:
-            employee = frappe.db.get_value("Employee", {"personal_email": user_id}, ["*"], as_dict=True)
-            
-        return employee
+        """Find the linked Employee record (see EmployeeResolver for lookup order)"""
+        return EmployeeResolver.resolve(user_id)
@@ -0,0 +1,72 @@
+import frappe
+
+# Changes kept per feed; workers further behind than this rebuild from scratch
+MAX_ENTRIES = 1000
+
+# Entries re-read before a worker's last generation. Writers increment the
+# generation and push the entry in two steps, so a push can land slightly
+# out of order; re-applying a few entries (idempotently) covers that gap.
+LOOKBACK = 20
+
+
+def _gen_key(feed):
+    return frappe.cache().make_key(f"itchamps_change_gen|{feed}")
+
+
+def _list_key(feed):
+    # RedisWrapper list methods add the site prefix themselves
+    return f"itchamps_change_feed|{feed}"
+
+
+def record(feed, name):
+    """
+    Append a changed document name to a feed once the transaction commits
+    (called from doc events). Recorded any earlier, another worker could
+    reload the pre-commit row, move past the generation and stay stale.
+    """
+    frappe.db.after_commit.add(lambda: _append(feed, name))
+
+
+def _append(feed, name):
+    cache = frappe.cache()
+    generation = cache.incrby(_gen_key(feed), 1)
+    cache.rpush(_list_key(feed), f"{generation}|{name}")
+    if generation % 100 == 0:
+        cache.ltrim(_list_key(feed), -MAX_ENTRIES, -1)
+    return generation
+
+
+def current_generation(feed):
+    return int(frappe.cache().get(_gen_key(feed)) or 0)
+
+
+def changes_since(feed, generation):
+    """
+    Names changed after `generation`.
+
+    Returns:
+        tuple: (current_generation, set of names) or (current_generation, None)
+               when the feed no longer reaches back far enough or was reset
+    """
+    current = current_generation(feed)
+    if current < generation:
+        # The counter went backwards or is gone (Redis flushed, `bench clear-cache`,
+        # eviction): changes since `generation` can't be told apart, so rebuild
+        return current, None
+    if current == generation:
+        return current, set()
+
+    entries = frappe.cache().lrange(_list_key(feed), -MAX_ENTRIES, -1) or []
+    names = set()
+    oldest = None
+    for entry in entries:
+        entry_gen, _, name = (entry.decode() if isinstance(entry, bytes) else entry).partition("|")
+        entry_gen = int(entry_gen)
+        oldest = entry_gen if oldest is None else min(oldest, entry_gen)
+        if entry_gen > generation - LOOKBACK:
+            names.add(name)
+
+    if oldest is None or oldest > generation + 1:
+        return current, None
+
+    return current, names
@@ -0,0 +1,164 @@
+import frappe
+from frappe import _
+from itchamps.api import chat_logger, metrics
+from itchamps.api.auth_service import AuthService
+from itchamps.api.chatbot import LEAVE_INTENTS, leave_query_flags, route_intent
+from itchamps.api.concurrency import run_concurrently
+from itchamps.api.constants import RoleSet
+from itchamps.api.leave_service import LeaveService
+from itchamps.api.llm_service import LLMService
+from itchamps.api.nlu import IntentParser
+
+DEFAULT_MAX_MESSAGES = 50
+
+# Seconds all LLM-bound messages of one batch may take together
+DEFAULT_LLM_TIMEOUT = 120
+
+TIMEOUT_MESSAGE = "Sorry, this question took too long to answer. Please ask again."
+NO_USER_MESSAGE = "Unknown or disabled user."
+
+
+class BatchItem:
+    """One message of a batch and, once answered, its response"""
+
+    __slots__ = ("index", "id", "user", "message", "session_id", "intent", "confidence", "entities", "response")
+
+    def __init__(self, index, item):
+        if isinstance(item, str):
+            item = {"message": item}
+
+        self.index = index
+        self.id = item.get("id", index)
+        self.user = item.get("user") or frappe.session.user
+        self.message = item.get("message") or ""
+        self.session_id = item.get("session_id")
+        self.intent = None
+        self.confidence = 0.0
+        self.entities = {}
+        self.response = None
+
+    def as_dict(self):
+        return {"id": self.id, "user": self.user, "intent": self.intent or "llm", **self.response}
+
+
+class ChatBatch:
+    """
+    Answers many chat messages in one request.
+
+    Each user's context is built once. Rule-routed messages are grouped by
+    intent so their database reads are shared (leave summaries of all
+    employees in one query), and messages that need Claude run concurrently
+    on the shared thread pool.
+    """
+
+    def __init__(self, items):
+        self.items = [BatchItem(i, item) for i, item in enumerate(items)]
+        self.contexts = {}
+
+    def run(self):
+        for user in {item.user for item in self.items}:
+            self.contexts[user] = AuthService.get_user_context(user)
+
+        for item in self.items:
+            if not self.contexts[item.user]:
+                item.response = {"message": NO_USER_MESSAGE}
+                continue
+            item.intent, item.confidence = IntentParser.detect_intent(item.message)
+            item.entities = IntentParser.extract_entities(item.message, item.intent)
+
+        self._prefetch()
+        self._answer_rule_intents()
+        self._answer_with_llm([item for item in self.items if item.response is None])
+
+        metrics.incr("batch.messages", len(self.items))
+        return [item.as_dict() for item in self.items]
+
+    def _pending(self, intents=None):
+        return [
+            item for item in self.items
+            if item.response is None and (intents is None or item.intent in intents)
+        ]
+
+    def _prefetch(self):
+        """One leave summary query per flag combination instead of one per message"""
+        groups = {}
+        for item in self._pending(LEAVE_INTENTS):
+            employee = self.contexts[item.user]["employee"]
+            if employee:
+                flags = leave_query_flags(LEAVE_INTENTS[item.intent] or item.message)
+                groups.setdefault(flags, set()).add(employee["id"])
+
+        for (include_pending, include_recent), employee_ids in groups.items():
+            LeaveService.prefetch(employee_ids, include_pending, include_recent)
+
+    def _answer_rule_intents(self):
+        """
+        Same routing as chatbot.answer_message: messages without an intent
+        may still answer an open leave application, the rest go to Claude.
+        """
+        for item in sorted(self._pending(), key=lambda i: i.intent or ""):
+            context = self.contexts[item.user]
+            try:
+                item.response = route_intent(
+                    item.intent, item.message, item.entities, context["user"]["id"],
+                    context["user"]["full_name"], context["employee"], RoleSet.from_context(context), item.confidence
+                )
+            except Exception as e:
+                chat_logger.error(f"Chatbot Batch Error: {str(e)}", user=item.user, intent=item.intent)
+                item.response = {"message": f"Error: {str(e)}"}
+
+    def _answer_with_llm(self, items):
+        if not items:
+            return
+
+        # Every upstream call is charged to the caller (and the site), like a chat
+        # turn; messages over the limit get the busy answer instead of a call
+        caller = frappe.session.user
+        timeout = frappe.conf.get("chatbot_batch_llm_timeout") or DEFAULT_LLM_TIMEOUT
+        results = run_concurrently(
+            [(answer_with_llm, (item.user, item.message, self.contexts[item.user], item.session_id, caller), None)
+             for item in items],
+            timeout=timeout
+        )
+
+        for item, (ok, result) in zip(items, results):
+            if ok:
+                item.response = {"message": result}
+            elif isinstance(result, TimeoutError):
+                item.response = {"message": TIMEOUT_MESSAGE}
+            else:
+                chat_logger.error(f"Chatbot Batch LLM Error: {str(result)}", user=item.user)
+                item.response = {"message": f"Error: {str(result)}"}
+
+
+def answer_with_llm(user, message, context, session_id=None, caller=None):
+    """Runs in a pool thread; acts as the message's user so tools see their permissions"""
+    frappe.set_user(user)
+    return LLMService.process_message(message, context, session_id=session_id, rate_limit_user=caller)
+
+
+@frappe.whitelist(methods=["POST"])
+def get_responses_batch(messages):
+    """
+    Answer many chat messages in one call (integrations, reminder bots).
+
+    Args:
+        messages (list | str): JSON list of messages. Each is a string or
+            {"message", "user" (optional), "session_id" (optional), "id" (optional)}.
+            Messages for users other than the caller need System Manager.
+
+    Returns:
+        dict: {"responses": [{"id", "user", "intent", "message"}, ...]} in input order
+    """
+    messages = frappe.parse_json(messages) if isinstance(messages, str) else messages
+    if not isinstance(messages, list) or not all(isinstance(m, (str, dict)) for m in messages):
+        frappe.throw(_("messages must be a list of strings or objects"))
+
+    max_messages = frappe.conf.get("chatbot_batch_max_messages") or DEFAULT_MAX_MESSAGES
+    if len(messages) > max_messages:
+        frappe.throw(_("At most {0} messages per batch").format(max_messages))
+
+    if any(isinstance(m, dict) and m.get("user") not in (None, frappe.session.user) for m in messages):
+        frappe.only_for("System Manager")
+
+    return {"responses": ChatBatch(messages).run()}
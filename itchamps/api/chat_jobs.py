@@ -0,0 +1,221 @@
+import json
+import time
+
+import frappe
+from frappe.utils.background_jobs import get_queue
+from itchamps.api import chat_logger, metrics
+from itchamps.api.chatbot import get_response
+
+# Realtime event carrying a finished job's answer (see public/js/chatbot.js)
+RESULT_EVENT = "itchamps_chatbot_result"
+
+DEFAULT_QUEUE = "chatbot"
+DEFAULT_JOB_TIMEOUT = 300
+
+# In-flight (queued or running) jobs allowed before new messages are refused
+DEFAULT_MAX_JOBS_PER_USER = 2
+DEFAULT_MAX_JOBS_PER_SITE = 50
+
+# Finished results stay pollable for this long
+RESULT_TTL = 600
+
+JOB_KEY = "itchamps_chat_job"
+# Sorted sets (one per user, one per site) of in-flight job id -> start time
+INFLIGHT_KEY = "itchamps_chat_slots"
+
+BUSY_MESSAGE = "⏳ I'm still working on your previous questions. Please wait a moment and try again."
+
+
+class ChatJobs:
+    """
+    Runs chatbot turns on a dedicated RQ queue instead of a web worker.
+
+    The web request only reserves a slot, stores a `queued` status and
+    enqueues; the answer arrives over realtime (RESULT_EVENT) or by polling
+    get_job_result. In-flight slots per user and per site provide
+    backpressure and expire on their own if a worker dies mid-job.
+    """
+
+    @staticmethod
+    def is_enabled():
+        return bool(frappe.conf.get("chatbot_async_mode"))
+
+    @staticmethod
+    def get_queue_name():
+        return frappe.conf.get("chatbot_async_queue") or DEFAULT_QUEUE
+
+    @staticmethod
+    def _key(*parts):
+        return frappe.cache().make_key("|".join(str(p) for p in parts))
+
+    @staticmethod
+    def _job_timeout():
+        return frappe.conf.get("chatbot_async_job_timeout") or DEFAULT_JOB_TIMEOUT
+
+    @staticmethod
+    def _slot_cutoff():
+        """Slots older than this are from jobs that died without releasing them"""
+        return time.time() - ChatJobs._job_timeout() * 2
+
+    @staticmethod
+    def reserve(user, job_id):
+        """
+        Take an in-flight slot for `user` and the site.
+
+        Slots are members of a sorted set per user and per site (job id ->
+        start time). A crashed job never releases its slot, so slots older
+        than twice the job timeout are trimmed before counting.
+
+        Returns:
+            bool: False if either limit is reached (nothing is reserved then)
+        """
+        cache = frappe.cache()
+        user_key = ChatJobs._key(INFLIGHT_KEY, user)
+        site_key = ChatJobs._key(INFLIGHT_KEY, "*")
+        max_user = frappe.conf.get("chatbot_async_max_jobs_per_user") or DEFAULT_MAX_JOBS_PER_USER
+        max_site = frappe.conf.get("chatbot_async_max_jobs_per_site") or DEFAULT_MAX_JOBS_PER_SITE
+        cutoff = ChatJobs._slot_cutoff()
+
+        pipe = cache.pipeline()
+        for key in (user_key, site_key):
+            pipe.zremrangebyscore(key, "-inf", cutoff)
+            pipe.zadd(key, {job_id: time.time()})
+            pipe.zcard(key)
+            # Only drops keys nobody has used for a while; slots expire by score
+            pipe.expire(key, ChatJobs._job_timeout() * 2)
+        results = pipe.execute()
+        user_count, site_count = results[2], results[6]
+
+        if user_count > max_user or site_count > max_site:
+            ChatJobs.release(user, job_id)
+            metrics.incr("chat_job.rejected")
+            return False
+        return True
+
+    @staticmethod
+    def release(user, job_id):
+        pipe = frappe.cache().pipeline()
+        pipe.zrem(ChatJobs._key(INFLIGHT_KEY, user), job_id)
+        pipe.zrem(ChatJobs._key(INFLIGHT_KEY, "*"), job_id)
+        pipe.execute()
+
+    @staticmethod
+    def set_status(job_id, **status):
+        frappe.cache().set(ChatJobs._key(JOB_KEY, job_id), json.dumps(status, default=str), ex=RESULT_TTL)
+
+    @staticmethod
+    def get_status(job_id):
+        value = frappe.cache().get(ChatJobs._key(JOB_KEY, job_id))
+        return json.loads(value) if value else None
+
+    @staticmethod
+    def submit(message, stream_id=None, session_id=None):
+        """
+        Queue one chatbot turn for the session user.
+
+        Returns:
+            dict: {"status": "queued", "job_id": ...} or {"status": "busy", "message": ...}
+        """
+        user = frappe.session.user
+        job_id = frappe.generate_hash(length=16)
+        if not ChatJobs.reserve(user, job_id):
+            return {"status": "busy", "message": BUSY_MESSAGE}
+
+        try:
+            # Status first, so a fast worker never finds the key missing
+            ChatJobs.set_status(job_id, status="queued", user=user)
+            frappe.enqueue(
+                "itchamps.api.chat_jobs.run_chat_job",
+                queue=ChatJobs.get_queue_name(),
+                timeout=ChatJobs._job_timeout(),
+                chat_job_id=job_id,
+                message=message,
+                stream_id=stream_id,
+                session_id=session_id,
+                enqueued_at=time.time()
+            )
+        except Exception:
+            ChatJobs.release(user, job_id)
+            raise
+
+        metrics.incr("chat_job.enqueued")
+        return {"status": "queued", "job_id": job_id}
+
+    @staticmethod
+    def queue_depth():
+        try:
+            return get_queue(ChatJobs.get_queue_name()).count
+        except Exception:
+            return None
+
+
+def run_chat_job(chat_job_id, message, stream_id=None, session_id=None, enqueued_at=None):
+    """Background job: answer one message as the user who sent it"""
+    user = frappe.session.user
+    started = time.time()
+    if enqueued_at:
+        metrics.observe("chat_job.wait", started - enqueued_at)
+
+    try:
+        ChatJobs.set_status(chat_job_id, status="running", user=user)
+        response = get_response(message, stream_id, session_id)
+        ChatJobs.set_status(chat_job_id, status="done", user=user, message=response.get("message"))
+        metrics.incr("chat_job.completed")
+    except Exception:
+        chat_logger.error("Chat job failed", "Chatbot Job Error", job_id=chat_job_id)
+        response = {"message": "Sorry, something went wrong while answering. Please try again."}
+        ChatJobs.set_status(chat_job_id, status="failed", user=user, message=response["message"])
+        metrics.incr("chat_job.failed")
+    finally:
+        ChatJobs.release(user, chat_job_id)
+        metrics.observe("chat_job.run", time.time() - started)
+        # No after_request hook in workers
+        metrics.flush_trace()
+        chat_logger.flush()
+
+    frappe.publish_realtime(RESULT_EVENT, {"job_id": chat_job_id, "message": response.get("message")}, user=user)
+
+
+@frappe.whitelist()
+def get_response_async(message, stream_id=None, session_id=None):
+    """
+    Non-blocking variant of chatbot.get_response.
+
+    With `chatbot_async_mode` enabled the message is queued and a job id is
+    returned; otherwise it is answered inline like get_response, so the
+    browser can always call this endpoint.
+    """
+    if not ChatJobs.is_enabled():
+        return dict(get_response(message, stream_id, session_id), status="done")
+    return ChatJobs.submit(message, stream_id, session_id)
+
+
+@frappe.whitelist()
+def get_job_result(job_id):
+    """Polling fallback when the realtime result event was missed"""
+    status = ChatJobs.get_status(job_id)
+    if not status or status.get("user") != frappe.session.user:
+        return {"status": "unknown"}
+
+    status.pop("user", None)
+    return status
+
+
+@frappe.whitelist()
+def get_queue_stats():
+    """Async chatbot queue health (System Manager only)"""
+    frappe.only_for("System Manager")
+
+    counters = metrics.get_counters(
+        "chat_job.enqueued", "chat_job.completed", "chat_job.failed", "chat_job.rejected"
+    )
+    in_flight = frappe.cache().zcount(ChatJobs._key(INFLIGHT_KEY, "*"), ChatJobs._slot_cutoff(), "+inf")
+
+    return {
+        "queue": ChatJobs.get_queue_name(),
+        "queue_depth": ChatJobs.queue_depth(),
+        "in_flight": int(in_flight or 0),
+        "counters": counters,
+        "wait_seconds": metrics.get_average("chat_job.wait"),
+        "run_seconds": metrics.get_average("chat_job.run")
+    }
@@ -0,0 +1,103 @@
+import json
+import random
+import time
+
+import frappe
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+DEFAULT_LEVEL = "info"
+DEFAULT_SAMPLE_RATE = 1.0   # share of debug/info records kept; warnings and errors always are
+
+LOG_KEY = "itchamps_chat_log"
+
+# Records waiting in Redis beyond this are dropped (oldest first) if the drain falls behind
+MAX_BUFFERED = 10000
+DRAIN_BATCH_SIZE = 500
+
+
+def _enabled(level):
+    threshold = LEVELS.get(frappe.conf.get("chatbot_log_level") or DEFAULT_LEVEL, LEVELS[DEFAULT_LEVEL])
+    if LEVELS[level] < threshold:
+        return False
+
+    if LEVELS[level] < LEVELS["warning"]:
+        rate = frappe.conf.get("chatbot_log_sample_rate")
+        rate = DEFAULT_SAMPLE_RATE if rate is None else float(rate)
+        return random.random() < rate
+    return True
+
+
+def log(level, message, **fields):
+    """
+    Buffer one record for this request. Nothing touches the database;
+    the buffer goes to Redis in one push when the request ends (see flush).
+    """
+    if not _enabled(level):
+        return
+
+    record = {"ts": round(time.time(), 3), "level": level, "user": frappe.session.user, "msg": message}
+    if fields:
+        record.update(fields)
+
+    buffer = getattr(frappe.local, "itchamps_log_buffer", None)
+    if buffer is None:
+        buffer = frappe.local.itchamps_log_buffer = []
+    buffer.append(record)
+
+
+def debug(message, **fields):
+    log("debug", message, **fields)
+
+
+def info(message, **fields):
+    log("info", message, **fields)
+
+
+def warning(message, **fields):
+    log("warning", message, **fields)
+
+
+def error(message, title="Chatbot Error", **fields):
+    """A real failure: buffered like the rest and also written to Error Log"""
+    log("error", message, **fields)
+    frappe.log_error(frappe.get_traceback() or message, title)
+
+
+def flush(response=None, request=None):
+    """Push this request's records to Redis (after_request hook, end of background jobs)"""
+    buffer = getattr(frappe.local, "itchamps_log_buffer", None)
+    if not buffer:
+        return
+    frappe.local.itchamps_log_buffer = []
+
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(LOG_KEY)
+        pipe = cache.pipeline()
+        pipe.rpush(key, *[json.dumps(record, default=str) for record in buffer])
+        pipe.ltrim(key, -MAX_BUFFERED, -1)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def drain_chat_logs():
+    """Scheduler job: move buffered records to the itchamps.chatbot log file in batches"""
+    cache = frappe.cache()
+    key = cache.make_key(LOG_KEY)
+    logger = frappe.logger("itchamps.chatbot")
+
+    while True:
+        pipe = cache.pipeline()
+        pipe.lrange(key, 0, DRAIN_BATCH_SIZE - 1)
+        pipe.ltrim(key, DRAIN_BATCH_SIZE, -1)
+        records = pipe.execute()[0]
+        if not records:
+            break
+
+        for record in records:
+            logger.info(record.decode() if isinstance(record, bytes) else record)
+
+        if len(records) < DRAIN_BATCH_SIZE:
+            break
@@ -1,23 +1,70 @@
+import re
+import time
 import frappe
 from frappe import _
-from itchamps.api.constants import UserRole
-from itchamps.api.constants import UserRole
-from itchamps.api.auth_service import AuthService
+from itchamps.api import chat_logger, metrics
+from itchamps.api.constants import PRIVILEGED_ROLES, RoleSet
 from itchamps.api.auth_service import AuthService
 from itchamps.api.nlu import IntentParser
 from itchamps.api.llm_service import LLMService
+from itchamps.api.llm_cache import role_class
+from itchamps.api.response_templates import ResponseTemplates
+from itchamps.api.response_cache import ResponseCache
+from itchamps.api.leave_service import LeaveService
+from itchamps.api.leave_application_flow import LeaveApplicationFlow
+from itchamps.api.employee_search import EmployeeSearchIndex
+from itchamps.api.org_chart import OrgChart
+from itchamps.api.streaming import StreamPublisher
+
+# Rule-routed intents whose answers only change with Employee / Leave docs.
+# manager_info / team_info are answered from the in-memory OrgChart instead.
+CACHEABLE_INTENTS = ("leave_balance", "my_info")
+
+# Words that change which sections handle_leave_query renders
+LEAVE_QUERY_FLAGS = ("pending", "application", "history", "recent")
+
+# Leave intents and the message handle_leave_query gets for them (None = the user's own)
+LEAVE_INTENTS = {"leave_balance": None, "leave_history": "history"}
+
+# Employee search: words that are part of the command rather than the search term
+SEARCH_COMMAND_WORDS = re.compile(
+    r"\b(?:find|search|for|employees?|who|works?|in|the|department|dept|show|list|me|all)\b"
+)
+SEARCH_PAGE = re.compile(r"\bpage\s+(\d+)\b")
+SEARCH_PAGE_LENGTH = 10
+
+# Rule intents that answer anyone with a linked employee record
+SELF_SERVICE_INTENTS = ("leave_balance", "leave_apply", "manager_info", "my_info", "leave_history")
 
 
 
 @frappe.whitelist()
-def get_response(message):
+def get_response(message, stream_id=None, session_id=None):
     """
     Main chatbot endpoint - handles user messages and returns AI responses
     # FORCE_DEPLOYMENT_REFRESH: 2024-12-08 v2
+
+    If `stream_id` is given, LLM answers are also pushed to the browser token
+    by token as `itchamps_chatbot_stream` realtime events tagged with it.
+    The full answer is always returned as well.
+
+    `session_id` identifies the browser's chat session; AI answers remember
+    earlier turns of the same session (see ConversationStore).
+
+    A sample of turns is timed stage by stage (see metrics.get_latency_stats).
     """
+    started = time.monotonic()
+    metrics.start_trace()
+    with metrics.stage("total"):
+        return answer_message(message, stream_id, session_id, started)
+
+
+def answer_message(message, stream_id=None, session_id=None, started=None):
+    """get_response without the timing wrapper"""
     try:
         # Get current user context (Rich Object)
-        context = AuthService.get_user_context()
+        with metrics.stage("context"):
+            context = AuthService.get_user_context()
         
         if not context:
             return {"message": "Please log in to use the AI Assistant."}
@@ -25,182 +72,254 @@ def get_response(message):
         user_id = context['user']['id']
         user_name = context['user']['full_name']
         employee = context['employee']  # Can be None if no employee linked
+        role_set = RoleSet.from_context(context)  # Resolved once, reused by every handler
         
         
         # 1. Detect Intent
-        intent, confidence = IntentParser.detect_intent(message)
-        entities = IntentParser.extract_entities(message)
+        with metrics.stage("intent"):
+            intent, confidence = IntentParser.detect_intent(message)
+            entities = IntentParser.extract_entities(message, intent)
+        metrics.set_intent(intent or "llm")
 
         # 2. Route based on Intent
-        if intent == "leave_balance":
-            return handle_leave_query(message, employee, user_name)
-        elif intent == "leave_history":
-            # Add 'history' to context for handler
-            return handle_leave_query("history", employee, user_name)
-        elif intent == "leave_apply":
-             # Placeholder for application logic (handled by same function for now or new one)
-            return handle_leave_query("pending", employee, user_name)
-        elif intent == "manager_info":
-            return handle_manager_query(employee)
-        elif intent == "employee_search":
-            return handle_employee_search(message, user_id, employee)
-        elif intent == "my_info":
-            return handle_my_info(employee, user_name)
-        elif intent == "my_info":
-            return handle_my_info(employee, user_name)
-        
+        with metrics.stage("handler"):
+            response = route_intent(intent, message, entities, user_id, user_name, employee, role_set, confidence)
+        if response is not None:
+            return response
+
         # 3. Fallback to Claude AI (LLM)
         try:
             # If no specific rule matched, or if we want to be more conversational:
-            llm_response = LLMService.process_message(message, context)
+            publisher = StreamPublisher(stream_id, user_id, started) if stream_id else None
+            llm_response = LLMService.process_message(
+                message, context, role_set, on_text=publisher, session_id=session_id
+            )
+            if publisher:
+                publisher.finish()
             return {"message": llm_response}
         except Exception as e:
             # If LLM completely crashes, fall back to default help
             error_msg = f"LLM Error: {str(e)}"
-            frappe.log_error(f"Chatbot LLM Fallback Error: {str(e)}")
+            chat_logger.error(f"Chatbot LLM Fallback Error: {str(e)}", "Chatbot LLM Error")
             return {"message": f"Hi **{user_name}**! I tried to think, but my brain hurt.\n\nError: `{error_msg}`\n\nPlease check your API Key in Site Config."}
 
     except Exception as e:
-        frappe.log_error(frappe.get_traceback(), "Chatbot Error")
+        chat_logger.error(f"Chatbot Error: {str(e)}")
         return {"message": f"Error: {str(e)}"}
 
 
-def handle_leave_query(message, employee, user):
-    """Handle leave-related queries with detailed information"""
+def route_intent(intent, message, entities, user_id, user_name, employee, role_set, confidence=1.0):
+    """Answer with a rule handler, or return None to fall through to the LLM"""
+    # A reply to an open leave application ("sick leave", "next monday") rarely
+    # matches a pattern; anything that clearly asks for something else is routed as usual
+    if intent is None or (intent == "leave_balance" and confidence < 1.0):
+        response = LeaveApplicationFlow.resume(message, user_id, employee)
+        if response is not None:
+            return response
+
+    if intent in CACHEABLE_INTENTS and employee:
+        return ResponseCache.get_or_render(
+            intent, employee["id"], get_response_cache_entities(intent, message, entities),
+            lambda: route_cacheable_intent(intent, message, employee, user_name, entities)
+        )
+
+    if intent in LEAVE_INTENTS:
+        return handle_leave_query(LEAVE_INTENTS[intent] or message, employee, user_name, entities.get("leave_type"))
+    elif intent == "leave_apply":
+        return LeaveApplicationFlow.start(message, entities, user_id, employee, confidence)
+    elif intent == "manager_info":
+        return handle_manager_query(employee, message)
+    elif intent == "team_info":
+        return handle_team_query(employee, message)
+    elif intent == "employee_search":
+        return handle_employee_search(message, user_id, employee, role_set, entities)
+    elif intent == "my_info":
+        return handle_my_info(employee, user_name)
+    elif intent == "greeting":
+        return {"message": ResponseTemplates.greeting(
+            available_intents(role_set, employee), ResponseTemplates.values_for(user_name, employee)
+        )}
+    elif intent == "help":
+        return {"message": ResponseTemplates.capabilities(
+            role_class(role_set), ResponseTemplates.values_for(user_name, employee), available_intents(role_set, employee)
+        )}
+    return None
+
+
+def can_search_employees(role_set):
+    """Employee search is for HR, managers and admins (PRIVILEGED_ROLES)"""
+    return role_set.has_any(*PRIVILEGED_ROLES)
+
+
+def available_intents(role_set, employee):
+    """Rule intents route_intent answers for this user, most useful first (for the greeting)"""
+    intents = []
+    # Everyone may ask for their team, but only managers have one to show
+    if employee and role_set.is_manager:
+        intents.append("team_info")
+    if can_search_employees(role_set):
+        intents.append("employee_search")
+    if employee:
+        intents += SELF_SERVICE_INTENTS
+    return intents
+
+
+def route_cacheable_intent(intent, message, employee, user_name, entities):
+    """Render one of CACHEABLE_INTENTS (cache miss path)"""
+    if intent == "leave_balance":
+        return handle_leave_query(message, employee, user_name, entities.get("leave_type"))
+    return handle_my_info(employee, user_name)
+
+
+def get_response_cache_entities(intent, message, entities):
+    """Everything besides (intent, employee) that the rendered answer depends on"""
+    if intent != "leave_balance":
+        return {}
+
+    message = message.lower()
+    return {
+        "leave_type": entities.get("leave_type"),
+        "flags": [flag for flag in LEAVE_QUERY_FLAGS if flag in message],
+    }
+
+
+def handle_leave_query(message, employee, user, leave_type=None):
+    """Handle leave-related queries with detailed information, optionally for one leave type"""
     if not employee:
         return {"message": f"❌ **Employee record not found**\n\nNo employee record is linked to your user account: `{user}`\n\nPlease contact HR to link your employee record."}
 
     employee_id = employee.get("id")
-    employee_name = employee.get("employee_name")
-    
-    response = f"**Leave Information for {employee_name}**\n\n"
-
-    # Check if asking for pending applications
-    if "pending" in message.lower() or "application" in message.lower():
-        pending_leaves = frappe.get_all(
-            "Leave Application",
-            filters={
-                "employee": employee_id,
-                "status": ["in", ["Open", "Pending", "Submitted"]]
-            },
-            fields=["name", "leave_type", "from_date", "to_date", "total_leave_days", "status", "posting_date"],
-            order_by="posting_date desc"
-        )
-        
-        if pending_leaves:
-            response += "**📋 Pending Leave Applications:**\n\n"
-            for leave in pending_leaves:
-                response += f"- **{leave.leave_type}**: {leave.from_date} to {leave.to_date}\n"
-                response += f"  Days: {leave.total_leave_days} | Status: {leave.status}\n"
-                response += f"  Application: {leave.name}\n\n"
+    employee_name = employee.get("name")  # "name" in context is "employee_name"
+    show_pending, show_history = leave_query_flags(message)
+
+    # One round trip for allocations + requested application lists
+    summary = LeaveService.get_leave_summary(
+        employee_id, include_pending=show_pending, include_recent=show_history
+    )
+    allocations, pending, recent = summary.allocations, summary.pending, summary.recent
+    if leave_type:
+        allocations = [a for a in allocations if a.leave_type == leave_type]
+        pending = [a for a in pending if a.leave_type == leave_type]
+        recent = [a for a in recent if a.leave_type == leave_type]
+
+    lines = [f"**Leave Information for {employee_name}**\n"]
+
+    if show_pending:
+        if pending:
+            lines.append("**📋 Pending Leave Applications:**\n")
+            for leave in pending:
+                lines.append(f"- **{leave.leave_type}**: {leave.from_date} to {leave.to_date}")
+                lines.append(f"  Days: {leave.days} | Status: {leave.status}")
+                lines.append(f"  Application: {leave.name}\n")
         else:
-            response += "✅ No pending leave applications.\n\n"
+            lines.append("✅ No pending leave applications.\n")
     
     # Show leave balance
-    leaves = frappe.get_all(
-        "Leave Allocation",
-        filters={
-            "employee": employee_id,
-            "docstatus": 1  # Only approved allocations
-        },
-        fields=["leave_type", "total_leaves_allocated", "new_leaves_allocated", "leave_balance", "from_date", "to_date"]
-    )
-
-    if leaves:
-        response += "**📊 Leave Balance:**\n\n"
-        for leave in leaves:
-            # Get actual leave balance
-            remaining = leave.leave_balance if leave.leave_balance is not None else leave.total_leaves_allocated
-            used = leave.total_leaves_allocated - remaining
-            
-            response += f"- **{leave.leave_type}**\n"
-            response += f"  Total: {leave.total_leaves_allocated} | Used: {used} | **Remaining: {remaining}**\n"
-            response += f"  Period: {leave.from_date} to {leave.to_date}\n\n"
+    if allocations:
+        lines.append("**📊 Leave Balance:**\n")
+        for leave in allocations:
+            lines.append(f"- **{leave.leave_type}**")
+            lines.append(f"  Total: {leave.total} | Used: {leave.used} | **Remaining: {leave.remaining}**")
+            lines.append(f"  Period: {leave.from_date} to {leave.to_date}\n")
     else:
-        response += "No leave allocations found.\n\n"
+        lines.append(f"No {leave_type} allocation found.\n" if leave_type else "No leave allocations found.\n")
     
     # Show recent leave history if requested
-    if "history" in message.lower() or "recent" in message.lower():
-        recent_leaves = frappe.get_all(
-            "Leave Application",
-            filters={
-                "employee": employee_id,
-                "docstatus": 1  # Submitted/Approved
-            },
-            fields=["leave_type", "from_date", "to_date", "status", "total_leave_days"],
-            order_by="from_date desc",
-            limit=5
-        )
-        
-        if recent_leaves:
-            response += "**📜 Recent Leave History:**\n\n"
-            for leave in recent_leaves:
-                response += f"- **{leave.leave_type}**: {leave.from_date} to {leave.to_date} ({leave.total_leave_days} days) - {leave.status}\n"
+    if show_history and recent:
+        lines.append("**📜 Recent Leave History:**\n")
+        for leave in recent:
+            lines.append(f"- **{leave.leave_type}**: {leave.from_date} to {leave.to_date} ({leave.days} days) - {leave.status}")
 
-    return {"message": response}
+    return {"message": "\n".join(lines) + "\n"}
+
+
+def leave_query_flags(message):
+    """(show pending applications, show recent history) for a leave query"""
+    message = message.lower()
+    return ("pending" in message or "application" in message), ("history" in message or "recent" in message)
 
 
-def handle_manager_query(employee):
-    """Handle manager-related queries"""
+def handle_manager_query(employee, message=""):
+    """Handle manager and skip-level queries from the org chart"""
     if not employee:
         return {"message": "❌ I couldn't find your employee record."}
 
-    employee_id = employee.get("id")
-    
-    manager_id = frappe.db.get_value("Employee", employee_id, "reports_to")
-
-    if manager_id:
-        manager_details = frappe.db.get_value(
-            "Employee",
-            manager_id,
-            ["employee_name", "user_id", "department", "designation", "company_email"],
-            as_dict=True
-        )
-        
-        if manager_details:
-            return {
-                "message": f"**👤 Your Reporting Manager:**\n\n"
-                          f"- **Name**: {manager_details.employee_name}\n"
-                          f"- **Designation**: {manager_details.designation or 'N/A'}\n"
-                          f"- **Department**: {manager_details.department or 'N/A'}\n"
-                          f"- **Email**: {manager_details.company_email or manager_details.user_id or 'N/A'}"
-            }
+    chart = OrgChart.get()
+    if "skip" in message.lower() or "manager's manager" in message.lower():
+        kind, manager = "Skip-Level Manager", chart.skip_level(employee.get("id"))
+    else:
+        kind, manager = "Reporting Manager", chart.manager(employee.get("id"))
 
-    return {"message": "No reporting manager found for your profile."}
+    if manager:
+        return {
+            "message": f"**👤 Your {kind}:**\n\n"
+                      f"- **Name**: {manager.employee_name}\n"
+                      f"- **Designation**: {manager.designation or 'N/A'}\n"
+                      f"- **Department**: {manager.department or 'N/A'}\n"
+                      f"- **Email**: {manager.company_email or manager.user_id or 'N/A'}"
+        }
 
+    return {"message": f"No {kind.lower()} found for your profile."}
 
-def handle_employee_search(message, user_id, employee_doc=None):
-    """Search for employees based on message content"""
-    
-    # Permission Check: Allow if user has role OR is a linked employee
-    allowed_roles = [UserRole.ADMIN, UserRole.HR_MANAGER, UserRole.HR_USER, UserRole.MANAGER]
-    has_role_permission = any(UserRole.has_role(user_id, role) for role in allowed_roles)
+
+def handle_team_query(employee, message=""):
+    """Handle direct reports and team size queries from the org chart"""
+    if not employee:
+        return {"message": "❌ I couldn't find your employee record."}
+
+    chart = OrgChart.get()
+    reports = chart.direct_reports(employee.get("id"))
+    team_size = chart.team_size(employee.get("id"))
+
+    if not reports:
+        return {"message": "Nobody reports to you at the moment."}
+
+    response = f"**👥 Your Team**: {len(reports)} direct report(s), {team_size} people in total\n\n"
+    if "size" not in message.lower():
+        for report in reports:
+            response += f"- **{report.employee_name}** - {report.designation or 'N/A'}\n"
+
+    return {"message": response}
+
+
+def handle_employee_search(message, user_id, employee_doc=None, role_set=None, entities=None):
+    """
+    Search for employees based on message content.
+
+    Employees named in full (the `employees` entity) are listed directly; a
+    `department` entity becomes a filter rather than part of the search text.
+    """
     
-    if not has_role_permission:
+    # Permission Check: Allow if user has an HR/Manager/Admin role
+    role_set = role_set or RoleSet.for_user(user_id)
+
+    if not can_search_employees(role_set):
         # If user is not HR/Manager/Employer, they can ONLY see themselves.
         # But 'handle_my_info' is better for that.
         # Here we just deny broad search.
-        return {"message": "⛔ **Access Denied**\n\nYou are not authorized to search for other employees. You can only view your own profile."}
+        return {"message": ResponseTemplates.access_denied(role_class(role_set), "search_employees")}
 
-    # Extract search terms
-    search_term = message.lower().replace("employee", "").replace("search", "").replace("find", "").strip()
-    
+    # Extract search terms: drop the command words, keep names/departments/designations
+    page_match = SEARCH_PAGE.search(message.lower())
+    page = int(page_match.group(1)) if page_match else 1
+    search_term = SEARCH_COMMAND_WORDS.sub(" ", SEARCH_PAGE.sub(" ", message.lower())).strip()
+
+    entities = entities or {}
     filters = {}
-    
-    # Check for department search
-    if "department" in message.lower() or "dept" in message.lower():
-        # Try to extract department name
-        words = search_term.split()
-        for word in words:
-            if word.capitalize() in ["Marketing", "Sales", "HR", "IT", "Finance", "Operations"]:
-                filters["department"] = word.capitalize()
-    
-    employees = frappe.get_all(
-        "Employee",
-        filters=filters,
-        fields=["employee_name", "department", "designation", "user_id", "company_email"],
-        limit=10
-    )
+    if entities.get("department"):
+        filters["department"] = entities["department"]
+        search_term = " ".join(w for w in search_term.split() if w not in department_words(entities["department"]))
+
+    start = (max(page, 1) - 1) * SEARCH_PAGE_LENGTH
+    with metrics.stage("search"):
+        index = EmployeeSearchIndex.get()
+        named = [index.rows[name] for name in entities.get("employees") or () if name in index.rows]
+        if named:
+            total, employees = len(named), named[start:start + SEARCH_PAGE_LENGTH]
+        else:
+            total, employees = index.search(
+                search_term, filters=filters, start=start, page_length=SEARCH_PAGE_LENGTH
+            )
 
     if not employees:
         return {"message": "No employees found matching your criteria."}
@@ -213,23 +332,33 @@ def handle_employee_search(message, user_id, employee_doc=None):
         response += f"  - **Department**: {emp.department or 'N/A'}\n"
         response += f"  - **Email**: {email}\n\n"
 
+    if total > start + len(employees):
+        response += f"_Showing {start + 1}-{start + len(employees)} of {total}. Ask for page {page + 1} to see more._"
+
     return {"message": response}
 
 
+def department_words(department):
+    """Lower-case words (and the acronym) of a department, e.g. {"human", "resources", "hr"}"""
+    words = re.sub(r"\s+-\s+.*$", "", department).lower().split()
+    return set(words) | ({"".join(w[0] for w in words)} if len(words) > 1 else set())
+
+
 def handle_my_info(employee, user):
     """Show current user's profile information"""
     if not employee:
         return {"message": f"❌ **Employee record not found**\n\nNo employee record is linked to: `{user}`"}
     
     employee_id = employee.get("id")
-    frappe.log_error(f"Chatbot Debug: Fetching Employee [{employee_id}] for User [{user}]", "Chatbot Debug")
+    chat_logger.debug("Fetching employee profile", employee=employee_id)
     
     try:
         # Get full employee details (Ignore permissions because we already validated the link)
-        emp_details = frappe.get_doc("Employee", employee_id, ignore_permissions=True)
+        with metrics.stage("db.employee_doc"):
+            emp_details = frappe.get_doc("Employee", employee_id, ignore_permissions=True)
     except frappe.DoesNotExistError:
         # Fallback to the basic info we have in context
-        frappe.log_error(f"Chatbot Error: Employee ID [{employee_id}] not found in DocType. Using cached context.", "Chatbot Debug")
+        chat_logger.warning("Linked employee not found, using cached context", employee=employee_id)
         emp_details = frappe._dict(employee) # Use what we have
         # Map keys from context if needed
         emp_details.employee_name = employee.get("name") # "name" in context is "employee_name"
@@ -249,12 +378,9 @@ def handle_my_info(employee, user):
     response += f"- **Email**: {email}\n"
     response += f"- **Status**: {getattr(emp_details, 'status', 'Active')}\n"
     
-    if getattr(emp_details, 'reports_to', None):
-        try:
-            manager_name = frappe.db.get_value("Employee", emp_details.reports_to, "employee_name")
-            response += f"- **Reports To**: {manager_name}\n"
-        except:
-            pass
+    manager = OrgChart.get().manager(employee_id)
+    if manager:
+        response += f"- **Reports To**: {manager.employee_name}\n"
 
     return {"message": response}
 
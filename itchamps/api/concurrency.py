@@ -0,0 +1,75 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import frappe
+
+DEFAULT_MAX_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool shared by all requests of this worker"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = frappe.conf.get("chatbot_thread_pool_size") or DEFAULT_MAX_WORKERS
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="itchamps")
+    return _executor
+
+
+def run_in_site_context(site, sites_path, user, fn, *args, **kwargs):
+    """
+    Run `fn` in a worker thread with its own Frappe context.
+
+    frappe.local is not shared with threads, so each call initialises the
+    site, opens its own DB connection, runs as `user` and tears down again.
+    """
+    frappe.init(site=site, sites_path=sites_path)
+    try:
+        frappe.connect()
+        frappe.set_user(user)
+        return fn(*args, **kwargs)
+    finally:
+        frappe.destroy()
+
+
+def run_concurrently(calls, timeout=None, user=None):
+    """
+    Run independent calls on the shared pool and wait for all of them.
+
+    Args:
+        calls (list): [(fn, args, kwargs), ...]
+        timeout (float, optional): Seconds each call may take, counted from submission
+        user (str, optional): User to run as. Defaults to frappe.session.user.
+
+    Returns:
+        list: One (ok, result_or_exception) tuple per call, in input order.
+              Calls that time out yield (False, TimeoutError).
+    """
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    user = user or frappe.session.user
+
+    executor = get_executor()
+    started = time.monotonic()
+    futures = [
+        executor.submit(run_in_site_context, site, sites_path, user, fn, *args, **(kwargs or {}))
+        for fn, args, kwargs in calls
+    ]
+
+    results = []
+    for future in futures:
+        remaining = None if timeout is None else max(0.0, started + timeout - time.monotonic())
+        try:
+            results.append((True, future.result(timeout=remaining)))
+        except FutureTimeoutError:
+            future.cancel()
+            results.append((False, TimeoutError(f"Timed out after {timeout}s")))
+        except Exception as e:
+            results.append((False, e))
+
+    return results
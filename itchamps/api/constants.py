@@ -14,13 +14,14 @@ class UserRole(Enum):
     MANAGER = "Manager"
 
     @classmethod
-    def has_role(cls, user, role):    # <--- Fetches list like ['System Manager', 'Employee']
+    def has_role(cls, user, role, role_set=None):    # <--- O(1) lookup in the request's RoleSet
         """
         Check if a user has a specific role.
         
         Args:
             user (str): User email/ID
             role (UserRole): The role to check against
+            role_set (RoleSet, optional): Pre-resolved roles; looked up once per request if omitted
             
         Returns:
             bool: True if user has the role, False otherwise
@@ -28,17 +29,75 @@ class UserRole(Enum):
         if not user or not role:
             return False
             
-        roles = frappe.get_roles(user)
-        return role.value in roles
+        role_set = role_set or RoleSet.for_user(user)
+        return role in role_set
 
     @classmethod
-    def get_active_roles(cls, user):
+    def get_active_roles(cls, user, role_set=None):
         """Return a list of UserRole enums that the user possesses"""
-        user_roles = frappe.get_roles(user)
-        return [role for role in cls if role.value in user_roles]
+        role_set = role_set or RoleSet.for_user(user)
+        return role_set.active_roles
 
     @classmethod
-    def is_privileged_user(cls, user):
+    def is_privileged_user(cls, user, role_set=None):
         """Check if user has any role that allows viewing sensitive info (HR, Admin, Manager)"""
-        privileged_roles = [cls.ADMIN, cls.HR_MANAGER, cls.HR_USER, cls.MANAGER]
-        return any(cls.has_role(user, role) for role in privileged_roles)
+        role_set = role_set or RoleSet.for_user(user)
+        return role_set.is_privileged
+
+
+# Roles that may view other employees' information
+PRIVILEGED_ROLES = (UserRole.ADMIN, UserRole.HR_MANAGER, UserRole.HR_USER, UserRole.MANAGER)
+
+
+class RoleSet:
+    """
+    Immutable snapshot of a user's roles with precomputed flags.
+    Built once per user per request so role checks never hit the database twice.
+    """
+
+    __slots__ = ("user", "roles", "active_roles", "is_admin", "is_hr", "is_manager", "is_employee", "is_privileged")
+
+    def __init__(self, user, roles):
+        """
+        Args:
+            user (str): User email/ID
+            roles (iterable): Frappe Role names (strings)
+        """
+        set_attr = object.__setattr__
+        set_attr(self, "user", user)
+        set_attr(self, "roles", frozenset(roles or ()))
+        set_attr(self, "active_roles", [role for role in UserRole if role.value in self.roles])
+        set_attr(self, "is_admin", UserRole.ADMIN.value in self.roles)
+        set_attr(self, "is_hr", UserRole.HR_MANAGER.value in self.roles or UserRole.HR_USER.value in self.roles)
+        set_attr(self, "is_manager", UserRole.MANAGER.value in self.roles)
+        set_attr(self, "is_employee", UserRole.EMPLOYEE.value in self.roles)
+        set_attr(self, "is_privileged", any(role.value in self.roles for role in PRIVILEGED_ROLES))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoleSet is immutable")
+
+    def __contains__(self, role):
+        """Accepts a UserRole or a plain Frappe role name"""
+        return (role.value if isinstance(role, UserRole) else role) in self.roles
+
+    def has_any(self, *roles):
+        return any(role in self for role in roles)
+
+    def __repr__(self):
+        return f"RoleSet({self.user!r}, {sorted(self.roles)!r})"
+
+    @classmethod
+    def for_user(cls, user):
+        """Resolve roles for `user` once per request (memoised on frappe.local)"""
+        if not hasattr(frappe.local, "itchamps_role_sets"):
+            frappe.local.itchamps_role_sets = {}
+
+        memo = frappe.local.itchamps_role_sets
+        if user not in memo:
+            memo[user] = cls(user, frappe.get_roles(user))
+        return memo[user]
+
+    @classmethod
+    def from_context(cls, context):
+        """Build from a cached AuthService context without touching the database"""
+        return cls(context["user"]["id"], context["roles"]["list"])
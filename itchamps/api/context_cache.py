@@ -0,0 +1,111 @@
+import frappe
+from itchamps.api import metrics
+
+# Default lifetime of a cached user context in Redis (seconds).
+# Doc events invalidate on commit, the TTL only bounds staleness for changes
+# made outside the ORM (e.g. raw SQL patches).
+DEFAULT_TTL = 300
+
+CACHE_KEY = "itchamps_user_context"
+METRIC = "context_cache"
+
+
+class ContextCache:
+    """
+    Two-level cache for AuthService.get_user_context.
+
+    Level 1 is a per-request memo on frappe.local, level 2 is a Redis
+    backed TTL cache shared by all workers of the site.
+    """
+
+    @staticmethod
+    def get_ttl():
+        return frappe.conf.get("chatbot_context_cache_ttl") or DEFAULT_TTL
+
+    @staticmethod
+    def _local_memo():
+        if not hasattr(frappe.local, "itchamps_user_context"):
+            frappe.local.itchamps_user_context = {}
+        return frappe.local.itchamps_user_context
+
+    @staticmethod
+    def _redis_key(user_id):
+        return f"{CACHE_KEY}|{user_id}"
+
+    @staticmethod
+    def get(user_id, builder):
+        """
+        Return the cached context for `user_id`, building it on a miss.
+
+        Args:
+            user_id (str): User email/ID
+            builder (callable): Called with `user_id` to build a fresh context
+
+        Returns:
+            dict: User context (or None for unknown users)
+        """
+        memo = ContextCache._local_memo()
+        if user_id in memo:
+            return memo[user_id]
+
+        context = frappe.cache().get_value(ContextCache._redis_key(user_id))
+        if context is not None:
+            metrics.incr(f"{METRIC}.hit")
+        else:
+            metrics.incr(f"{METRIC}.miss")
+            context = builder(user_id)
+            if context:
+                frappe.cache().set_value(
+                    ContextCache._redis_key(user_id), context,
+                    expires_in_sec=ContextCache.get_ttl()
+                )
+
+        memo[user_id] = context
+        return context
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """
+        Drop cached contexts for the given users from both levels.
+
+        The Redis entries are deleted once the transaction commits: deleted
+        any earlier, another worker could rebuild them from the rows as they
+        were before the change and keep those for a full TTL.
+        """
+        user_ids = [u for u in user_ids if u]
+        if not user_ids:
+            return
+
+        memo = ContextCache._local_memo()
+        role_sets = getattr(frappe.local, "itchamps_role_sets", {})
+        for user_id in user_ids:
+            memo.pop(user_id, None)
+            role_sets.pop(user_id, None)
+
+        keys = [ContextCache._redis_key(u) for u in user_ids]
+        frappe.db.after_commit.add(lambda: frappe.cache().delete_value(keys))
+        metrics.incr(f"{METRIC}.invalidation", len(user_ids))
+
+
+# Employee links are resolved through any of these fields (see AuthService)
+EMPLOYEE_USER_FIELDS = ("user_id", "prefered_email", "company_email", "personal_email")
+
+
+def on_user_update(doc, method=None):
+    ContextCache.invalidate(doc.name)
+
+
+def on_employee_update(doc, method=None):
+    users = {doc.get(field) for field in EMPLOYEE_USER_FIELDS}
+
+    # A re-linked employee must also drop the context of the previous user
+    previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if previous:
+        users.update(previous.get(field) for field in EMPLOYEE_USER_FIELDS)
+
+    ContextCache.invalidate(*users)
+
+
+def on_has_role_update(doc, method=None):
+    if doc.get("parenttype") == "User":
+        ContextCache.invalidate(doc.parent)
@@ -0,0 +1,137 @@
+import json
+import re
+
+import frappe
+from itchamps.api import metrics
+from itchamps.api.prompt_builder import CHARS_PER_TOKEN, estimate_tokens
+
+CONVERSATION_KEY = "itchamps_conversation"
+
+DEFAULT_TTL = 86400                 # idle seconds before a conversation is forgotten
+DEFAULT_WINDOW_TOKENS = 1500        # recent turns kept verbatim
+MEMO_MAX_TOKENS = 300               # summary of everything older
+SUMMARY_MODEL = "claude-3-haiku-20240307"
+
+SUMMARY_PROMPT = (
+    "Summarise this HR assistant conversation for your own later reference in at most "
+    "{words} words. Keep facts the user stated, what they asked for and what was answered; "
+    "drop greetings and formatting."
+)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+class Conversation:
+    """Recent turns of one chat session plus a compact memo of older ones"""
+
+    def __init__(self, user, session_id, memo="", turns=None):
+        self.user = user
+        self.session_id = session_id
+        self.memo = memo or ""
+        self.turns = turns or []    # [{"role": "user"|"assistant", "content": str}, ...]
+
+    @property
+    def is_empty(self):
+        return not self.memo and not self.turns
+
+    def messages(self, user_message):
+        """Anthropic `messages` for the next request: the window, then the new message"""
+        return [dict(turn) for turn in self.turns] + [{"role": "user", "content": user_message}]
+
+
+class ConversationStore:
+    """
+    Chat history in Redis, one JSON entry per (user, session).
+
+    The most recent turns are kept verbatim up to a token window. Whenever
+    the window overflows, the oldest turns are folded into a memo (an LLM
+    summary, or an extractive one if that call fails), so the prompt size
+    stays roughly constant however long the chat runs.
+    """
+
+    @staticmethod
+    def _key(user, session_id):
+        return frappe.cache().make_key(f"{CONVERSATION_KEY}|{user}|{session_id}")
+
+    @staticmethod
+    def get_window_tokens():
+        return frappe.conf.get("chatbot_conversation_window_tokens") or DEFAULT_WINDOW_TOKENS
+
+    @staticmethod
+    def load(user, session_id):
+        try:
+            value = frappe.cache().get(ConversationStore._key(user, session_id))
+        except Exception:
+            value = None
+
+        data = json.loads(value) if value else {}
+        return Conversation(user, session_id, data.get("memo"), data.get("turns"))
+
+    @staticmethod
+    def save(conversation):
+        ttl = frappe.conf.get("chatbot_conversation_ttl") or DEFAULT_TTL
+        value = json.dumps({"memo": conversation.memo, "turns": conversation.turns})
+        try:
+            frappe.cache().set(ConversationStore._key(conversation.user, conversation.session_id), value, ex=ttl)
+        except Exception:
+            pass
+
+    @staticmethod
+    def append(conversation, user_message, answer, client=None):
+        """Record one exchange, compact if the window overflowed, and save"""
+        conversation.turns.append({"role": "user", "content": user_message})
+        conversation.turns.append({"role": "assistant", "content": answer})
+        ConversationStore.compact(conversation, client)
+        ConversationStore.save(conversation)
+
+    @staticmethod
+    def compact(conversation, client=None):
+        """Move the oldest exchanges into the memo until the window fits"""
+        budget = ConversationStore.get_window_tokens()
+        evicted = []
+        # Drop whole user/assistant pairs so the window always starts with a user turn
+        while len(conversation.turns) > 2 and sum(estimate_tokens(t["content"]) for t in conversation.turns) > budget:
+            evicted += conversation.turns[:2]
+            conversation.turns = conversation.turns[2:]
+
+        if not evicted:
+            return
+
+        metrics.incr("conversation.compacted")
+        try:
+            conversation.memo = ConversationStore._summarise(client, conversation.memo, evicted)
+        except Exception:
+            metrics.incr("conversation.summary_fallback")
+            conversation.memo = ConversationStore._extractive_memo(conversation.memo, evicted)
+
+    @staticmethod
+    def _summarise(client, memo, turns):
+        if client is None:
+            raise ValueError("No LLM client for summarising")
+
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+        if memo:
+            transcript = f"Earlier summary: {memo}\n\n{transcript}"
+
+        response = client.messages.create(
+            model=SUMMARY_MODEL,
+            max_tokens=MEMO_MAX_TOKENS,
+            system=SUMMARY_PROMPT.format(words=MEMO_MAX_TOKENS // 2),
+            messages=[{"role": "user", "content": transcript}]
+        )
+        summary = "".join(block.text for block in response.content if block.type == "text").strip()
+        if not summary:
+            raise ValueError("Empty summary")
+        return summary
+
+    @staticmethod
+    def _extractive_memo(memo, turns):
+        """First sentence of every evicted turn, newest kept when over the memo budget"""
+        lines = [memo] if memo else []
+        for turn in turns:
+            first = _SENTENCE_END.split(turn["content"].strip(), 1)[0]
+            lines.append(f"{turn['role']}: {first[:200]}")
+
+        max_chars = MEMO_MAX_TOKENS * CHARS_PER_TOKEN
+        text = "\n".join(lines)
+        return text[-max_chars:]
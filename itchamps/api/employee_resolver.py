@@ -0,0 +1,125 @@
+import frappe
+from itchamps.api import chat_logger
+
+LINK_DOCTYPE = "Chatbot Employee Link"
+
+# Fields tried when linking a User to an Employee, highest precedence first
+MATCH_PRECEDENCE = ("user_id", "prefered_email", "company_email", "personal_email")
+
+# Only the columns AuthService puts into the user context
+EMPLOYEE_CONTEXT_FIELDS = ["name", "employee_name", "department", "designation", "company_email", "reports_to"]
+
+
+class EmployeeResolver:
+    """
+    Resolves the Employee linked to a User.
+
+    The common case is a primary key lookup on the persisted
+    `Chatbot Employee Link` table joined to Employee. On a miss all four
+    link fields are matched in a single OR query and the winner (by
+    MATCH_PRECEDENCE) is persisted for next time.
+    """
+
+    @staticmethod
+    def resolve(user_id):
+        """
+        Args:
+            user_id (str): User email/ID
+
+        Returns:
+            frappe._dict: Employee row with EMPLOYEE_CONTEXT_FIELDS, or None
+        """
+        if not user_id:
+            return None
+
+        employee = EmployeeResolver._from_link(user_id)
+        if employee:
+            return employee
+
+        employee, matched_on = EmployeeResolver._match(user_id)
+        if employee:
+            EmployeeResolver._save_link(user_id, employee.name, matched_on)
+
+        return employee
+
+    @staticmethod
+    def _from_link(user_id):
+        columns = ", ".join(f"emp.`{field}`" for field in EMPLOYEE_CONTEXT_FIELDS)
+        rows = frappe.db.sql(
+            f"""
+            select {columns}
+            from `tab{LINK_DOCTYPE}` link
+            inner join `tabEmployee` emp on emp.name = link.employee
+            where link.name = %(user)s
+            """,
+            {"user": user_id},
+            as_dict=True
+        )
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _match(user_id):
+        """One OR query over all link fields, ranked by MATCH_PRECEDENCE"""
+        candidates = frappe.get_all(
+            "Employee",
+            or_filters={field: user_id for field in MATCH_PRECEDENCE},
+            fields=EMPLOYEE_CONTEXT_FIELDS + [f for f in MATCH_PRECEDENCE if f not in EMPLOYEE_CONTEXT_FIELDS],
+            order_by="creation asc"
+        )
+
+        for field in MATCH_PRECEDENCE:
+            for candidate in candidates:
+                if candidate.get(field) == user_id:
+                    return frappe._dict({f: candidate.get(f) for f in EMPLOYEE_CONTEXT_FIELDS}), field
+
+        return None, None
+
+    @staticmethod
+    def _save_link(user_id, employee_id, matched_on):
+        # Links are keyed by User, so emails that are not Users are not persisted
+        if not frappe.db.exists("User", user_id):
+            return
+
+        try:
+            frappe.get_doc({
+                "doctype": LINK_DOCTYPE,
+                "user": user_id,
+                "employee": employee_id,
+                "matched_on": matched_on
+            }).insert(ignore_permissions=True, ignore_if_duplicate=True)
+        except Exception:
+            # The link is an optimisation only; never fail a chat turn over it
+            chat_logger.error("Could not save employee link", "Chatbot Employee Link Error", user=user_id)
+
+    @staticmethod
+    def unlink(employee_id=None, users=None):
+        """Delete persisted links pointing to an employee and/or owned by users"""
+        if employee_id:
+            frappe.db.delete(LINK_DOCTYPE, {"employee": employee_id})
+
+        users = [u for u in (users or []) if u]
+        if users:
+            frappe.db.delete(LINK_DOCTYPE, {"name": ["in", users]})
+
+
+def on_employee_change(doc, method=None):
+    """Re-sync links of an Employee whose link fields may have changed"""
+    users = {doc.get(field) for field in MATCH_PRECEDENCE}
+
+    previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    if previous:
+        users.update(previous.get(field) for field in MATCH_PRECEDENCE)
+
+    users = {u for u in users if u}
+    EmployeeResolver.unlink(employee_id=doc.name, users=list(users))
+
+    if method == "on_trash":
+        return
+
+    # Eagerly re-link so the next chat message hits the fast path
+    for user_id in users:
+        EmployeeResolver.resolve(user_id)
+
+
+def on_user_trash(doc, method=None):
+    EmployeeResolver.unlink(users=[doc.name])
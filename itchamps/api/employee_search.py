@@ -0,0 +1,233 @@
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+
+import frappe
+from itchamps.api import change_feed
+
+FEED = "employee"
+
+SEARCH_FIELDS = ["name", "employee_name", "department", "designation", "company_email", "user_id"]
+
+# Minimum share of the query's trigrams a result must contain
+MIN_SCORE = 0.35
+
+# Longest employee name, in words, looked for by find_names
+MAX_NAME_WORDS = 4
+
+_NORMALISE = re.compile(r"[^a-z0-9@.]+")
+
+
+def normalise(text):
+    return _NORMALISE.sub(" ", (text or "").lower()).strip()
+
+
+def trigrams(text):
+    """Word-padded character trigrams ("ann" -> {" an", "ann", "nn "})"""
+    grams = set()
+    for word in normalise(text).split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class EmployeeSearchIndex:
+    """
+    In-process trigram index over active employees' name, department,
+    designation and email.
+
+    Trigram overlap gives ranked, typo-tolerant matching ("jonh" still
+    finds "John"). Only the posting lists of the query's trigrams are
+    touched, never the whole directory. The index is built once per worker
+    and site, then kept current by replaying the Employee change feed
+    written by doc events.
+    """
+
+    _indexes = {}
+    _lock = threading.RLock()
+
+    def __init__(self):
+        self.generation = 0
+        self.rows = {}          # employee -> row dict
+        self.texts = {}         # employee -> (normalised name, normalised searchable text)
+        self.doc_grams = {}     # employee -> frozenset of trigrams
+        self.postings = defaultdict(set)    # trigram -> set of employees
+        self.names = defaultdict(set)       # normalised employee name -> set of employees
+
+    @classmethod
+    def get(cls):
+        """Index for the current site, built or refreshed as needed"""
+        site = frappe.local.site
+        index = cls._indexes.get(site)
+
+        if index is None:
+            with cls._lock:
+                index = cls._indexes.get(site)
+                if index is None:
+                    index = cls()
+                    index.rebuild()
+                    cls._indexes[site] = index
+            return index
+
+        index.refresh()
+        return index
+
+    def rebuild(self):
+        generation = change_feed.current_generation(FEED)
+        rows = frappe.get_all("Employee", filters={"status": "Active"}, fields=SEARCH_FIELDS, limit_page_length=0)
+
+        self.rows, self.texts, self.doc_grams = {}, {}, {}
+        self.postings, self.names = defaultdict(set), defaultdict(set)
+        for row in rows:
+            self._add(row)
+        self.generation = generation
+
+    def refresh(self):
+        """Apply Employee changes recorded since this worker last looked"""
+        current, names = change_feed.changes_since(FEED, self.generation)
+        if names is not None and current == self.generation:
+            return
+
+        with self._lock:
+            if names is None:
+                self.rebuild()
+                return
+
+            rows = {}
+            if names:
+                rows = {
+                    row.name: row for row in frappe.get_all(
+                        "Employee",
+                        filters={"name": ["in", list(names)], "status": "Active"},
+                        fields=SEARCH_FIELDS
+                    )
+                }
+            for name in names:
+                self._remove(name)
+                if name in rows:
+                    self._add(rows[name])
+            self.generation = current
+
+    def _add(self, row):
+        name = row.name
+        text = normalise(" ".join(str(row.get(f) or "") for f in SEARCH_FIELDS))
+        grams = frozenset(trigrams(text))
+
+        self.rows[name] = row
+        self.texts[name] = (normalise(row.employee_name), text)
+        self.names[self.texts[name][0]].add(name)
+        self.doc_grams[name] = grams
+        postings = self.postings
+        for gram in grams:
+            postings[gram].add(name)
+
+    def _remove(self, name):
+        for gram in self.doc_grams.pop(name, ()):
+            posting = self.postings.get(gram)
+            if posting:
+                posting.discard(name)
+                if not posting:
+                    del self.postings[gram]
+        self.rows.pop(name, None)
+        name_text, _ = self.texts.pop(name, ("", ""))
+        employees = self.names.get(name_text)
+        if employees:
+            employees.discard(name)
+            if not employees:
+                del self.names[name_text]
+
+    def search(self, query, filters=None, start=0, page_length=10):
+        """
+        Args:
+            query (str): Free text (name, department, designation or email)
+            filters (dict, optional): Exact field filters, e.g. {"department": "Marketing"}
+            start (int): Offset for pagination
+            page_length (int): Page size
+
+        Returns:
+            tuple: (total_matches, [row, ...]) best matches first
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v}
+        query_grams = trigrams(query)
+
+        with self._lock:
+            if not query_grams:
+                rows = self._candidates(filters) if filters else self.rows.values()
+                matches = [(1.0, row) for row in rows if not filters or self._passes(row, filters)]
+                matches.sort(key=lambda m: m[1].employee_name or "")
+            else:
+                matches = self._rank(query, query_grams, filters)
+
+        return len(matches), [row for _, row in matches[start:start + page_length]]
+
+    def _rank(self, query, query_grams, filters):
+        # Count shared trigrams per employee straight from the posting lists (C-level
+        # Counter updates); only employees sharing MIN_SCORE of the query are ranked
+        hits = Counter()
+        for gram in query_grams:
+            posting = self.postings.get(gram)
+            if posting:
+                hits.update(posting)
+
+        min_hits = max(1, math.ceil(MIN_SCORE * len(query_grams)))
+        needle = normalise(query)
+        scored = []
+        for name, count in hits.items():
+            if count < min_hits:
+                continue
+
+            row = self.rows[name]
+            if filters and not self._passes(row, filters):
+                continue
+
+            # Prefer whole-phrase hits, and name hits over department/designation hits
+            score = count / len(query_grams)
+            name_text, full_text = self.texts[name]
+            if needle in name_text:
+                score += 1.0
+            elif needle in full_text:
+                score += 0.5
+            scored.append((score, name_text, row))
+
+        scored.sort(key=lambda m: (-m[0], m[1]))
+        return [(score, row) for score, _, row in scored]
+
+    def _candidates(self, filters):
+        """Rows containing every trigram of the filter values (a superset of the matches)"""
+        grams = trigrams(" ".join(str(v) for v in filters.values()))
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        if not postings:
+            return list(self.rows.values())
+        names = postings[0].intersection(*postings[1:])
+        return [self.rows[name] for name in names]
+
+    def find_names(self, text):
+        """
+        Employees whose full name appears in `text` as whole words, longest
+        names first, without overlaps.
+
+        Returns:
+            list: Employee IDs in order of appearance
+        """
+        words = normalise(text).split()
+        found, i = [], 0
+        with self._lock:
+            while i < len(words):
+                for n in range(min(MAX_NAME_WORDS, len(words) - i), 0, -1):
+                    employees = self.names.get(" ".join(words[i:i + n]))
+                    if employees:
+                        found.extend(sorted(employees))
+                        i += n
+                        break
+                else:
+                    i += 1
+        return found
+
+    @staticmethod
+    def _passes(row, filters):
+        return all(normalise(row.get(field)) == normalise(value) for field, value in filters.items())
+
+
+def on_employee_change(doc, method=None):
+    change_feed.record(FEED, doc.name)
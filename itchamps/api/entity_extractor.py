@@ -0,0 +1,333 @@
+import re
+import math
+import datetime
+
+try:
+    import frappe
+except ImportError:     # the NLU also runs without a bench (tests, benchmarks)
+    frappe = None
+
+VOCAB_KEY = "itchamps_entity_vocab"
+VOCAB_TTL = 3600
+
+# Used when there is no site to read Leave Type / Department from
+DEFAULT_LEAVE_TYPES = ("Casual Leave", "Sick Leave", "Privilege Leave")
+DEFAULT_DEPARTMENTS = ("Marketing", "Sales", "Human Resources", "Information Technology",
+                       "Finance", "Operations", "Production")
+
+# Extra words for leave types; only used when the target type exists
+LEAVE_TYPE_ALIASES = {"earned": "Privilege Leave", "annual": "Privilege Leave", "medical": "Sick Leave"}
+
+# Intents whose handlers use employee names (the name index is only built for them)
+NAME_INTENTS = ("employee_search",)
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+_MONTH = r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?" \
+         r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+_ORD = r"(?:st|nd|rd|th)"
+_COUNT = r"\d+(?:\.5)?|" + "|".join(NUMBER_WORDS)
+
+# One pass over the message; alternatives are tried left to right at each position
+DATE_PATTERN = re.compile(r"\b(?:" + "|".join([
+    rf"(?P<rd1>\d{{1,2}}){_ORD}?\s*(?:-|to|till|until|and)\s*(?P<rd2>\d{{1,2}}){_ORD}?\s+(?:of\s+)?(?P<rm>{_MONTH})(?:,?\s+(?P<ry>\d{{4}}))?",
+    rf"(?P<rmm>{_MONTH})\s+(?P<rmd1>\d{{1,2}}){_ORD}?\s*(?:-|to|till|until|and)\s*(?P<rmd2>\d{{1,2}}){_ORD}?(?:,?\s+(?P<rmy>\d{{4}}))?",
+    r"(?P<iy>\d{4})-(?P<im>\d{1,2})-(?P<id>\d{1,2})",
+    rf"(?P<cnt>{_COUNT})\s+(?:working\s+|business\s+)?days?",
+    r"(?P<nd>\d{1,2})[/.](?P<nm>\d{1,2})(?:[/.](?P<ny>\d{2,4}))?",
+    rf"(?P<dd>\d{{1,2}}){_ORD}?\s+(?:of\s+)?(?P<dm>{_MONTH})(?:,?\s+(?P<dy>\d{{4}}))?",
+    rf"(?P<mm>{_MONTH})\s+(?P<md>\d{{1,2}}){_ORD}?(?:,?\s+(?P<my>\d{{4}}))?",
+    rf"(?P<od>\d{{1,2}}){_ORD}",
+    r"(?P<rel>day after tomorrow|today|tomorrow|yesterday)",
+    r"(?:(?P<wq>next|this|coming)\s+)?(?P<wd>" + "|".join(WEEKDAYS) + ")",
+    rf"in\s+(?P<ind>{_COUNT})\s+days?",
+    r"(?P<nw>next week)",
+    r"(?P<half>half[\s-]?day)",
+]) + r")\b")
+
+MONTH_CONTEXT = re.compile(rf"\b(?:(?P<next>next month)|(?P<this>this month)|(?:in|during|for)\s+(?P<month>{_MONTH}))\b")
+
+# Process-wide compiled vocabulary matchers, keyed by the vocabulary itself
+_matchers = {}
+
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return date.replace(year=year, month=month, day=1)
+
+
+def month_end(date):
+    return add_months(date, 1) - datetime.timedelta(days=1)
+
+
+def _number(text):
+    return NUMBER_WORDS.get(text) or float(text)
+
+
+def _make_date(year, month, day):
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _with_year(month, day, today, prefer):
+    """Date for a day and month without a year, closest to today in the preferred direction"""
+    candidates = [d for d in (_make_date(today.year + o, month, day) for o in (-1, 0, 1)) if d]
+    if prefer == "future":
+        candidates = [d for d in candidates if d >= today] or candidates
+    elif prefer == "past":
+        candidates = [d for d in candidates if d <= today] or candidates
+    return min(candidates, key=lambda d: abs((d - today).days)) if candidates else None
+
+
+def _year(text, month, day, today, prefer):
+    if not text:
+        return _with_year(month, day, today, prefer)
+    year = int(text)
+    return _make_date(year + 2000 if year < 100 else year, month, day)
+
+
+def _today():
+    """The site's date (in its system time zone), else the machine's"""
+    if frappe is None or not getattr(frappe.local, "site", None):
+        return datetime.date.today()
+    from frappe.utils import getdate
+    return getdate()
+
+
+def parse_dates(message, today=None, prefer=None):
+    """
+    Dates, date ranges and day counts in an already lower-cased message.
+
+    Understands ISO and day/month dates, "3rd march", "march 3", "3-5 march",
+    "december 24 and 25", bare ordinals ("from 3rd to 5th next month"),
+    today/tomorrow, weekdays, "in N days", "next week", "N days" and
+    "half day".
+
+    Args:
+        today (date, optional): Reference date. Defaults to the site's today.
+        prefer (str, optional): "future" or "past" for dates without a year
+
+    Returns:
+        dict: Any of from_date, to_date (ISO strings), days (float), half_day (bool)
+    """
+    today = today or _today()
+    dates, days, half_day = [], None, False
+
+    context = MONTH_CONTEXT.search(message)
+    context_month = None
+    if context:
+        if context.group("next"):
+            context_month = add_months(today, 1)
+        elif context.group("this"):
+            context_month = today.replace(day=1)
+        else:
+            month = MONTHS[context.group("month")[:3]]
+            context_month = _with_year(month, 1, today.replace(day=1), prefer)
+
+    for match in DATE_PATTERN.finditer(message):
+        group = match.groupdict()
+        if group["rd1"]:
+            month = MONTHS[group["rm"][:3]]
+            dates += [_year(group["ry"], month, int(group[g]), today, prefer) for g in ("rd1", "rd2")]
+        elif group["rmm"]:
+            month = MONTHS[group["rmm"][:3]]
+            dates += [_year(group["rmy"], month, int(group[g]), today, prefer) for g in ("rmd1", "rmd2")]
+        elif group["iy"]:
+            dates.append(_make_date(int(group["iy"]), int(group["im"]), int(group["id"])))
+        elif group["nd"]:
+            dates.append(_year(group["ny"], int(group["nm"]), int(group["nd"]), today, prefer))
+        elif group["dd"]:
+            dates.append(_year(group["dy"], MONTHS[group["dm"][:3]], int(group["dd"]), today, prefer))
+        elif group["mm"]:
+            dates.append(_year(group["my"], MONTHS[group["mm"][:3]], int(group["md"]), today, prefer))
+        elif group["od"]:
+            # "the 3rd": of the month named elsewhere, else the next 3rd to come
+            base = context_month or today.replace(day=1)
+            date = _make_date(base.year, base.month, int(group["od"]))
+            if date and not context_month and date < today and prefer != "past":
+                base = add_months(base, 1)
+                date = _make_date(base.year, base.month, int(group["od"]))
+            dates.append(date)
+        elif group["rel"]:
+            offset = {"today": 0, "tomorrow": 1, "yesterday": -1, "day after tomorrow": 2}[group["rel"]]
+            dates.append(today + datetime.timedelta(days=offset))
+        elif group["wd"]:
+            ahead = (WEEKDAYS.index(group["wd"]) - today.weekday()) % 7
+            if group["wq"] == "next" and ahead == 0:
+                ahead = 7
+            dates.append(today + datetime.timedelta(days=ahead))
+        elif group["ind"]:
+            dates.append(today + datetime.timedelta(days=int(_number(group["ind"]))))
+        elif group["nw"]:
+            monday = today + datetime.timedelta(days=7 - today.weekday())
+            dates += [monday, monday + datetime.timedelta(days=4)]
+        elif group["cnt"]:
+            days = _number(group["cnt"])
+        elif group["half"]:
+            half_day = True
+
+    dates = [d for d in dates if d]
+    if not dates and context and context_month:
+        # "leaves in march", "next month": the whole month
+        dates = [context_month, month_end(context_month)]
+
+    entities = {}
+    if dates:
+        from_date = dates[0]
+        to_date = dates[1] if len(dates) > 1 else None
+        if to_date is None:
+            span = 1 if half_day else days
+            to_date = from_date + datetime.timedelta(days=max(math.ceil(span or 1), 1) - 1)
+        if to_date < from_date:
+            from_date, to_date = to_date, from_date
+        entities["from_date"], entities["to_date"] = from_date.isoformat(), to_date.isoformat()
+
+    if half_day:
+        entities["half_day"], entities["days"] = True, 0.5
+    elif days:
+        entities["days"] = float(days)
+    return entities
+
+
+class EntityVocabulary:
+    """
+    Leave types and departments of the site, cached in Redis and kept in
+    sync by Leave Type / Department doc events.
+    """
+
+    @staticmethod
+    def get():
+        """
+        Returns:
+            dict: {"leave_types": [name, ...], "departments": [[name, department_name], ...]}
+        """
+        if frappe is None or not getattr(frappe.local, "site", None):
+            return {"leave_types": list(DEFAULT_LEAVE_TYPES), "departments": [[d, d] for d in DEFAULT_DEPARTMENTS]}
+
+        memo = getattr(frappe.local, "itchamps_entity_vocab", None)
+        if memo is not None:
+            return memo
+
+        vocab = frappe.cache().get_value(VOCAB_KEY)
+        if vocab is None:
+            vocab = {
+                "leave_types": frappe.get_all("Leave Type", pluck="name", limit_page_length=0),
+                "departments": [
+                    [row.name, row.department_name or row.name]
+                    for row in frappe.get_all("Department", fields=["name", "department_name"], limit_page_length=0)
+                ],
+            }
+            frappe.cache().set_value(VOCAB_KEY, vocab, expires_in_sec=VOCAB_TTL)
+
+        frappe.local.itchamps_entity_vocab = vocab
+        return vocab
+
+    @staticmethod
+    def invalidate():
+        frappe.cache().delete_value(VOCAB_KEY)
+
+
+class VocabularyMatcher:
+    """Compiled word-boundary regexes for one vocabulary"""
+
+    def __init__(self, leave_types, departments):
+        self.leave_types = {}
+        for leave_type in leave_types:
+            self.leave_types[leave_type.lower()] = leave_type
+            first = leave_type.split()[0].lower()
+            if first not in ("leave", "paid", "unpaid") and len(leave_type.split()) > 1:
+                self.leave_types.setdefault(first, leave_type)
+        for alias, leave_type in LEAVE_TYPE_ALIASES.items():
+            if leave_type in leave_types:
+                self.leave_types.setdefault(alias, leave_type)
+
+        self.departments, self.acronyms = {}, {}
+        for name, department_name in departments:
+            self.departments.setdefault(department_name.lower(), name)
+            words = department_name.split()
+            if len(words) > 1:
+                self.acronyms.setdefault("".join(w[0] for w in words).upper(), name)
+
+        self.leave_pattern = self._compile(self.leave_types)
+        self.department_pattern = self._compile(self.departments)
+        # Acronyms are matched case-sensitively: "IT" is a department, "it" is not
+        self.acronym_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, self.acronyms)) + r")\b") \
+            if self.acronyms else None
+
+    @staticmethod
+    def _compile(words):
+        if not words:
+            return None
+        alternatives = sorted(words, key=len, reverse=True)
+        return re.compile(r"\b(?:" + "|".join(map(re.escape, alternatives)) + r")\b")
+
+    @classmethod
+    def get(cls, vocab):
+        key = (tuple(vocab["leave_types"]), tuple(map(tuple, vocab["departments"])))
+        matcher = _matchers.get(key)
+        if matcher is None:
+            if len(_matchers) > 16:
+                _matchers.clear()
+            matcher = _matchers[key] = cls(*key)
+        return matcher
+
+
+class EntityExtractor:
+    """
+    Structured entities for the rule handlers: dates and ranges, day counts,
+    leave type, department and (for search) employees named in the message.
+    """
+
+    @staticmethod
+    def extract(message, intent=None, today=None):
+        """
+        Args:
+            message (str): Raw user message
+            intent (str, optional): Detected intent; decides date direction and name lookup
+            today (date, optional): Reference date for relative dates
+
+        Returns:
+            dict: JSON-serialisable entities, e.g.
+                {"leave_type": "Sick Leave", "from_date": "2025-03-03", "to_date": "2025-03-05", "days": 3.0}
+        """
+        lowered = message.lower()
+        prefer = {"leave_apply": "future", "leave_history": "past"}.get(intent)
+        entities = parse_dates(lowered, today, prefer)
+
+        matcher = VocabularyMatcher.get(EntityVocabulary.get())
+        match = matcher.leave_pattern.search(lowered) if matcher.leave_pattern else None
+        if match:
+            entities["leave_type"] = matcher.leave_types[match.group(0)]
+
+        match = matcher.department_pattern.search(lowered) if matcher.department_pattern else None
+        if match:
+            entities["department"] = matcher.departments[match.group(0)]
+        elif matcher.acronym_pattern:
+            match = matcher.acronym_pattern.search(message)
+            if match:
+                entities["department"] = matcher.acronyms[match.group(0)]
+
+        if intent in NAME_INTENTS and frappe is not None:
+            # Imported here: the search index needs a site, the rest of the NLU does not
+            from itchamps.api.employee_search import EmployeeSearchIndex
+            employees = EmployeeSearchIndex.get().find_names(lowered)
+            if employees:
+                entities["employees"] = employees
+
+        return entities
+
+
+def on_vocabulary_change(doc, method=None):
+    # After commit, or a concurrent request could cache the old vocabulary again
+    frappe.db.after_commit.add(EntityVocabulary.invalidate)
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+try:
+    import frappe
+except ImportError:     # the NLU also runs without a bench (tests, benchmarks)
+    frappe = None
+
+PHRASES_FILE = os.path.join(os.path.dirname(__file__), "intent_phrases.json")
+
+# Label of the phrases that must go to the LLM (greetings, policy questions, ...)
+OTHER = "_other"
+
+# Cosine similarity to the nearest centroid needed to route a message, and
+# how much closer than OTHER that centroid must be. Calibrated on the
+# held-out paraphrases in test_nlu.py: no message there is routed to a
+# wrong intent, ambiguous ones go to Claude instead.
+DEFAULT_THRESHOLD = 0.22
+DEFAULT_MARGIN = 0.05
+
+DIMENSIONS = 1 << 14
+CHAR_NGRAMS = (3, 4)
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]")
+
+
+def get_threshold():
+    try:
+        return frappe.conf.get("chatbot_intent_threshold") or DEFAULT_THRESHOLD
+    except Exception:
+        return DEFAULT_THRESHOLD
+
+
+def get_margin():
+    try:
+        return frappe.conf.get("chatbot_intent_margin") or DEFAULT_MARGIN
+    except Exception:
+        return DEFAULT_MARGIN
+
+
+def features(text):
+    """Word unigrams, word bigrams and character n-grams of each word"""
+    words = _NON_WORD.sub(" ", text.lower().replace("'", "")).split()
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        for n in CHAR_NGRAMS:
+            grams += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+    return grams
+
+
+def hash_counts(text):
+    """Sparse term counts: (hashed indices, counts). crc32 keeps it stable across processes"""
+    indices = np.fromiter((zlib.crc32(g.encode()) % DIMENSIONS for g in features(text)), dtype=np.int64)
+    return np.unique(indices, return_counts=True)
+
+
+class IntentClassifier:
+    """
+    Hashed n-gram nearest-centroid classifier, the middle tier between the
+    regex rules and Claude.
+
+    Trained from IntentParser.INTENTS patterns plus intent_phrases.json:
+    every phrase becomes a TF-IDF weighted, L2-normalised hashed n-gram
+    vector and each intent is the normalised mean of its vectors. A message
+    is assigned the intent of the most similar centroid.
+    """
+
+    def __init__(self, labelled):
+        """
+        Args:
+            labelled (dict): {intent: [phrase, ...]}
+        """
+        self.labels = sorted(labelled)
+        phrases = [(label, phrase) for label in self.labels for phrase in labelled[label]]
+
+        document_frequency = np.zeros(DIMENSIONS)
+        counts = []
+        for _, phrase in phrases:
+            indices, values = hash_counts(phrase)
+            document_frequency[indices] += 1
+            counts.append((indices, values))
+        self.idf = np.log((1 + len(phrases)) / (1 + document_frequency)) + 1
+
+        self.centroids = np.zeros((len(self.labels), DIMENSIONS))
+        for (label, _), (indices, values) in zip(phrases, counts):
+            self.centroids[self.labels.index(label)] += self._vector(indices, values)
+        self.centroids /= np.linalg.norm(self.centroids, axis=1, keepdims=True)
+
+    def _vector(self, indices, values):
+        vector = np.zeros(DIMENSIONS)
+        vector[indices] = (1 + np.log(values)) * self.idf[indices]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def classify(self, message):
+        """
+        Returns:
+            tuple: (intent or OTHER, similarity, margin over OTHER's similarity),
+                   or (None, 0.0, 0.0) for empty input
+        """
+        if not message or not message.strip():
+            return None, 0.0, 0.0
+        similarities = self.centroids @ self._vector(*hash_counts(message))
+        best = int(np.argmax(similarities))
+        margin = similarities[best] - similarities[self.labels.index(OTHER)]
+        return self.labels[best], float(similarities[best]), float(margin)
+
+    @classmethod
+    def train(cls, intents):
+        """
+        Args:
+            intents (dict): IntentParser.INTENTS (their regex patterns are used as phrases)
+        """
+        with open(PHRASES_FILE) as f:
+            labelled = json.load(f)
+
+        for intent, data in intents.items():
+            patterns = [re.sub(r"[\\^$]", "", pattern) for pattern in data["patterns"]]
+            labelled[intent] = patterns + labelled.get(intent, [])
+
+        return cls(labelled)
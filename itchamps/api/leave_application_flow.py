@@ -0,0 +1,342 @@
+import re
+import datetime
+
+import frappe
+from frappe.utils import getdate, today
+from itchamps.api import chat_logger, metrics
+from itchamps.api.entity_extractor import EntityExtractor
+from itchamps.api.leave_service import LeaveService
+
+FLOW_KEY = "itchamps_leave_flow"
+HOLIDAY_KEY = "itchamps_holidays"
+
+# Seconds an unfinished application is remembered between chat turns
+DEFAULT_FLOW_TTL = 900
+HOLIDAY_TTL = 86400
+
+# Applications in these states block overlapping new ones
+BLOCKING_STATUSES = ("Open", "Approved")
+
+# Pattern matches score 1.0; a classifier guess below this is confirmed with
+# the user ("Do you want to apply for leave?") before the flow starts
+START_CONFIDENCE = 0.9
+
+SLOTS = ("leave_type", "from_date", "to_date", "half_day")
+
+CANCEL_WORDS = re.compile(r"\b(?:cancel|stop|abort|never\s?mind|forget it)\b")
+REASON = re.compile(r"\b(?:because|reason(?: is)?:?|due to)\s+(?P<reason>.+)$")
+YES = re.compile(r"^\W*(?:yes|yeah|yep|yup|y|sure|ok(?:ay)?|confirm|submit|go ahead|please do)\b")
+NO = re.compile(r"^\W*(?:no|nope|nah|n|don'?t|do not)\b")
+
+
+class HolidayCalendar:
+    """Holiday dates per Holiday List, cached in Redis for a day"""
+
+    @staticmethod
+    def get_holidays(holiday_list):
+        """
+        Returns:
+            set: ISO date strings of the list's holidays (weekly offs included)
+        """
+        if not holiday_list:
+            return set()
+
+        key = f"{HOLIDAY_KEY}|{holiday_list}"
+        holidays = frappe.cache().get_value(key)
+        if holidays is None:
+            holidays = [str(d) for d in frappe.get_all(
+                "Holiday", filters={"parent": holiday_list}, pluck="holiday_date", limit_page_length=0
+            )]
+            frappe.cache().set_value(key, holidays, expires_in_sec=HOLIDAY_TTL)
+        return set(holidays)
+
+    @staticmethod
+    def for_employee(employee_id):
+        """Holiday list of the employee, else their company's default"""
+        employee = frappe.db.get_value("Employee", employee_id, ["holiday_list", "company"], as_dict=True) or {}
+        holiday_list = employee.get("holiday_list")
+        if not holiday_list and employee.get("company"):
+            holiday_list = frappe.get_cached_value("Company", employee["company"], "default_holiday_list")
+        return holiday_list
+
+    @staticmethod
+    def working_days(from_date, to_date, holidays):
+        day, days = from_date, 0
+        while day <= to_date:
+            days += day.isoformat() not in holidays
+            day += datetime.timedelta(days=1)
+        return days
+
+
+class LeaveApplicationFlow:
+    """
+    Applies for leave over one or more chat turns without the LLM.
+
+    Slots (leave type, dates, half day, reason) are filled from extracted
+    entities and kept in Redis between turns. Once the type and the dates
+    are known, the request is checked against the leave balance and the
+    holiday list and for overlaps, and summarised; the Leave Application is
+    only created when the employee answers "yes" to that summary.
+    """
+
+    @staticmethod
+    def _key(user):
+        return f"{FLOW_KEY}|{user}"
+
+    @staticmethod
+    def load(user):
+        return frappe.cache().get_value(LeaveApplicationFlow._key(user))
+
+    @staticmethod
+    def save(user, slots):
+        ttl = frappe.conf.get("chatbot_leave_flow_ttl") or DEFAULT_FLOW_TTL
+        frappe.cache().set_value(LeaveApplicationFlow._key(user), slots, expires_in_sec=ttl)
+
+    @staticmethod
+    def clear(user):
+        frappe.cache().delete_value(LeaveApplicationFlow._key(user))
+
+    @staticmethod
+    def start(message, entities, user_id, employee, confidence=1.0):
+        """
+        Handle a leave_apply message (a new application, or more details for the open one).
+
+        Args:
+            confidence (float): Of the intent; below START_CONFIDENCE the user
+                is asked whether they want to apply for leave at all
+        """
+        slots = LeaveApplicationFlow.load(user_id) or {}
+        if employee and confidence < START_CONFIDENCE and (not slots or slots.get("confirm_intent")):
+            slots = {"confirm_intent": True}
+            LeaveApplicationFlow._fill(slots, message, entities)
+            LeaveApplicationFlow.save(user_id, slots)
+            return {"message": "Do you want to apply for leave? (yes/no)"}
+
+        slots.pop("confirm_intent", None)
+        return LeaveApplicationFlow._turn(message, entities, user_id, employee, slots)
+
+    @staticmethod
+    def resume(message, user_id, employee):
+        """
+        Continue an open application with a follow-up message ("sick leave",
+        "next monday", "cancel").
+
+        Returns:
+            dict: Response, or None if no application is open or the message
+                  does not look like an answer (it is then routed as usual)
+        """
+        slots = LeaveApplicationFlow.load(user_id)
+        if slots is None:
+            return None
+
+        lowered = message.lower()
+        answer = LeaveApplicationFlow._answer(lowered)
+        if slots.get("confirm_intent"):
+            # "Do you want to apply for leave?" is open; anything else means the user moved on
+            if answer is None:
+                LeaveApplicationFlow.clear(user_id)
+                return None
+            if answer == "no":
+                LeaveApplicationFlow.clear(user_id)
+                return {"message": "OK, I won't apply for leave."}
+            del slots["confirm_intent"]
+            return LeaveApplicationFlow._turn(message, {}, user_id, employee, slots)
+
+        entities = EntityExtractor.extract(message, "leave_apply")
+        if not (CANCEL_WORDS.search(lowered) or REASON.search(lowered) or (answer and slots.get("confirm"))
+                or entities.keys() & {"leave_type", "from_date", "half_day"}):
+            return None
+        return LeaveApplicationFlow._turn(message, entities, user_id, employee, slots)
+
+    @staticmethod
+    def _answer(lowered):
+        """"yes", "no" or None"""
+        if YES.search(lowered):
+            return "yes"
+        if NO.search(lowered):
+            return "no"
+        return None
+
+    @staticmethod
+    def _fill(slots, message, entities):
+        """Copy the message's slot entities and reason into `slots`"""
+        if entities.get("from_date"):
+            # New dates replace the old range, including its end
+            slots.pop("to_date", None)
+        for slot in SLOTS:
+            if entities.get(slot):
+                slots[slot] = entities[slot]
+        reason = REASON.search(message.lower())
+        if reason:
+            slots["reason"] = message[reason.start("reason"):].strip()
+
+    @staticmethod
+    def _turn(message, entities, user_id, employee, slots):
+        if not employee:
+            return {"message": "❌ I couldn't find your employee record, so I can't apply for leave for you."}
+
+        lowered = message.lower()
+        answer = LeaveApplicationFlow._answer(lowered)
+        # "no, make it friday" changes the dates instead of cancelling
+        if CANCEL_WORDS.search(lowered) or (answer == "no" and slots.get("confirm") and not entities.keys() & set(SLOTS)):
+            LeaveApplicationFlow.clear(user_id)
+            return {"message": "OK, I've cancelled that leave application."}
+
+        # "yes" to the summary shown last turn, unless this message also changes it
+        confirmed = slots.pop("confirm", False) and answer == "yes" and not entities.keys() & set(SLOTS)
+        LeaveApplicationFlow._fill(slots, message, entities)
+
+        # Open applications are not in the balance yet but will be once approved
+        summary = LeaveService.get_leave_summary(employee["id"], include_pending=True)
+        allocations = {}
+        for allocation in summary.allocations:
+            allocations.setdefault(allocation.leave_type, []).append(allocation)
+
+        if not allocations:
+            LeaveApplicationFlow.clear(user_id)
+            return {"message": "You have no leave allocations, so there is nothing to apply against. Please contact HR."}
+
+        if not slots.get("leave_type") or slots["leave_type"] not in allocations:
+            LeaveApplicationFlow.save(user_id, slots)
+            options = "\n".join(
+                f"- **{leave_type}**: {periods[-1].remaining} day(s) left" for leave_type, periods in allocations.items()
+            )
+            unknown = f"You have no **{slots['leave_type']}** allocation. " if slots.get("leave_type") else ""
+            return {"message": f"{unknown}Which type of leave would you like to apply for?\n\n{options}"}
+
+        if not slots.get("from_date"):
+            LeaveApplicationFlow.save(user_id, slots)
+            return {"message": f"For which dates would you like **{slots['leave_type']}**? "
+                               "For example \"tomorrow\", \"next friday\" or \"from 3rd to 5th next month\"."}
+
+        # The allocation period containing the start date, else the latest one
+        periods = allocations[slots["leave_type"]]
+        allocation = next((a for a in periods if str(a.from_date) <= slots["from_date"] <= str(a.to_date)), periods[-1])
+
+        booked = sum(
+            a.days or 0 for a in summary.pending
+            if a.leave_type == allocation.leave_type and str(allocation.from_date) <= str(a.from_date) <= str(allocation.to_date)
+        )
+
+        response = LeaveApplicationFlow._apply(slots, employee, allocation, allocation.remaining - booked, confirmed)
+        if response.get("done"):
+            LeaveApplicationFlow.clear(user_id)
+        elif response.get("confirm"):
+            LeaveApplicationFlow.save(user_id, dict(slots, confirm=True))
+        else:
+            # Keep the leave type; ask for other dates
+            LeaveApplicationFlow.save(user_id, {k: v for k, v in slots.items() if k in ("leave_type", "reason")})
+        return {"message": response["message"]}
+
+    @staticmethod
+    def _apply(slots, employee, allocation, available, confirmed=False):
+        """
+        Validate the filled slots, then ask for confirmation or (once
+        `confirmed`) create the application.
+
+        Returns:
+            dict: {"message", "done"} or {"message", "confirm"}
+        """
+        from_date = getdate(slots["from_date"])
+        to_date = getdate(slots.get("to_date") or slots["from_date"])
+        half_day = bool(slots.get("half_day"))
+        if half_day:
+            to_date = from_date
+
+        if to_date < from_date:
+            return {"message": f"The end date {to_date} is before the start date {from_date}. Which dates did you mean?"}
+
+        if not (str(allocation.from_date) <= from_date.isoformat() and to_date.isoformat() <= str(allocation.to_date)):
+            return {"message": f"Your **{allocation.leave_type}** allocation covers {allocation.from_date} to "
+                               f"{allocation.to_date}. Please pick dates in that period."}
+
+        holidays = HolidayCalendar.get_holidays(HolidayCalendar.for_employee(employee["id"]))
+        days = HolidayCalendar.working_days(from_date, to_date, holidays)
+        if not days:
+            return {"message": f"{from_date} to {to_date} are all holidays, so no leave is needed. Which dates did you mean?"}
+        if half_day:
+            days = 0.5
+
+        if days > available:
+            return {"message": f"That is {days} working day(s) of **{allocation.leave_type}**, but you only have "
+                               f"{available} left (open applications included). "
+                               "Please choose fewer days or another leave type."}
+
+        overlap = LeaveApplicationFlow.find_overlap(employee["id"], from_date, to_date)
+        if overlap:
+            return {"message": f"You already have a leave application ({overlap.name}, {overlap.leave_type}, "
+                               f"{overlap.status}) from {overlap.from_date} to {overlap.to_date} that overlaps these dates."}
+
+        dates = f"{from_date} to {to_date}{' (half day)' if half_day else ''}"
+        if not confirmed:
+            reason = f"- **Reason**: {slots['reason']}\n" if slots.get("reason") else ""
+            return {
+                "message": f"**Leave application**\n\n"
+                           f"- **Type**: {allocation.leave_type}\n"
+                           f"- **Dates**: {dates}\n"
+                           f"- **Working days**: {days} (of {available} available)\n"
+                           f"{reason}\n"
+                           "Submit this application? (yes/no)",
+                "confirm": True,
+            }
+
+        try:
+            application = frappe.get_doc({
+                "doctype": "Leave Application",
+                "employee": employee["id"],
+                "employee_name": employee.get("name"),
+                "leave_type": allocation.leave_type,
+                "from_date": from_date.isoformat(),
+                "to_date": to_date.isoformat(),
+                "half_day": int(half_day),
+                "half_day_date": from_date.isoformat() if half_day else None,
+                "total_leave_days": days,
+                "description": slots.get("reason"),
+                "posting_date": today(),
+                "status": "Open",
+            }).insert()
+        except frappe.ValidationError as e:
+            return {"message": f"I couldn't create the application: {str(e)}", "done": True}
+        except Exception as e:
+            chat_logger.error(f"Leave Application Error: {str(e)}", "Chatbot Leave Application Error",
+                              employee=employee["id"])
+            return {"message": "Sorry, something went wrong while creating your leave application. Please try again later.",
+                    "done": True}
+
+        metrics.incr("leave_flow.created")
+        return {
+            "message": f"✅ **Leave application created** (draft, pending approval): {application.name}\n\n"
+                       f"- **Type**: {allocation.leave_type}\n"
+                       f"- **Dates**: {dates}\n"
+                       f"- **Working days**: {days} (of {available} available)\n\n"
+                       f"Your leave approver submits it once it is approved; follow it under "
+                       f"[Leave Application](/app/leave-application/{application.name}).",
+            "done": True,
+        }
+
+    @staticmethod
+    def find_overlap(employee_id, from_date, to_date):
+        """The first open/approved application of the employee overlapping the dates, if any"""
+        rows = frappe.db.sql(
+            """
+            select name, leave_type, from_date, to_date, status
+            from `tabLeave Application`
+            where employee = %(employee)s and docstatus < 2 and status in %(statuses)s
+                and from_date <= %(to_date)s and to_date >= %(from_date)s
+            limit 1
+            """,
+            {
+                "employee": employee_id,
+                "statuses": BLOCKING_STATUSES,
+                "from_date": from_date.isoformat(),
+                "to_date": to_date.isoformat(),
+            },
+            as_dict=True
+        )
+        return rows[0] if rows else None
+
+
+def on_holiday_list_change(doc, method=None):
+    # After commit, or a concurrent request could cache the old holidays again
+    key = f"{HOLIDAY_KEY}|{doc.name}"
+    frappe.db.after_commit.add(lambda: frappe.cache().delete_value(key))
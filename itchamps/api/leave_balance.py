@@ -0,0 +1,146 @@
+import frappe
+from frappe.utils import now_datetime
+
+SUMMARY_DOCTYPE = "Leave Balance Summary"
+
+# Allocations reconciled per query batch by the nightly job
+RECONCILE_BATCH_SIZE = 500
+
+
+class LeaveBalanceStore:
+    """
+    Maintains `Leave Balance Summary`: one row per submitted Leave Allocation
+    holding allocated / used / balance for that employee, leave type and period.
+
+    Each event recomputes only the affected allocation rows from the Leave
+    Ledger Entries of that one period, so writes stay bounded however long
+    the employee's history is, and chat reads are a primary key join.
+    """
+
+    @staticmethod
+    def refresh_allocation(allocation_name):
+        """Recompute (or drop) the summary row of one Leave Allocation"""
+        allocation = frappe.db.get_value(
+            "Leave Allocation", allocation_name,
+            ["name", "employee", "leave_type", "from_date", "to_date", "docstatus", "total_leaves_allocated"],
+            as_dict=True
+        )
+
+        if not allocation or allocation.docstatus != 1:
+            frappe.db.delete(SUMMARY_DOCTYPE, {"name": allocation_name})
+            return
+
+        LeaveBalanceStore._save(allocation, LeaveBalanceStore._aggregate(allocation))
+
+    @staticmethod
+    def refresh_for_application(application):
+        """Recompute every allocation period the application's dates fall into"""
+        allocations = frappe.get_all(
+            "Leave Allocation",
+            filters={
+                "employee": application.employee,
+                "leave_type": application.leave_type,
+                "docstatus": 1,
+                "from_date": ["<=", application.to_date],
+                "to_date": [">=", application.from_date]
+            },
+            pluck="name"
+        )
+        for allocation_name in allocations:
+            LeaveBalanceStore.refresh_allocation(allocation_name)
+
+    @staticmethod
+    def _aggregate(allocation):
+        """Allocated / used / balance from the ledger entries inside the allocation period"""
+        totals = frappe.db.sql(
+            """
+            select
+                sum(case when transaction_type = 'Leave Allocation' then leaves else 0 end) as allocated,
+                -sum(case when transaction_type = 'Leave Application' then leaves else 0 end) as used,
+                sum(leaves) as balance
+            from `tabLeave Ledger Entry`
+            where employee = %(employee)s
+                and leave_type = %(leave_type)s
+                and docstatus = 1
+                and from_date >= %(from_date)s
+                and to_date <= %(to_date)s
+            """,
+            allocation,
+            as_dict=True
+        )
+        totals = totals[0] if totals else frappe._dict()
+
+        allocated = totals.allocated if totals.allocated is not None else (allocation.total_leaves_allocated or 0)
+        used = totals.used or 0
+        balance = totals.balance if totals.balance is not None else allocated - used
+        return frappe._dict(allocated=allocated, used=used, balance=balance)
+
+    @staticmethod
+    def _save(allocation, totals):
+        values = {
+            "employee": allocation.employee,
+            "leave_type": allocation.leave_type,
+            "from_date": allocation.from_date,
+            "to_date": allocation.to_date,
+            "allocated": totals.allocated,
+            "used": totals.used,
+            "balance": totals.balance,
+            "last_reconciled": now_datetime()
+        }
+
+        if frappe.db.exists(SUMMARY_DOCTYPE, allocation.name):
+            frappe.db.set_value(SUMMARY_DOCTYPE, allocation.name, values, update_modified=False)
+        else:
+            frappe.get_doc(dict(values, doctype=SUMMARY_DOCTYPE, leave_allocation=allocation.name)).insert(
+                ignore_permissions=True
+            )
+
+    @staticmethod
+    def reconcile(active_only=True):
+        """
+        Recompute summary rows from the ledger and drop orphans.
+
+        Args:
+            active_only (bool): Only allocations whose period has not ended
+        """
+        filters = {"docstatus": 1}
+        if active_only:
+            filters["to_date"] = [">=", frappe.utils.today()]
+
+        start = 0
+        while True:
+            names = frappe.get_all(
+                "Leave Allocation", filters=filters, pluck="name",
+                order_by="name asc", start=start, page_length=RECONCILE_BATCH_SIZE
+            )
+            for name in names:
+                LeaveBalanceStore.refresh_allocation(name)
+            frappe.db.commit()
+
+            if len(names) < RECONCILE_BATCH_SIZE:
+                break
+            start += RECONCILE_BATCH_SIZE
+
+        # Rows whose allocation was cancelled or deleted outside doc events
+        frappe.db.sql(
+            f"""
+            delete bal from `tab{SUMMARY_DOCTYPE}` bal
+            left join `tabLeave Allocation` alloc
+                on alloc.name = bal.leave_allocation and alloc.docstatus = 1
+            where alloc.name is null
+            """
+        )
+        frappe.db.commit()
+
+
+def on_allocation_change(doc, method=None):
+    LeaveBalanceStore.refresh_allocation(doc.name)
+
+
+def on_application_change(doc, method=None):
+    LeaveBalanceStore.refresh_for_application(doc)
+
+
+def reconcile_leave_balances():
+    """Nightly scheduler job (see hooks.scheduler_events)"""
+    LeaveBalanceStore.reconcile(active_only=True)
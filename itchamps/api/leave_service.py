@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+import frappe
+from itchamps.api import metrics
+
+PENDING_STATUSES = ("Open", "Pending", "Submitted")
+
+DEFAULT_ALLOCATION_LIMIT = 20
+DEFAULT_PENDING_LIMIT = 20
+DEFAULT_RECENT_LIMIT = 5
+
+
+@dataclass
+class LeaveAllocation:
+    leave_type: str
+    total: float
+    remaining: float
+    from_date: object = None
+    to_date: object = None
+
+    @property
+    def used(self):
+        return self.total - self.remaining
+
+
+@dataclass
+class LeaveApplication:
+    name: str
+    leave_type: str
+    from_date: object
+    to_date: object
+    days: float
+    status: Optional[str] = None
+    posting_date: object = None
+
+
+@dataclass
+class LeaveSummary:
+    """Everything the chatbot shows about an employee's leaves"""
+    employee: str
+    allocations: List[LeaveAllocation] = field(default_factory=list)
+    pending: List[LeaveApplication] = field(default_factory=list)
+    recent: List[LeaveApplication] = field(default_factory=list)
+
+    def to_dict(self):
+        data = asdict(self)
+        for allocation, row in zip(self.allocations, data["allocations"]):
+            row["used"] = allocation.used
+        return data
+
+
+class LeaveService:
+    """
+    Fetches allocations, pending and recent applications for an employee
+    in a single UNION ALL round trip with a LIMIT on every branch.
+    Balances come from the materialised Leave Balance Summary (a primary
+    key join); allocations without a summary row yet count as unused.
+    Shared by the rule handler and the get_leave_balance LLM tool.
+    prefetch() does the same for many employees at once.
+    """
+
+    @staticmethod
+    def get_leave_summary(employee_id, include_pending=False, include_recent=False,
+            allocation_limit=DEFAULT_ALLOCATION_LIMIT, pending_limit=DEFAULT_PENDING_LIMIT,
+            recent_limit=DEFAULT_RECENT_LIMIT):
+        """
+        Args:
+            employee_id (str): Employee ID
+            include_pending (bool): Also fetch open applications
+            include_recent (bool): Also fetch recent approved applications
+
+        Returns:
+            LeaveSummary
+        """
+        memo = getattr(frappe.local, "itchamps_leave_summaries", None)
+        memo_key = (employee_id, include_pending, include_recent)
+        if memo and memo_key in memo and (allocation_limit, pending_limit, recent_limit) == (
+                DEFAULT_ALLOCATION_LIMIT, DEFAULT_PENDING_LIMIT, DEFAULT_RECENT_LIMIT):
+            return memo[memo_key]
+
+        # Every branch selects the same columns; derived tables keep per-branch ORDER BY/LIMIT
+        branches = ["""
+            select * from (
+                select 'allocation' as kind, alloc.name, alloc.leave_type, alloc.from_date, alloc.to_date,
+                    coalesce(bal.allocated, alloc.total_leaves_allocated) as days, bal.balance as balance,
+                    null as status, null as posting_date
+                from `tabLeave Allocation` alloc
+                left join `tabLeave Balance Summary` bal on bal.name = alloc.name
+                where alloc.employee = %(employee)s and alloc.docstatus = 1
+                order by alloc.to_date desc
+                limit %(allocation_limit)s
+            ) allocations
+        """]
+
+        if include_pending:
+            branches.append("""
+                select * from (
+                    select 'pending' as kind, name, leave_type, from_date, to_date,
+                        total_leave_days as days, null as balance, status, posting_date
+                    from `tabLeave Application`
+                    where employee = %(employee)s and status in %(pending_statuses)s
+                    order by posting_date desc
+                    limit %(pending_limit)s
+                ) pending
+            """)
+
+        if include_recent:
+            branches.append("""
+                select * from (
+                    select 'recent' as kind, name, leave_type, from_date, to_date,
+                        total_leave_days as days, null as balance, status, posting_date
+                    from `tabLeave Application`
+                    where employee = %(employee)s and docstatus = 1
+                    order by from_date desc
+                    limit %(recent_limit)s
+                ) recent
+            """)
+
+        with metrics.stage("db.leave_summary"):
+            rows = frappe.db.sql(
+                " union all ".join(branches),
+                {
+                    "employee": employee_id,
+                    "pending_statuses": PENDING_STATUSES,
+                    "allocation_limit": allocation_limit,
+                    "pending_limit": pending_limit,
+                    "recent_limit": recent_limit
+                },
+                as_dict=True
+            )
+
+        return LeaveService._to_summary(employee_id, rows)
+
+    @staticmethod
+    def prefetch(employee_ids, include_pending=False, include_recent=False):
+        """
+        Load the summaries of many employees in one round trip and memoise them
+        for this request, so later get_leave_summary calls (default limits, same
+        flags) need no query. Used by the batch API.
+        """
+        employee_ids = sorted({e for e in employee_ids if e})
+        if not employee_ids:
+            return
+
+        branches = ["""
+            select * from (
+                select 'allocation' as kind, alloc.employee, alloc.name, alloc.leave_type, alloc.from_date,
+                    alloc.to_date, coalesce(bal.allocated, alloc.total_leaves_allocated) as days,
+                    bal.balance as balance, null as status, null as posting_date,
+                    row_number() over (partition by alloc.employee order by alloc.to_date desc) as rank_no
+                from `tabLeave Allocation` alloc
+                left join `tabLeave Balance Summary` bal on bal.name = alloc.name
+                where alloc.employee in %(employees)s and alloc.docstatus = 1
+            ) allocations
+            where rank_no <= %(allocation_limit)s
+        """]
+
+        if include_pending:
+            branches.append("""
+                select * from (
+                    select 'pending' as kind, employee, name, leave_type, from_date, to_date,
+                        total_leave_days as days, null as balance, status, posting_date,
+                        row_number() over (partition by employee order by posting_date desc) as rank_no
+                    from `tabLeave Application`
+                    where employee in %(employees)s and status in %(pending_statuses)s
+                ) pending
+                where rank_no <= %(pending_limit)s
+            """)
+
+        if include_recent:
+            branches.append("""
+                select * from (
+                    select 'recent' as kind, employee, name, leave_type, from_date, to_date,
+                        total_leave_days as days, null as balance, status, posting_date,
+                        row_number() over (partition by employee order by from_date desc) as rank_no
+                    from `tabLeave Application`
+                    where employee in %(employees)s and docstatus = 1
+                ) recent
+                where rank_no <= %(recent_limit)s
+            """)
+
+        with metrics.stage("db.leave_summary"):
+            rows = frappe.db.sql(
+                " union all ".join(branches),
+                {
+                    "employees": tuple(employee_ids),
+                    "pending_statuses": PENDING_STATUSES,
+                    "allocation_limit": DEFAULT_ALLOCATION_LIMIT,
+                    "pending_limit": DEFAULT_PENDING_LIMIT,
+                    "recent_limit": DEFAULT_RECENT_LIMIT
+                },
+                as_dict=True
+            )
+
+        rows_by_employee = {employee_id: [] for employee_id in employee_ids}
+        for row in rows:
+            rows_by_employee[row.employee].append(row)
+
+        if not hasattr(frappe.local, "itchamps_leave_summaries"):
+            frappe.local.itchamps_leave_summaries = {}
+        for employee_id, employee_rows in rows_by_employee.items():
+            frappe.local.itchamps_leave_summaries[(employee_id, include_pending, include_recent)] = \
+                LeaveService._to_summary(employee_id, employee_rows)
+
+    @staticmethod
+    def _to_summary(employee_id, rows):
+        summary = LeaveSummary(employee=employee_id)
+
+        for row in rows:
+            if row.kind == "allocation":
+                total = row.days or 0
+                summary.allocations.append(LeaveAllocation(
+                    leave_type=row.leave_type,
+                    total=total,
+                    remaining=row.balance if row.balance is not None else total,
+                    from_date=row.from_date,
+                    to_date=row.to_date
+                ))
+            else:
+                application = LeaveApplication(
+                    name=row.name,
+                    leave_type=row.leave_type,
+                    from_date=row.from_date,
+                    to_date=row.to_date,
+                    days=row.days,
+                    status=row.status,
+                    posting_date=row.posting_date
+                )
+                (summary.pending if row.kind == "pending" else summary.recent).append(application)
+
+        # UNION ALL does not guarantee branch order, so sort here
+        summary.allocations.sort(key=lambda a: (a.leave_type or "", str(a.from_date)))
+        summary.pending.sort(key=lambda a: str(a.posting_date), reverse=True)
+        summary.recent.sort(key=lambda a: str(a.from_date), reverse=True)
+        return summary
@@ -0,0 +1,154 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import frappe
+from itchamps.api import metrics
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+
+METRIC = "llm_cache"
+
+# Words that do not change what a generic question is asking for
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "please", "pls", "plz", "kindly", "can", "could", "would",
+    "you", "u", "me", "i", "hi", "hello", "hey", "just", "tell", "to", "is", "are",
+    "do", "does", "so", "um", "uh", "thanks", "thank", "ok", "okay"
+})
+
+_NON_WORD = re.compile(r"[^a-z0-9\s]")
+
+
+def fingerprint(message):
+    """
+    Normalise a message so near-identical questions share a cache key.
+
+    Lower-cases, strips punctuation and filler words and folds simple
+    plurals ("How do I apply for leaves?" == "how apply for leave"). Word
+    order is kept: "convert sick leave to casual leave" asks the opposite
+    of "convert casual leave to sick leave".
+    """
+    words = _NON_WORD.sub(" ", (message or "").lower()).split()
+    tokens = []
+    for word in words:
+        if word in FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+
+    return hashlib.sha1(" ".join(tokens).encode()).hexdigest()
+
+
+def role_class(role_set):
+    """Coarse role bucket: answers are only shared between users of the same class"""
+    if role_set is None:
+        return "user"
+    if role_set.is_admin:
+        return "admin"
+    if role_set.is_hr:
+        return "hr"
+    if role_set.is_manager:
+        return "manager"
+    if role_set.is_employee:
+        return "employee"
+    return "user"
+
+
+class LLMCache:
+    """
+    Per-worker LRU cache of generic LLM answers.
+
+    Only answers that did not use tools (and so contain no user data) are
+    stored. Entries expire after a TTL and the cache is bounded both by
+    entry count and by total answer size; the least recently used entries
+    are evicted first.
+    """
+
+    _entries = OrderedDict()    # key -> (expires_at, answer)
+    _bytes = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def is_enabled():
+        return bool(frappe.conf.get("chatbot_llm_cache_enabled", 1))
+
+    @staticmethod
+    def make_key(message, role_set):
+        return (frappe.local.site, role_class(role_set), fingerprint(message))
+
+    @classmethod
+    def get(cls, key):
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry and entry[0] > now:
+                cls._entries.move_to_end(key)
+                answer = entry[1]
+            else:
+                if entry:
+                    cls._remove(key)
+                answer = None
+
+        metrics.incr(f"{METRIC}.hit" if answer is not None else f"{METRIC}.miss")
+        return answer
+
+    @classmethod
+    def set(cls, key, answer):
+        size = len(answer.encode())
+        max_bytes = frappe.conf.get("chatbot_llm_cache_max_bytes") or DEFAULT_MAX_BYTES
+        max_entries = frappe.conf.get("chatbot_llm_cache_max_entries") or DEFAULT_MAX_ENTRIES
+        ttl = frappe.conf.get("chatbot_llm_cache_ttl") or DEFAULT_TTL
+
+        if size > max_bytes:
+            return
+
+        evicted = 0
+        with cls._lock:
+            if key in cls._entries:
+                cls._remove(key)
+
+            cls._entries[key] = (time.monotonic() + ttl, answer)
+            cls._bytes += size
+
+            while len(cls._entries) > max_entries or cls._bytes > max_bytes:
+                cls._remove(next(iter(cls._entries)))
+                evicted += 1
+
+        if evicted:
+            metrics.incr(f"{METRIC}.eviction", evicted)
+
+    @classmethod
+    def _remove(cls, key):
+        # Caller holds the lock
+        _, answer = cls._entries.pop(key)
+        cls._bytes -= len(answer.encode())
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+            cls._bytes = 0
+
+    @staticmethod
+    def is_shareable(answer, context):
+        """
+        Answers that echo the user's identity (the system prompt includes it)
+        must not be served to other users.
+        """
+        if not answer or not context:
+            return False
+
+        user = context.get("user") or {}
+        employee = context.get("employee") or {}
+        identifiers = [
+            user.get("id"), user.get("email"), user.get("full_name"), user.get("first_name"),
+            employee.get("id"), employee.get("name")
+        ]
+
+        lowered = answer.lower()
+        return not any(i and str(i).lower() in lowered for i in identifiers)
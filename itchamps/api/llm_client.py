@@ -0,0 +1,77 @@
+import hashlib
+import threading
+
+import frappe
+from anthropic import Anthropic, DefaultHttpxClient
+from itchamps.api import chat_logger
+
+try:
+    # anthropic 1.x sends requests through httpx2 and rejects httpx objects
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE = 30      # seconds an idle connection is kept open
+DEFAULT_TIMEOUT = 60        # seconds per Anthropic request
+
+_http_client = None
+_clients = {}               # site -> (fingerprint, Anthropic)
+_lock = threading.Lock()
+
+
+def _get_http_client():
+    """One keep-alive connection pool per process, shared by every site"""
+    global _http_client
+    if _http_client is None:
+        pool_size = frappe.conf.get("chatbot_http_pool_size") or DEFAULT_POOL_SIZE
+        _http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=frappe.conf.get("chatbot_http_keepalive") or DEFAULT_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(frappe.conf.get("chatbot_llm_timeout") or DEFAULT_TIMEOUT, connect=5.0)
+        )
+    return _http_client
+
+
+def get_api_key():
+    return frappe.conf.get("anthropic_api_key") or frappe.db.get_value("Site Config", None, "anthropic_api_key")
+
+
+def get_client():
+    """
+    Return the Anthropic client for the current site.
+
+    Clients are cached per process and keyed by site; they are re-created
+    lazily when the site's API key (or base URL) changes. All clients share
+    one httpx connection pool so TLS connections are reused across messages.
+    """
+    api_key = get_api_key()
+    if not api_key:
+        chat_logger.warning("Anthropic API key not found in site config")
+        frappe.throw("Anthropic API Key is missing. Please add 'anthropic_api_key' to site config.")
+
+    site = frappe.local.site
+    base_url = frappe.conf.get("anthropic_base_url")
+    fingerprint = hashlib.sha256(f"{api_key}|{base_url}".encode()).hexdigest()
+
+    cached = _clients.get(site)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    with _lock:
+        cached = _clients.get(site)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        kwargs = {"api_key": api_key, "http_client": _get_http_client()}
+        if base_url:
+            kwargs["base_url"] = base_url
+
+        client = Anthropic(**kwargs)
+        _clients[site] = (fingerprint, client)
+
+    chat_logger.debug("Created Anthropic client", site=site)
+    return client
@@ -1,25 +1,38 @@
 import frappe
 import json
-from anthropic import Anthropic
-from itchamps.api.constants import UserRole
+from itchamps.api import chat_logger, llm_client, metrics
+from itchamps.api.constants import UserRole, RoleSet
+from itchamps.api.llm_cache import LLMCache, fingerprint, role_class
+from itchamps.api.rate_limiter import RateLimiter, RateLimited
+from itchamps.api.single_flight import SingleFlight
+from itchamps.api.prompt_builder import PromptBuilder
+from itchamps.api.response_templates import ResponseTemplates
+from itchamps.api.leave_service import LeaveService
+from itchamps.api.employee_search import EmployeeSearchIndex
+from itchamps.api.conversation_store import ConversationStore
+from itchamps.api.concurrency import run_concurrently
 
 # Force cache clear - 2025-12-10 16:48
 # This comment forces Python to recompile the module
 
+MODEL = "claude-3-haiku-20240307"
+
+# Tool round trips allowed per message before we stop and answer with what we have
+DEFAULT_MAX_TOOL_ROUNDS = 3
+
+# Seconds a single tool may run when several are executed concurrently
+DEFAULT_TOOL_TIMEOUT = 10
+
+BUSY_MESSAGE = "I'm handling a lot of questions right now. Please try again in {seconds} seconds."
+
+# Upstream statuses that mean "slow down" rather than "broken"
+BUSY_STATUS_CODES = (429, 529)
+
 class LLMService:
     @staticmethod
     def get_client():
-        api_key = frappe.conf.get("anthropic_api_key") or frappe.db.get_value("Site Config", None, "anthropic_api_key")
-        
-        # Debug Log
-        if not api_key:
-            frappe.log_error("LLMService: API Key NOT FOUND in conf or db", "LLM Debug")
-        else:
-            frappe.log_error(f"LLMService: API Key FOUND (starts with {api_key[:5]}...)", "LLM Debug")
-
-        if not api_key:
-            frappe.throw("Anthropic API Key is missing. Please add 'anthropic_api_key' to site config.")
-        return Anthropic(api_key=api_key)
+        """Pooled per-site client (see llm_client)"""
+        return llm_client.get_client()
 
     @staticmethod
     def get_tools():
@@ -52,7 +65,8 @@ class LLMService:
                 "input_schema": {
                     "type": "object",
                     "properties": {
-                        "keywords": {"type": "string", "description": "Search keywords like name, department, or designation"}
+                        "keywords": {"type": "string", "description": "Search keywords like name, department, or designation"},
+                        "page": {"type": "integer", "description": "Result page, starting at 1"}
                     },
                     "required": ["keywords"]
                 }
@@ -60,22 +74,21 @@ class LLMService:
         ]
 
     @staticmethod
-    def execute_tool(tool_name, tool_args, context):
+    def execute_tool(tool_name, tool_args, context, role_set=None):
         # Safely get employee and user info from context
         employee = context.get('employee') if context else None
         employee_id = employee.get('id') if employee else None
         user_id = context.get('user', {}).get('id') if context else None
+        if role_set is None:
+            role_set = RoleSet.from_context(context) if context else RoleSet.for_user(user_id)
         
         if tool_name == "get_leave_balance":
             # Use the verified employee_id from context/args
             target_emp = tool_args.get('employee_id', employee_id)
             if not target_emp: return "No employee record linked."
             
-            leaves = frappe.get_all("Leave Allocation", 
-                filters={"employee": target_emp, "docstatus": 1},
-                fields=["leave_type", "leave_balance", "total_leaves_allocated"]
-            )
-            return json.dumps(leaves, default=str)
+            summary = LeaveService.get_leave_summary(target_emp)
+            return json.dumps(summary.to_dict()["allocations"], default=str)
 
         elif tool_name == "get_employee_info":
             target_emp = tool_args.get('employee_id', employee_id)
@@ -93,93 +106,194 @@ class LLMService:
         elif tool_name == "search_other_employees":
             # Security Check
             allowed = [UserRole.ADMIN, UserRole.HR_MANAGER, UserRole.HR_USER, UserRole.MANAGER, UserRole.EMPLOYEE, UserRole.EMPLOYER]
-            if not any(UserRole.has_role(user_id, role) for role in allowed):
-                return "Access Denied: You do not have permission to search for other employees."
+            if not role_set.has_any(*allowed):
+                return ResponseTemplates.access_denied(role_class(role_set), "search_employees")
 
             query = tool_args.get('keywords', '')
-            employees = frappe.get_all("Employee",
-                filters={
-                    "status": "Active",
-                    "employee_name": ["like", f"%{query}%"]
-                },
-                fields=["employee_name", "department", "designation", "company_email"],
-                limit=5
-            )
-            return json.dumps(employees, default=str)
+            page = max(int(tool_args.get('page') or 1), 1)
+            total, employees = EmployeeSearchIndex.get().search(query, start=(page - 1) * 5, page_length=5)
+            return json.dumps({
+                "total": total,
+                "page": page,
+                "employees": [
+                    {f: emp.get(f) for f in ("employee_name", "department", "designation", "company_email")}
+                    for emp in employees
+                ]
+            }, default=str)
 
         return "Tool not found"
 
     @staticmethod
-    def process_message(user_message, context):
+    def execute_tools(tool_uses, context, role_set=None):
+        """
+        Execute every tool_use block of one assistant turn.
+
+        A single call runs inline; several calls run concurrently on the
+        shared thread pool with a per-tool timeout.
+
+        Returns:
+            list: tool_result content blocks, in the order of `tool_uses`
+        """
+        if len(tool_uses) == 1:
+            tool_use = tool_uses[0]
+            try:
+                with metrics.stage(f"tool.{tool_use.name}"):
+                    outcomes = [(True, LLMService.execute_tool(tool_use.name, tool_use.input, context, role_set))]
+            except Exception as e:
+                outcomes = [(False, e)]
+        else:
+            timeout = frappe.conf.get("chatbot_tool_timeout") or DEFAULT_TOOL_TIMEOUT
+            outcomes = run_concurrently(
+                [(LLMService.execute_tool, (t.name, t.input, context, role_set), None) for t in tool_uses],
+                timeout=timeout
+            )
+
+        results = []
+        for tool_use, (ok, result) in zip(tool_uses, outcomes):
+            block = {"type": "tool_result", "tool_use_id": tool_use.id, "content": str(result)}
+            if not ok:
+                chat_logger.error(f"Tool {tool_use.name} failed: {result}", "LLM Tool Error")
+                block["content"] = f"Tool error: {result}"
+                block["is_error"] = True
+            results.append(block)
+
+        return results
+
+    @staticmethod
+    def process_message(user_message, context, role_set=None, on_text=None, session_id=None, rate_limit_user=None):
         """
-        Main loop: User -> Claude -> [Tool Call] -> Tool Result -> Claude -> Response
+        Answer a message with Claude, serving generic answers from LLMCache.
+        Answers that used tools depend on user data and always bypass the cache.
+
+        If `on_text` is given, Claude's output is streamed and each text delta
+        is passed to it as soon as it arrives (cached answers are not streamed).
+
+        With a `session_id`, earlier turns of that chat session are sent along
+        (see ConversationStore) and this exchange is added to them.
+
+        Upstream calls are rate limited per user and per site (RateLimiter) and
+        coalesced with identical in-flight requests (SingleFlight); when a limit
+        trips, or Anthropic itself is overloaded, a "busy" answer is returned.
+        The call is charged to `rate_limit_user` if given (a batch charges its
+        caller), else to the message's user.
         """
         try:
-            client = LLMService.get_client()
-            tools = LLMService.get_tools()
-            
-            # System Prompt
-            user_name = context.get('user', {}).get('full_name', 'User') if context else 'User'
-            user_id = context.get('user', {}).get('id', 'unknown') if context else 'unknown'
-            employee = context.get('employee') if context else None
-            employee_id = employee.get('id') if employee else 'Not Linked'
-            
-            system_prompt = f"""You are a helpful HR Assistant for ITChamps.
-            Current User: {user_name} ({user_id})
-            Linked Employee ID: {employee_id}
-            
-            Use the available tools to answer queries about leaves, profiles, and employees.
-            If you cannot answer using a tool, politely explain why.
-            Do not make up data.
-            """
+            if role_set is None and context:
+                role_set = RoleSet.from_context(context)
 
-            messages = [{"role": "user", "content": user_message}]
+            user_id = (context or {}).get("user", {}).get("id")
+            conversation = ConversationStore.load(user_id, session_id) if session_id and user_id else None
+
+            # Follow-ups depend on earlier turns, so only a fresh conversation may share answers
+            cache_key = None
+            if LLMCache.is_enabled() and (conversation is None or conversation.is_empty):
+                cache_key = LLMCache.make_key(user_message, role_set)
+                cached = LLMCache.get(cache_key)
+                if cached is not None:
+                    if conversation is not None:
+                        ConversationStore.append(conversation, user_message, cached)
+                    return cached
 
-            # 1. First Call to Claude
-            response = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1024,
-                system=system_prompt,
-                messages=messages,
-                tools=tools
+            def call(on_private):
+                RateLimiter.check(rate_limit_user or user_id)
+                return LLMService._converse(user_message, context, role_set, on_text, conversation, on_private)
+
+            # Concurrent identical questions share one upstream call: across users for a
+            # fresh conversation (if the answer is shareable), else only within the session
+            if conversation is None or conversation.is_empty:
+                flight_key = f"{role_class(role_set)}|{fingerprint(user_message)}"
+            else:
+                flight_key = f"{user_id}|{session_id}|{fingerprint(user_message)}"
+            answer, used_tools = SingleFlight.run(
+                flight_key, user_id, call,
+                lambda answer, used_tools: not used_tools and LLMCache.is_shareable(answer, context)
             )
 
-            # 2. Check if Claude wants to use a tool
-            if response.stop_reason == "tool_use":
-                tool_use = next(block for block in response.content if block.type == "tool_use")
-                tool_name = tool_use.name
-                tool_inputs = tool_use.input
-                
-                # Execute Tool
-                tool_result = LLMService.execute_tool(tool_name, tool_inputs, context)
-                
-                # Append interaction to history
-                messages.append({"role": "assistant", "content": response.content})
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": tool_use.id,
-                            "content": str(tool_result)
-                        }
-                    ]
-                })
-                
-                # 3. Get Final Response with Data
-                final_response = client.messages.create(
-                    model="claude-3-haiku-20240307",
-                    max_tokens=1024,
+            if cache_key and not used_tools and LLMCache.is_shareable(answer, context):
+                LLMCache.set(cache_key, answer)
+
+            if conversation is not None:
+                ConversationStore.append(conversation, user_message, answer, LLMService.get_client())
+
+            return answer
+
+        except RateLimited as e:
+            return LLMService.busy_message(e.retry_after)
+
+        except Exception as e:
+            if getattr(e, "status_code", None) in BUSY_STATUS_CODES:
+                chat_logger.warning("Anthropic API busy", status_code=e.status_code)
+                return LLMService.busy_message()
+            chat_logger.error(f"LLM Service Error: {str(e)}", "LLM Service Error")
+            # Return a friendly fallback if API fails (e.g. key missing)
+            return f"I'm currently unable to access my AI brain (API Config Missing or Error). ({str(e)})"
+
+    @staticmethod
+    def busy_message(retry_after=None):
+        seconds = max(1, int(round(retry_after))) if retry_after else 10
+        return BUSY_MESSAGE.format(seconds=seconds)
+
+    @staticmethod
+    def _create_message(client, on_text=None, **kwargs):
+        """messages.create, or the streaming API when a text callback is given"""
+        if on_text is None:
+            return client.messages.create(**kwargs)
+
+        with client.messages.stream(**kwargs) as stream:
+            for text in stream.text_stream:
+                on_text(text)
+            return stream.get_final_message()
+
+    @staticmethod
+    def _converse(user_message, context, role_set, on_text=None, conversation=None, on_tool_use=None):
+        """
+        Main loop: User -> Claude -> [Tool Calls] -> Tool Results -> Claude -> ... -> Response
+        `on_tool_use` is called once, when Claude first asks for a tool.
+        Returns: (answer_text, used_tools)
+        """
+        client = LLMService.get_client()
+        tools = LLMService.get_tools()
+        
+        # System Prompt: cached static prefix (role guidance + tools) and a per-user tail
+        memo = conversation.memo if conversation else None
+        system_prompt = PromptBuilder.build_system(context, role_class(role_set), memo)
+        max_tokens = PromptBuilder.get_max_output_tokens()
+
+        if conversation:
+            messages = conversation.messages(user_message)
+        else:
+            messages = [{"role": "user", "content": user_message}]
+        max_rounds = frappe.conf.get("chatbot_llm_max_tool_rounds") or DEFAULT_MAX_TOOL_ROUNDS
+        used_tools = False
+
+        # Agent loop: keep answering tool calls until Claude replies with text
+        for tool_round in range(max_rounds + 1):
+            PromptBuilder.enforce_budget(system_prompt, tools, messages)
+            with metrics.stage("llm.call"):
+                response = LLMService._create_message(
+                    client, on_text,
+                    model=MODEL,
+                    max_tokens=max_tokens,
                     system=system_prompt,
                     messages=messages,
                     tools=tools
                 )
-                return final_response.content[0].text
-            
-            else:
-                return response.content[0].text
+            PromptBuilder.record_usage(getattr(response, "usage", None))
 
-        except Exception as e:
-            frappe.log_error(frappe.get_traceback(), "LLM Service Error")
-            # Return a friendly fallback if API fails (e.g. key missing)
-            return f"I'm currently unable to access my AI brain (API Config Missing or Error). ({str(e)})"
+            tool_uses = [block for block in response.content if block.type == "tool_use"]
+            if tool_uses and not used_tools and on_tool_use:
+                on_tool_use()
+            used_tools = used_tools or bool(tool_uses)
+            if response.stop_reason != "tool_use" or not tool_uses or tool_round == max_rounds:
+                break
+
+            # All tool calls of this turn run together, results go back in one request
+            messages.append({"role": "assistant", "content": response.content})
+            with metrics.stage("llm.tools"):
+                tool_results = LLMService.execute_tools(tool_uses, context, role_set)
+            messages.append({"role": "user", "content": tool_results})
+
+        answer = "".join(block.text for block in response.content if block.type == "text").strip()
+        if not answer:
+            answer = "I couldn't finish looking that up. Could you ask again in a more specific way?"
+        return answer, used_tools
@@ -0,0 +1,269 @@
+import bisect
+import random
+import time
+from contextlib import contextmanager
+
+import frappe
+
+# All chatbot counters live under one Redis namespace so they can be listed
+# and reset together without touching the rest of the site cache.
+METRICS_PREFIX = "itchamps_metrics"
+
+# Caches reporting `<name>.hit`, `<name>.miss` and `<name>.invalidation`
+CACHE_METRICS = ["context_cache", "response_cache", "llm_cache"]
+
+# Share of chat turns whose stages are timed (chatbot_metrics_sample_rate)
+DEFAULT_SAMPLE_RATE = 0.1
+
+# Upper bounds (seconds) of the latency histogram buckets, roughly log spaced
+LATENCY_BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60]
+
+HISTOGRAM_SERIES = "hist_series"
+
+
+def _key(name):
+    return frappe.cache().make_key(f"{METRICS_PREFIX}|{name}")
+
+
+def incr(name, amount=1):
+    """
+    Increment a site-wide counter.
+
+    Metrics must never break a chat turn, so Redis errors are swallowed.
+    """
+    try:
+        frappe.cache().incrby(_key(name), amount)
+    except Exception:
+        pass
+
+
+def observe(name, value):
+    """
+    Record one measurement (e.g. a latency in seconds) as `<name>.count` / `<name>.sum`.
+    """
+    try:
+        cache = frappe.cache()
+        cache.incrby(_key(f"{name}.count"), 1)
+        cache.incrbyfloat(_key(f"{name}.sum"), value)
+    except Exception:
+        pass
+
+
+def get_counters(*names):
+    """
+    Read several counters in one round trip.
+
+    Returns:
+        dict: {name: int}
+    """
+    if not names:
+        return {}
+
+    try:
+        values = frappe.cache().mget([_key(name) for name in names])
+    except Exception:
+        values = [None] * len(names)
+
+    return {name: int(value or 0) for name, value in zip(names, values)}
+
+
+def get_average(name):
+    """Mean of the values recorded with observe()"""
+    try:
+        count, total = frappe.cache().mget([_key(f"{name}.count"), _key(f"{name}.sum")])
+    except Exception:
+        count, total = None, None
+
+    count = int(count or 0)
+    return {"count": count, "avg": round(float(total or 0) / count, 4) if count else 0.0}
+
+
+def hit_ratio(prefix):
+    """Summarise the `<prefix>.hit` / `<prefix>.miss` counter pair"""
+    counters = get_counters(f"{prefix}.hit", f"{prefix}.miss")
+    hits = counters[f"{prefix}.hit"]
+    misses = counters[f"{prefix}.miss"]
+    total = hits + misses
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0
+    }
+
+
+class Trace:
+    """Stage timings of one sampled chat turn, flushed to Redis once at the end"""
+
+    __slots__ = ("intent", "stages")
+
+    def __init__(self):
+        self.intent = None
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+def start_trace():
+    """Begin timing the current request's chat turn; only a sample is timed"""
+    rate = frappe.conf.get("chatbot_metrics_sample_rate")
+    rate = DEFAULT_SAMPLE_RATE if rate is None else float(rate)
+    frappe.local.itchamps_trace = Trace() if random.random() < rate else None
+    return frappe.local.itchamps_trace
+
+
+def current_trace():
+    return getattr(frappe.local, "itchamps_trace", None)
+
+
+def set_intent(intent):
+    trace = current_trace()
+    if trace is not None:
+        trace.intent = intent
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block of the chat pipeline.
+    A no-op (one attribute lookup) when the request is not sampled.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+def flush_trace(response=None, request=None):
+    """
+    Add the finished trace to the per-intent histograms in one pipeline.
+    Runs as an `after_request` hook and at the end of background chat jobs.
+    """
+    trace = current_trace()
+    frappe.local.itchamps_trace = None
+    if not trace or not trace.stages:
+        return
+
+    intent = trace.intent or "none"
+    try:
+        pipe = frappe.cache().pipeline()
+        for name, seconds in trace.stages.items():
+            series = f"{intent}|{name}"
+            bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+            pipe.sadd(_key(HISTOGRAM_SERIES), series)
+            pipe.incrby(_key(f"hist|{series}|{bucket}"), 1)
+            pipe.incrby(_key(f"hist|{series}|count"), 1)
+            pipe.incrbyfloat(_key(f"hist|{series}|sum"), seconds)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def _percentile(buckets, count, q):
+    """Estimate a quantile from bucket counts, interpolating inside the bucket"""
+    target = q * count
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        if bucket_count and seen + bucket_count >= target:
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            return lower + (upper - lower) * (target - seen) / bucket_count
+        seen += bucket_count
+    return LATENCY_BUCKETS[-1]
+
+
+def get_histograms():
+    """
+    Returns:
+        dict: {(intent, stage): {"buckets": [count per bucket, +Inf last], "count": int, "sum": float}}
+    """
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.smembers(_key(HISTOGRAM_SERIES))
+    series = sorted(s.decode() if isinstance(s, bytes) else s for s in pipe.execute()[0])
+    if not series:
+        return {}
+
+    bucket_count = len(LATENCY_BUCKETS) + 1
+    keys = []
+    for name in series:
+        keys += [_key(f"hist|{name}|{bucket}") for bucket in range(bucket_count)]
+        keys += [_key(f"hist|{name}|count"), _key(f"hist|{name}|sum")]
+    values = cache.mget(keys)
+
+    histograms = {}
+    width = bucket_count + 2
+    for index, name in enumerate(series):
+        chunk = values[index * width:(index + 1) * width]
+        intent, _, stage_name = name.partition("|")
+        histograms[(intent, stage_name)] = {
+            "buckets": [int(v or 0) for v in chunk[:bucket_count]],
+            "count": int(chunk[bucket_count] or 0),
+            "sum": float(chunk[bucket_count + 1] or 0)
+        }
+    return histograms
+
+
+def _prometheus_text(histograms):
+    lines = [
+        "# HELP itchamps_chatbot_stage_seconds Time spent per chatbot pipeline stage",
+        "# TYPE itchamps_chatbot_stage_seconds histogram"
+    ]
+    for (intent, stage_name), hist in histograms.items():
+        labels = f'intent="{intent}",stage="{stage_name}"'
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + ["+Inf"], hist["buckets"]):
+            cumulative += bucket_count
+            lines.append(f'itchamps_chatbot_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"itchamps_chatbot_stage_seconds_sum{{{labels}}} {hist['sum']}")
+        lines.append(f"itchamps_chatbot_stage_seconds_count{{{labels}}} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+@frappe.whitelist()
+def get_latency_stats(format="json"):
+    """
+    Per-intent, per-stage latency percentiles of sampled chat turns (System Manager only).
+
+    Args:
+        format (str): "json", or "prometheus" for the text exposition format
+    """
+    frappe.only_for("System Manager")
+    histograms = get_histograms()
+
+    if format == "prometheus":
+        from werkzeug.wrappers import Response
+        return Response(_prometheus_text(histograms), mimetype="text/plain; version=0.0.4")
+
+    stats = {}
+    for (intent, stage_name), hist in histograms.items():
+        count = hist["count"]
+        stats.setdefault(intent, {})[stage_name] = {
+            "count": count,
+            "avg_ms": round(hist["sum"] / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(_percentile(hist["buckets"], count, 0.50) * 1000, 2) if count else 0.0,
+            "p95_ms": round(_percentile(hist["buckets"], count, 0.95) * 1000, 2) if count else 0.0,
+            "p99_ms": round(_percentile(hist["buckets"], count, 0.99) * 1000, 2) if count else 0.0
+        }
+    return stats
+
+
+@frappe.whitelist()
+def get_cache_stats():
+    """Hit ratios of all chatbot caches (System Manager only)"""
+    frappe.only_for("System Manager")
+
+    stats = {}
+    for name in CACHE_METRICS:
+        stats[name] = hit_ratio(name)
+        extra = get_counters(f"{name}.invalidation", f"{name}.eviction")
+        stats[name]["invalidations"] = extra[f"{name}.invalidation"]
+        stats[name]["evictions"] = extra[f"{name}.eviction"]
+    return stats
@@ -1,9 +1,18 @@
 import re
+from itchamps.api.intent_classifier import IntentClassifier, OTHER, get_margin, get_threshold
+from itchamps.api.entity_extractor import EntityExtractor
 
 class IntentParser:
     """
     Rule-based Natural Language Understanding (NLU) parser.
     Detects user intent using regex patterns and extracts simple entities.
+    Messages no pattern matches go to a local IntentClassifier before the
+    keyword heuristics, so paraphrases do not need a Claude call.
+    Bare greetings ("hi") and "help" are recognised first (see SMALL_TALK).
+
+    All intent patterns are compiled once into a single alternation with one
+    named group per pattern, so a message is scanned in one pass and every
+    intent is scored. Patterns are matched from the start of a word.
     """
 
     # Intent Definitions
@@ -17,7 +26,7 @@ class IntentParser:
         },
         "leave_apply": {
             "patterns": [
-                r"apply leave", r"request leave", r"take leave", 
+                r"apply (?:for )?(?:\w+ )?leave", r"request leave", r"take leave", 
                 r"book leave", r"want leave", r"need leave"
             ],
             "score": 1.0
@@ -32,16 +41,25 @@ class IntentParser:
         "manager_info": {
             "patterns": [
                 r"who is my manager", r"reporting manager", r"my boss", 
-                r"who do i report to", r"manager details"
+                r"who do i report to", r"manager details",
+                r"skip level", r"skip-level", r"manager's manager"
+            ],
+            "score": 1.0
+        },
+        "team_info": {
+            "patterns": [
+                r"direct reports", r"who reports to me", r"my team",
+                r"team size", r"my reportees"
             ],
             "score": 1.0
         },
         "employee_search": {
             "patterns": [
                 r"find employee", r"search employee", r"who works in", 
-                r"employee in", r"search for", r"find"
+                r"employee in", r"search for", r"find an employee", r"find a colleague",
+                r"find colleague", r"find someone", r"find a person", r"find people", r"find staff"
             ],
-            # Context-specific: Only if followed by employee-like terms, handled in code
+            # Context-specific: not when the message is about a document (see NOT_A_LOOKUP)
             "score": 0.8
         },
         "my_info": {
@@ -50,9 +68,50 @@ class IntentParser:
                 r"about me", r"employee id"
             ],
             "score": 1.0
+        },
+        "help": {
+            "patterns": [
+                r"what can you do", r"what can i do", r"what can i ask",
+                r"what can i access", r"what else can i see", r"how can you help"
+            ],
+            "score": 1.0
         }
     }
 
+    # Intents answered by looking up people (the user, their manager, team, colleagues)
+    LOOKUP_INTENTS = ("employee_search", "manager_info", "team_info", "my_info")
+
+    # Lookups about the user themselves; a paraphrase of one mentions the user
+    # ("who is john" is not asking for the user's manager)
+    SELF_INTENTS = ("manager_info", "team_info", "my_info")
+    FIRST_PERSON = re.compile(r"\b(?:i|me|my|mine|myself|im|i'm|i've)\b")
+
+    # Topics no lookup answers: "search for the expense policy", "can my manager
+    # see my salary", "my team outing budget" mention people but ask about these
+    NOT_A_LOOKUP = re.compile(
+        r"\b(?:polic(?:y|ies)|payslips?|salary slips?|handbook|guidelines?|forms?|documents?|procedures?"
+        r"|salary|salaries|bonus(?:es)?|budgets?|expenses?|outings?|perks?|remote(?:ly)?"
+        r"|ceo|founders?|chairman|president)\b"
+    )
+
+    # Whole messages that are only a greeting or a plea for help. Matched on
+    # the full text so "hi, what is the travel policy" still reaches Claude.
+    SMALL_TALK = re.compile(
+        r"^(?:(?P<greeting>hi|hello|hey|hiya|good (?:morning|afternoon|evening))(?: there)?"
+        r"|(?P<help>help|menu|commands))[\s!.?,]*$"
+    )
+
+    # Tie-break order when several intents score equally (most specific first)
+    PRIORITY = [
+        "leave_apply", "leave_history", "leave_balance",
+        "team_info", "manager_info", "my_info", "employee_search", "help"
+    ]
+
+    # Built by compile_patterns() / train_classifier() at import time
+    _matcher = None
+    _group_intents = {}
+    _classifier = None
+
     @classmethod
     def detect_intent(cls, message):
         """
@@ -60,16 +119,30 @@ class IntentParser:
         Returns: (intent_name, confidence_score)
         """
         message = message.lower().strip()
-        best_intent = None
-        best_score = 0.0
 
-        # Check explicit patterns
-        for intent, data in cls.INTENTS.items():
-            for pattern in data["patterns"]:
-                if re.search(pattern, message):
-                    # If match found, return immediately for now (simple first-match priority)
-                    # We could implement scoring if patterns overlap
-                    return intent, 1.0
+        small_talk = cls.SMALL_TALK.match(message)
+        if small_talk:
+            return small_talk.lastgroup, 1.0
+
+        # Check explicit patterns (single pass, all intents scored)
+        scores = cls.score_intents(message)
+        not_a_lookup = cls.NOT_A_LOOKUP.search(message)
+        if not_a_lookup:
+            for intent in cls.LOOKUP_INTENTS:
+                scores.pop(intent, None)
+        if scores:
+            best_intent = max(scores, key=lambda intent: (scores[intent], -cls._priority(intent)))
+            return best_intent, 1.0
+
+        # Paraphrases: nearest intent centroid, if similar enough.
+        # OTHER means "a question for Claude", which also overrides the heuristics below.
+        intent, similarity, margin = cls._classifier.classify(message)
+        if intent and similarity >= get_threshold() and (intent == OTHER or margin >= get_margin()):
+            if intent == OTHER or (intent in cls.LOOKUP_INTENTS and not_a_lookup):
+                return None, 0.0
+            if intent in cls.SELF_INTENTS and not cls.FIRST_PERSON.search(message):
+                return None, 0.0
+            return intent, round(similarity, 2)
 
         # Fallback/Context Heuristics
         # If "leave" is mentioned but no specific action, default to 'leave_balance'
@@ -80,35 +153,64 @@ class IntentParser:
                  return "leave_balance", 0.6
         
         # If "manager" mentioned
-        if "manager" in message:
+        if "manager" in message and not not_a_lookup:
             return "manager_info", 0.8
 
         return None, 0.0
 
     @classmethod
-    def extract_entities(cls, message):
+    def compile_patterns(cls):
         """
-        Extract basic entities like dates, leave types, etc.
+        Compile every pattern of every intent into one regex.
+
+        Alternatives are anchored at a word start and ordered longest first,
+        so a single finditer pass reports leftmost-longest, non-overlapping
+        hits. Named groups (`<intent>__<n>`) map each hit back to its intent.
         """
-        message = message.lower()
-        entities = {}
-
-        # 1. Leave Type
-        leave_types = {
-            "casual": "Casual Leave",
-            "sick": "Sick Leave",
-            "privilege": "Privilege Leave",
-            "earned": "Privilege Leave"
-        }
-        for key, value in leave_types.items():
-            if key in message:
-                entities["leave_type"] = value
-                break
-
-        # 2. Dept (Basic)
-        departments = ["marketing", "sales", "hr", "it", "finance", "operations", "production"]
-        for dept in departments:
-            if dept in message:
-                entities["department"] = dept.capitalize()
-
-        return entities
+        alternatives = []
+        group_intents = {}
+        for intent, data in cls.INTENTS.items():
+            for index, pattern in enumerate(data["patterns"]):
+                group = f"{intent}__{index}"
+                group_intents[group] = intent
+                alternatives.append((len(pattern), f"(?P<{group}>{pattern})"))
+
+        alternatives.sort(key=lambda item: item[0], reverse=True)
+        cls._matcher = re.compile(r"\b(?:" + "|".join(alt for _, alt in alternatives) + ")")
+        cls._group_intents = group_intents
+
+    @classmethod
+    def train_classifier(cls):
+        """Train the fallback classifier from INTENTS and intent_phrases.json"""
+        cls._classifier = IntentClassifier.train(cls.INTENTS)
+
+    @classmethod
+    def score_intents(cls, message):
+        """
+        Score all intents against an already lower-cased message.
+        Returns: {intent_name: summed pattern score}
+        """
+        scores = {}
+        for match in cls._matcher.finditer(message):
+            intent = cls._group_intents[match.lastgroup]
+            scores[intent] = scores.get(intent, 0.0) + cls.INTENTS[intent]["score"]
+        return scores
+
+    @classmethod
+    def _priority(cls, intent):
+        try:
+            return cls.PRIORITY.index(intent)
+        except ValueError:
+            return len(cls.PRIORITY)
+
+    @classmethod
+    def extract_entities(cls, message, intent=None):
+        """
+        Extract dates, day counts, leave type, department and (for employee
+        search) employee names. See EntityExtractor.
+        """
+        return EntityExtractor.extract(message, intent)
+
+
+IntentParser.compile_patterns()
+IntentParser.train_classifier()
@@ -0,0 +1,132 @@
+import threading
+from collections import defaultdict
+
+import frappe
+from itchamps.api import change_feed
+from itchamps.api.employee_search import FEED
+
+ORG_FIELDS = ["name", "employee_name", "reports_to", "department", "designation", "company_email", "user_id"]
+
+
+class OrgChart:
+    """
+    In-process reporting graph: `reports_to` as parent links plus the
+    reverse adjacency lists.
+
+    Built once per worker and site, then kept current by replaying the same
+    Employee change feed as the search index, so manager, skip-level, direct
+    report and team size questions are dict lookups with no DB round trip.
+    Changes reach the feed only once committed (see change_feed.record), so
+    a refresh never reads a row that is still being written.
+    """
+
+    _charts = {}
+    _lock = threading.RLock()
+
+    def __init__(self):
+        self.generation = 0
+        self.info = {}                      # employee -> row dict
+        self.parent = {}                    # employee -> reports_to
+        self.children = defaultdict(set)    # employee -> direct reports
+        self._team_sizes = {}               # employee -> people below them, filled lazily
+
+    @classmethod
+    def get(cls):
+        """Chart for the current site, built or refreshed as needed"""
+        site = frappe.local.site
+        chart = cls._charts.get(site)
+
+        if chart is None:
+            with cls._lock:
+                chart = cls._charts.get(site)
+                if chart is None:
+                    chart = cls()
+                    chart.rebuild()
+                    cls._charts[site] = chart
+            return chart
+
+        chart.refresh()
+        return chart
+
+    def rebuild(self):
+        generation = change_feed.current_generation(FEED)
+        rows = frappe.get_all("Employee", filters={"status": "Active"}, fields=ORG_FIELDS, limit_page_length=0)
+
+        self.info, self.parent, self.children, self._team_sizes = {}, {}, defaultdict(set), {}
+        for row in rows:
+            self._add(row)
+        self.generation = generation
+
+    def refresh(self):
+        """Apply Employee changes recorded since this worker last looked"""
+        current, names = change_feed.changes_since(FEED, self.generation)
+        if names is not None and current == self.generation:
+            return
+
+        with self._lock:
+            if names is None:
+                self.rebuild()
+                return
+
+            rows = {}
+            if names:
+                rows = {
+                    row.name: row for row in frappe.get_all(
+                        "Employee",
+                        filters={"name": ["in", list(names)], "status": "Active"},
+                        fields=ORG_FIELDS
+                    )
+                }
+            for name in names:
+                self._remove(name)
+                if name in rows:
+                    self._add(rows[name])
+            self._team_sizes = {}
+            self.generation = current
+
+    def _add(self, row):
+        self.info[row.name] = row
+        if row.reports_to:
+            self.parent[row.name] = row.reports_to
+            self.children[row.reports_to].add(row.name)
+
+    def _remove(self, name):
+        # Direct reports keep pointing at `name`; they reattach if it comes back
+        manager = self.parent.pop(name, None)
+        if manager:
+            self.children[manager].discard(name)
+            if not self.children[manager]:
+                del self.children[manager]
+        self.info.pop(name, None)
+
+    def manager(self, employee_id):
+        """Row of the employee's reporting manager, or None"""
+        return self.info.get(self.parent.get(employee_id))
+
+    def skip_level(self, employee_id):
+        """Row of the manager's manager, or None"""
+        return self.manager(self.parent.get(employee_id))
+
+    def direct_reports(self, employee_id):
+        """Rows of active direct reports, sorted by name"""
+        reports = [self.info[name] for name in self.children.get(employee_id, ()) if name in self.info]
+        return sorted(reports, key=lambda row: row.employee_name or "")
+
+    def team_size(self, employee_id):
+        """Active employees anywhere below `employee_id` in the reporting tree"""
+        with self._lock:
+            if employee_id in self._team_sizes:
+                return self._team_sizes[employee_id]
+
+            # Iterative walk; `seen` guards against reports_to cycles in bad data
+            seen = {employee_id}
+            stack = [employee_id]
+            while stack:
+                for child in self.children.get(stack.pop(), ()):
+                    if child not in seen and child in self.info:
+                        seen.add(child)
+                        stack.append(child)
+
+            size = len(seen) - 1
+            self._team_sizes[employee_id] = size
+            return size
@@ -0,0 +1,182 @@
+import frappe
+from itchamps.api import chat_logger, metrics
+from itchamps.api.response_templates import ResponseTemplates
+
+# Sections kept when the token budget is tight, most important first.
+# Anything not listed (examples, templates) is only included if it fits.
+SECTION_PRIORITY = [
+    "Role Description",
+    "Permissions Matrix",
+    "Response Tone & Style",
+    "Training Notes",
+    "Access Denied Responses",
+    "Capabilities Overview Response",
+]
+
+BASE_INSTRUCTIONS = """You are a helpful HR Assistant for ITChamps.
+
+Use the available tools to answer queries about leaves, profiles, and employees.
+If you cannot answer using a tool, politely explain why.
+Do not make up data.
+"""
+
+DEFAULT_TOKEN_BUDGET = 8000       # input tokens per request
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+
+# Rough chars-per-token ratio for English markdown; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+_static_prefix_cache = {}
+
+
+class PromptBuilder:
+    """
+    Assembles the system prompt for Claude.
+
+    The system prompt is split into a static prefix (base instructions plus
+    role guidance, identical for every user of a role class) and a small
+    per-user block. The static prefix carries a prompt-caching breakpoint,
+    which also covers the tool schemas that precede it, so follow-up calls
+    and other users of the same role only pay for the per-user tail.
+    """
+
+    @staticmethod
+    def get_token_budget():
+        return frappe.conf.get("chatbot_llm_token_budget") or DEFAULT_TOKEN_BUDGET
+
+    @staticmethod
+    def get_max_output_tokens():
+        return frappe.conf.get("chatbot_llm_max_output_tokens") or DEFAULT_MAX_OUTPUT_TOKENS
+
+    @staticmethod
+    def static_prefix(role_class, budget):
+        """
+        Base instructions + as much role guidance as fits in `budget` tokens.
+        Deterministic for a given (role_class, budget) so the prefix stays cacheable.
+        """
+        key = (role_class, budget)
+        if key in _static_prefix_cache:
+            return _static_prefix_cache[key]
+
+        sections = ResponseTemplates.for_role(role_class).sections
+        ordered = [title for title in SECTION_PRIORITY if title in sections]
+        ordered += [title for title in sections if title not in ordered]
+
+        # Choose sections by priority, but keep them in file order
+        selected = set()
+        used = estimate_tokens(BASE_INSTRUCTIONS)
+        for title in ordered:
+            cost = estimate_tokens(sections[title])
+            if used + cost > budget:
+                continue
+            selected.add(title)
+            used += cost
+
+        parts = [BASE_INSTRUCTIONS, "# Role Guidance"]
+        parts += [text for title, text in sections.items() if title in selected]
+        prefix = "\n\n".join(parts)
+        _static_prefix_cache[key] = prefix
+        return prefix
+
+    @staticmethod
+    def build_system(context, role_class, memo=None):
+        """
+        Args:
+            memo (str, optional): Summary of earlier turns of this conversation
+
+        Returns:
+            list: system content blocks for messages.create
+        """
+        user = (context or {}).get("user") or {}
+        employee = (context or {}).get("employee") or {}
+
+        # Half the budget at most goes to the static prefix, the rest is for the conversation
+        prefix = PromptBuilder.static_prefix(role_class, PromptBuilder.get_token_budget() // 2)
+        user_block = (
+            f"Current User: {user.get('full_name', 'User')} ({user.get('id', 'unknown')})\n"
+            f"Linked Employee ID: {employee.get('id') or 'Not Linked'}"
+        )
+        if memo:
+            user_block += f"\n\nEarlier in this conversation (summary):\n{memo}"
+
+        return [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": user_block}
+        ]
+
+    @staticmethod
+    def estimate_request_tokens(system, tools, messages):
+        total = sum(estimate_tokens(block["text"]) for block in system)
+        total += estimate_tokens(frappe.as_json(tools))
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                total += estimate_tokens(content)
+                continue
+            for block in content:
+                if isinstance(block, dict):
+                    total += estimate_tokens(str(block.get("content") or block.get("text") or ""))
+                else:
+                    total += estimate_tokens(getattr(block, "text", None) or str(getattr(block, "input", "")))
+        return total
+
+    @staticmethod
+    def enforce_budget(system, tools, messages):
+        """
+        Trim the conversation in place until the request fits the token budget.
+        The largest tool results are shortened first, then the user's text.
+        """
+        budget = PromptBuilder.get_token_budget()
+        overflow = PromptBuilder.estimate_request_tokens(system, tools, messages) - budget
+        if overflow <= 0:
+            return
+
+        candidates = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                candidates.append((len(content), message, None))
+            else:
+                for block in content:
+                    if isinstance(block, dict) and block.get("type") == "tool_result":
+                        candidates.append((len(str(block["content"])), message, block))
+
+        # Tool results before user text, largest first
+        candidates.sort(key=lambda c: (c[2] is None, -c[0]))
+        for length, message, block in candidates:
+            if overflow <= 0:
+                break
+            keep = max(0, length - overflow * CHARS_PER_TOKEN)
+            if block is not None:
+                block["content"] = str(block["content"])[:keep] + "\n...[truncated]"
+            else:
+                message["content"] = message["content"][:keep] + "\n...[truncated]"
+            overflow -= (length - keep) // CHARS_PER_TOKEN
+
+        metrics.incr("llm.budget_trimmed")
+
+    @staticmethod
+    def record_usage(usage):
+        """Report cached vs uncached input tokens of one Anthropic call"""
+        if usage is None:
+            return
+
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        uncached = getattr(usage, "input_tokens", None) or 0
+        output = getattr(usage, "output_tokens", None) or 0
+
+        metrics.incr("llm.calls")
+        metrics.incr("llm.input_tokens.cache_read", cache_read)
+        metrics.incr("llm.input_tokens.cache_write", cache_write)
+        metrics.incr("llm.input_tokens.uncached", uncached)
+        metrics.incr("llm.output_tokens", output)
+
+        chat_logger.info(
+            "LLM call tokens", cache_read=cache_read, cache_write=cache_write, uncached=uncached, output=output
+        )
@@ -0,0 +1,106 @@
+import frappe
+from itchamps.api import metrics
+
+BUCKET_KEY = "itchamps_rate"
+
+# Burst size and sustained rate of LLM calls, per user and per site
+DEFAULT_USER_BURST = 5
+DEFAULT_USER_PER_MINUTE = 20
+DEFAULT_SITE_BURST = 50
+DEFAULT_SITE_PER_MINUTE = 300
+
+# Both buckets are checked and charged atomically: a call is only counted if
+# both have a token. Redis' own clock is used so workers never disagree.
+# KEYS: user bucket, site bucket
+# ARGV: user burst, user tokens/s, site burst, site tokens/s
+# Returns: {allowed (0/1), ms until a token is available}
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local state = {}
+
+for i = 1, 2 do
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    state[i] = tokens
+end
+
+local allowed = 0
+if wait == 0 then
+    allowed = 1
+end
+
+for i = 1, 2 do
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', state[i] - allowed, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(burst / rate) + 1)
+end
+
+return {allowed, math.ceil(wait * 1000)}
+"""
+
+_scripts = {}   # id(redis client) -> registered Script
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token buckets in Redis limiting LLM calls per user and per site.
+
+    A Redis failure never blocks a chat turn: the limiter then fails open.
+    """
+
+    @staticmethod
+    def is_enabled():
+        return bool(frappe.conf.get("chatbot_rate_limit_enabled", 1))
+
+    @staticmethod
+    def _script(cache):
+        script = _scripts.get(id(cache))
+        if script is None:
+            script = _scripts[id(cache)] = cache.register_script(TOKEN_BUCKET_LUA)
+        return script
+
+    @staticmethod
+    def check(user):
+        """
+        Take one token from the user's and the site's bucket.
+
+        Raises:
+            RateLimited: if either bucket is empty (nothing is charged then)
+        """
+        if not RateLimiter.is_enabled():
+            return
+
+        conf = frappe.conf
+        user_burst = conf.get("chatbot_rate_limit_user_burst") or DEFAULT_USER_BURST
+        user_rate = (conf.get("chatbot_rate_limit_user_per_minute") or DEFAULT_USER_PER_MINUTE) / 60
+        site_burst = conf.get("chatbot_rate_limit_site_burst") or DEFAULT_SITE_BURST
+        site_rate = (conf.get("chatbot_rate_limit_site_per_minute") or DEFAULT_SITE_PER_MINUTE) / 60
+
+        cache = frappe.cache()
+        try:
+            allowed, wait_ms = RateLimiter._script(cache)(
+                keys=[cache.make_key(f"{BUCKET_KEY}|{user}"), cache.make_key(f"{BUCKET_KEY}|*")],
+                args=[user_burst, user_rate, site_burst, site_rate]
+            )
+        except Exception:
+            return
+
+        if not int(allowed):
+            metrics.incr("rate_limit.rejected")
+            raise RateLimited(int(wait_ms) / 1000)
@@ -0,0 +1,112 @@
+import json
+import frappe
+from itchamps.api import metrics
+
+# Rendered answers are also bounded by a TTL in case a change bypasses doc events
+DEFAULT_TTL = 3600
+
+CACHE_KEY = "itchamps_response"
+VERSION_KEY = "itchamps_response_version"
+METRIC = "response_cache"
+
+# Bumped on any Employee change: manager names/designations leak into other
+# employees' answers, and Employee edits are rare enough to invalidate broadly
+GLOBAL_SCOPE = "*"
+
+
+class ResponseCache:
+    """
+    Cache of rendered rule-handler responses keyed by (intent, employee, entities).
+
+    Invalidation is version based: every entry stores the global and
+    per-employee versions it was rendered under, and doc events bump those
+    versions. A lookup fetches the entry and both versions in one MGET.
+    """
+
+    @staticmethod
+    def get_ttl():
+        return frappe.conf.get("chatbot_response_cache_ttl") or DEFAULT_TTL
+
+    @staticmethod
+    def _key(*parts):
+        return frappe.cache().make_key("|".join(str(p) for p in parts))
+
+    @staticmethod
+    def entity_key(entities):
+        """Stable string for a dict of extracted entities/flags"""
+        return json.dumps(entities or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+    @staticmethod
+    def get_or_render(intent, employee_id, entities, render):
+        """
+        Return the cached response or call `render()` and cache its result.
+
+        Args:
+            intent (str): Intent the response answers
+            employee_id (str): Employee the response is about
+            entities (dict): Anything else the rendered text depends on
+            render (callable): Returns the handler response dict
+
+        Returns:
+            dict: Handler response ({"message": ...})
+        """
+        cache = frappe.cache()
+        entry_key = ResponseCache._key(CACHE_KEY, intent, employee_id, ResponseCache.entity_key(entities))
+        version_keys = [
+            ResponseCache._key(VERSION_KEY, GLOBAL_SCOPE),
+            ResponseCache._key(VERSION_KEY, employee_id)
+        ]
+
+        try:
+            raw_entry, *raw_versions = cache.mget([entry_key] + version_keys)
+        except Exception:
+            return render()
+
+        versions = [int(v or 0) for v in raw_versions]
+        if raw_entry:
+            entry = json.loads(raw_entry)
+            if entry["versions"] == versions:
+                metrics.incr(f"{METRIC}.hit")
+                return entry["response"]
+
+        metrics.incr(f"{METRIC}.miss")
+        response = render()
+        try:
+            cache.set(
+                entry_key,
+                json.dumps({"versions": versions, "response": response}, default=str),
+                ex=ResponseCache.get_ttl()
+            )
+        except Exception:
+            pass
+
+        return response
+
+    @staticmethod
+    def invalidate(*employee_ids):
+        """
+        Invalidate all cached responses for the given employees ("*" for everyone).
+
+        Versions are bumped once the transaction commits; bumped earlier, a
+        concurrent reader could render pre-commit data under the new version.
+        """
+        keys = [ResponseCache._key(VERSION_KEY, employee_id) for employee_id in {e for e in employee_ids if e}]
+        if not keys:
+            return
+
+        def bump():
+            cache = frappe.cache()
+            for key in keys:
+                cache.incrby(key, 1)
+
+        frappe.db.after_commit.add(bump)
+        metrics.incr(f"{METRIC}.invalidation")
+
+
+def on_leave_change(doc, method=None):
+    """Leave Allocation / Leave Application changed"""
+    ResponseCache.invalidate(doc.get("employee"))
+
+
+def on_employee_change(doc, method=None):
+    ResponseCache.invalidate(GLOBAL_SCOPE)
@@ -0,0 +1,164 @@
+import os
+import re
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+# Role class (see llm_cache.role_class) -> guidance file in itchamps/prompts
+ROLE_PROMPT_FILES = {
+    "admin": "admin_prompts.md",
+    "hr": "hr_prompts.md",
+    "manager": "manager_prompts.md",
+    "employee": "employee_prompts.md",
+    "user": "employee_prompts.md",
+}
+DEFAULT_PROMPT_FILE = "employee_prompts.md"
+
+# Used when a role file has no template for the situation
+DEFAULT_ACCESS_DENIED = "⛔ **Access Denied**\n\nYou are not authorized to do this. You can only view your own profile."
+GREETING_QUESTIONS = 5
+
+# The question the greeting suggests for each rule intent; it only offers
+# the intents the user gets an answer for (see chatbot.available_intents)
+INTENT_QUESTIONS = {
+    "team_info": "Who is in my team?",
+    "employee_search": "Search employee John",
+    "leave_balance": "What is my leave balance?",
+    "leave_apply": "Apply leave for tomorrow",
+    "manager_info": "Who is my manager?",
+    "my_info": "Show my profile",
+    "leave_history": "Show my leave history",
+}
+
+_HEADING = re.compile(r"^## (.+)$", re.MULTILINE)
+_SUBHEADING = re.compile(r"^### (.+)$", re.MULTILINE)
+_CODE_BLOCK = re.compile(r"```[^\n]*\n(.*?)```", re.DOTALL)
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+def _title(heading):
+    """Heading text without its leading emoji"""
+    return re.sub(r"^[^\w]+", "", heading).strip()
+
+
+def _split_sections(markdown, heading=_HEADING):
+    """Split markdown into {title: text} on `## ` (or `### `) headings (emoji stripped)"""
+    sections = {}
+    matches = list(heading.finditer(markdown))
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(markdown)
+        sections[_title(match.group(1))] = markdown[match.start():end].strip().rstrip("-").strip()
+    return sections
+
+
+def _code_block(text):
+    match = _CODE_BLOCK.search(text or "")
+    return match.group(1).strip() if match else None
+
+
+def _slug(title):
+    """ "Attempt to Search Employees" -> "search_employees" """
+    title = re.sub(r"^attempt to\s+", "", title.lower())
+    return re.sub(r"\W+", "_", title).strip("_")
+
+
+class RoleTemplates:
+    """The parsed content of one role prompt file"""
+
+    __slots__ = ("sections", "capabilities", "access_denied")
+
+    def __init__(self, markdown):
+        self.sections = _split_sections(markdown)
+
+        self.capabilities = _code_block(self.sections.get("Capabilities Overview Response"))
+
+        # {"search_employees": "❌ Access Denied ...", "view_other_employees": ...}
+        self.access_denied = {
+            _slug(title): _code_block(text)
+            for title, text in _split_sections(self.sections.get("Access Denied Responses", ""), _SUBHEADING).items()
+            if _code_block(text)
+        }
+
+
+def _load_registry():
+    """Parse every role prompt file once, at import time"""
+    registry = {}
+    for filename in set(ROLE_PROMPT_FILES.values()):
+        try:
+            with open(os.path.join(PROMPTS_DIR, filename), encoding="utf-8") as f:
+                registry[filename] = RoleTemplates(f.read())
+        except OSError:
+            registry[filename] = RoleTemplates("")
+    return registry
+
+
+_REGISTRY = _load_registry()
+
+
+class ResponseTemplates:
+    """
+    Canned, role-scoped replies built from itchamps/prompts.
+
+    "What can you do" and access-denied answers come straight from the
+    role's prompt file with `{{placeholder}}` values filled in; greetings
+    suggest one question per intent the user can use. None of them need
+    Claude or the database.
+    """
+
+    @staticmethod
+    def for_role(role_class):
+        return _REGISTRY[ROLE_PROMPT_FILES.get(role_class, DEFAULT_PROMPT_FILE)]
+
+    @staticmethod
+    def render(template, values=None):
+        """Fill `{{placeholder}}`s from `values`; unknown or empty ones become N/A"""
+        values = values or {}
+        return _PLACEHOLDER.sub(lambda m: str(values.get(m.group(1)) or "N/A"), template)
+
+    @staticmethod
+    def greeting(intents, values=None):
+        """
+        A short hello with a sample question for each of the user's intents.
+
+        Args:
+            intents (iterable): Rule intents that answer the user, most useful first
+        """
+        questions = [INTENT_QUESTIONS[intent] for intent in intents if intent in INTENT_QUESTIONS][:GREETING_QUESTIONS]
+        text = "Hi **{{name}}**! I'm your HR Assistant."
+        if questions:
+            text += "\n\nYou can ask me things like:\n" + "\n".join(f'- "{q}"' for q in questions)
+        text += "\n\nSay **help** to see everything you can do."
+        return ResponseTemplates.render(text, values)
+
+    @staticmethod
+    def capabilities(role_class, values=None, intents=()):
+        """The role's capabilities overview, or the greeting (for `intents`) if its file has none"""
+        template = ResponseTemplates.for_role(role_class).capabilities
+        if not template:
+            return ResponseTemplates.greeting(intents, values)
+        return ResponseTemplates.render(template, values)
+
+    @staticmethod
+    def access_denied(role_class, kind, values=None):
+        """
+        Args:
+            kind (str): Slug of an "Access Denied Responses" subsection,
+                e.g. "search_employees" or "view_other_employees"
+        """
+        template = (
+            ResponseTemplates.for_role(role_class).access_denied.get(kind)
+            or _REGISTRY[DEFAULT_PROMPT_FILE].access_denied.get(kind)
+            or DEFAULT_ACCESS_DENIED
+        )
+        return ResponseTemplates.render(template, values)
+
+    @staticmethod
+    def values_for(user_name, employee=None):
+        """Placeholder values for the current user"""
+        employee = employee or {}
+        return {
+            "name": user_name,
+            "full_name": employee.get("name") or user_name,
+            "employee_id": employee.get("id"),
+            "department": employee.get("department"),
+            "designation": employee.get("designation"),
+        }
@@ -0,0 +1,137 @@
+import json
+import time
+import uuid
+
+import frappe
+from itchamps.api import metrics
+
+FLIGHT_KEY = "itchamps_flight"
+
+# Seconds a leader may hold a flight before followers stop waiting for it
+DEFAULT_LOCK_TTL = 60
+
+# Seconds a finished answer stays available to followers that are still polling
+RESULT_TTL = 10
+
+POLL_START = 0.05
+POLL_MAX = 0.25
+
+
+def _ignore():
+    """on_private when nobody follows the call"""
+
+
+class SingleFlight:
+    """
+    Coalesces identical LLM requests that are in flight at the same time,
+    across all workers of a site.
+
+    The first caller for a key (the leader) makes the upstream call and
+    publishes its answer in Redis; concurrent callers (followers) wait for
+    that answer instead of making their own call. Followers of another user
+    only take answers marked shareable; otherwise, or if the leader fails,
+    they make the call themselves. A leader that learns early that its answer
+    will be user-specific (e.g. it called a tool) says so right away, so
+    other users' followers stop waiting for it.
+    """
+
+    @staticmethod
+    def is_enabled():
+        return bool(frappe.conf.get("chatbot_single_flight_enabled", 1))
+
+    @staticmethod
+    def run(key, user, fn, is_shareable=None):
+        """
+        Args:
+            key (str): Identifies identical requests, e.g. role class + message fingerprint
+            user (str): Caller; its own answers are always reusable by itself
+            fn (callable): Makes the upstream call; returns (answer, used_tools).
+                Called with `on_private`, a function to call as soon as the
+                answer is known not to be shareable
+            is_shareable (callable): (answer, used_tools) -> bool, may other users get it
+
+        Returns:
+            tuple: (answer, used_tools) as returned by `fn`, possibly the leader's
+        """
+        if not key or not SingleFlight.is_enabled():
+            return fn(_ignore)
+
+        cache = frappe.cache()
+        lock_key = cache.make_key(f"{FLIGHT_KEY}|lock|{key}")
+        result_key = cache.make_key(f"{FLIGHT_KEY}|result|{key}")
+        private_key = cache.make_key(f"{FLIGHT_KEY}|private|{key}")
+        lock_ttl = frappe.conf.get("chatbot_single_flight_wait") or DEFAULT_LOCK_TTL
+        token = uuid.uuid4().hex
+
+        try:
+            leader = cache.set(lock_key, token, ex=lock_ttl, nx=True)
+        except Exception:
+            return fn(_ignore)
+
+        if leader:
+            return SingleFlight._lead(cache, (lock_key, result_key, private_key), token, user, fn, is_shareable, lock_ttl)
+
+        shared = SingleFlight._follow(cache, (lock_key, result_key, private_key), user, lock_ttl)
+        if shared is not None:
+            metrics.incr("single_flight.shared")
+            return shared
+        return fn(_ignore)
+
+    @staticmethod
+    def _lead(cache, keys, token, user, fn, is_shareable, lock_ttl):
+        lock_key, result_key, private_key = keys
+
+        def on_private():
+            try:
+                cache.set(private_key, user, ex=lock_ttl)
+            except Exception:
+                pass
+
+        result = None
+        try:
+            # An older flight's answer or marker must not reach our followers
+            cache.delete(result_key, private_key)
+            result = fn(on_private)
+            return result
+        finally:
+            try:
+                if result is not None:
+                    answer, used_tools = result
+                    payload = {
+                        "answer": answer,
+                        "used_tools": used_tools,
+                        "user": user,
+                        "shareable": bool(is_shareable and is_shareable(answer, used_tools)),
+                    }
+                    cache.set(result_key, json.dumps(payload), ex=RESULT_TTL)
+                if (cache.get(lock_key) or b"").decode() == token:
+                    cache.delete(lock_key)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _follow(cache, keys, user, timeout):
+        """The leader's (answer, used_tools) if usable by `user`, else None"""
+        lock_key, result_key, private_key = keys
+        deadline = time.monotonic() + timeout
+        delay = POLL_START
+
+        while time.monotonic() < deadline:
+            try:
+                payload, running, private_to = cache.mget([result_key, lock_key, private_key])
+            except Exception:
+                return None
+
+            if payload:
+                payload = json.loads(payload)
+                if payload["shareable"] or payload["user"] == user:
+                    return payload["answer"], payload["used_tools"]
+                return None
+            if not running or (private_to and private_to.decode() != user):
+                return None
+
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+        return None
+
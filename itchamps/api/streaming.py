@@ -0,0 +1,60 @@
+import time
+import frappe
+from itchamps.api import metrics
+
+# Realtime event the browser listens to (see public/js/chatbot.js)
+STREAM_EVENT = "itchamps_chatbot_stream"
+
+# Tokens are coalesced so we publish a few events per second, not one per token
+FLUSH_INTERVAL = 0.05
+FLUSH_CHARS = 64
+
+
+class StreamPublisher:
+    """
+    Pushes partial LLM output to the requesting user over Frappe realtime.
+
+    Used as the `on_text` callback of LLMService.process_message. Records
+    time-to-first-token (from `started`, default: construction) as the
+    `llm.ttft` metric.
+    """
+
+    def __init__(self, stream_id, user=None, started=None):
+        self.stream_id = stream_id
+        self.user = user or frappe.session.user
+        self.started = started or time.monotonic()
+        self.first_token_at = None
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = self.started
+
+    def __call__(self, text):
+        if not text:
+            return
+
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            metrics.observe("llm.ttft", now - self.started)
+
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if self._buffered_chars >= FLUSH_CHARS or now - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        self._publish({"delta": "".join(self._buffer)})
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    def finish(self):
+        self.flush()
+        self._publish({"done": 1})
+
+    def _publish(self, payload):
+        payload["stream_id"] = self.stream_id
+        frappe.publish_realtime(STREAM_EVENT, payload, user=self.user)
@@ -0,0 +1,74 @@
+from benchmarks import fake_frappe, seed
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+seed.seed_once(fake_frappe.get_db())
+
+from itchamps.api import employee_search  # noqa: E402
+from itchamps.api.employee_search import EmployeeSearchIndex  # noqa: E402
+from itchamps.api.org_chart import OrgChart  # noqa: E402
+
+
+def test_search_index_sees_changes_after_commit():
+    fake_frappe.reset_local()
+    index = EmployeeSearchIndex.get()
+    employee = frappe.get_doc("Employee", "HR-EMP-000005")
+
+    frappe.db.set_value("Employee", employee.name, "employee_name", "Zebedee Quimby")
+    employee_search.on_employee_change(employee)
+
+    # Not committed yet: nothing to replay, so no worker can skip past the change
+    assert EmployeeSearchIndex.get().search("zebedee")[0] == 0
+
+    frappe.db.commit()
+    total, rows = EmployeeSearchIndex.get().search("zebedee")
+    assert index is EmployeeSearchIndex.get()
+    assert (total, rows[0].name) == (1, employee.name)
+
+    frappe.db.set_value("Employee", employee.name, "employee_name", employee.employee_name)
+    employee_search.on_employee_change(employee)
+    frappe.db.commit()
+
+
+def test_org_chart_sees_changes_after_commit():
+    fake_frappe.reset_local()
+    employee = frappe.get_doc("Employee", "HR-EMP-000009")
+    assert OrgChart.get().manager(employee.name).name == "HR-EMP-000001"
+
+    frappe.db.set_value("Employee", employee.name, "reports_to", "HR-EMP-000002")
+    employee_search.on_employee_change(employee)
+    assert OrgChart.get().manager(employee.name).name == "HR-EMP-000001"
+
+    frappe.db.commit()
+    chart = OrgChart.get()
+    assert chart.manager(employee.name).name == "HR-EMP-000002"
+    assert employee.name in {row.name for row in chart.direct_reports("HR-EMP-000002")}
+    assert employee.name not in {row.name for row in chart.direct_reports("HR-EMP-000001")}
+
+    frappe.db.set_value("Employee", employee.name, "reports_to", "HR-EMP-000001")
+    employee_search.on_employee_change(employee)
+    frappe.db.commit()
+
+
+def test_caches_rebuild_after_the_generation_resets():
+    fake_frappe.reset_local()
+    employee = frappe.get_doc("Employee", "HR-EMP-000006")
+    for _ in range(3):
+        employee_search.on_employee_change(employee)
+    frappe.db.commit()
+    index, chart = EmployeeSearchIndex.get(), OrgChart.get()
+    assert index.generation >= 3
+
+    # Redis flushed: the counter restarts below what the workers have seen
+    fake_frappe.get_cache().flushall()
+    frappe.db.set_value("Employee", employee.name, {"employee_name": "Yolanda Xu", "reports_to": "HR-EMP-000002"})
+    employee_search.on_employee_change(employee)
+    frappe.db.commit()
+
+    assert EmployeeSearchIndex.get().search("yolanda")[0] == 1
+    assert OrgChart.get().manager(employee.name).name == "HR-EMP-000002"
+    assert (index.generation, chart.generation) == (1, 1)
+
+    frappe.db.set_value("Employee", employee.name, {"employee_name": employee.employee_name, "reports_to": employee.reports_to})
+    employee_search.on_employee_change(employee)
+    frappe.db.commit()
@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks import fake_frappe, seed
+from benchmarks.fake_anthropic import FakeAnthropicServer
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+seed.seed_once(fake_frappe.get_db())
+
+from itchamps.api.chat_batch import ChatBatch  # noqa: E402
+from itchamps.api.chatbot import get_response  # noqa: E402
+from itchamps.api.leave_application_flow import LeaveApplicationFlow  # noqa: E402
+from itchamps.api.llm_service import BUSY_MESSAGE  # noqa: E402
+
+USER = seed.user_for(3)
+
+
+@pytest.fixture(autouse=True)
+def fake_llm():
+    with FakeAnthropicServer(latency=0, jitter=0) as server:
+        conf = {
+            "anthropic_api_key": "sk-test",
+            "anthropic_base_url": server.base_url,
+            "chatbot_llm_cache_enabled": 0,
+            "chatbot_rate_limit_user_burst": 1,
+        }
+        frappe.conf.update(conf)
+        fake_frappe.reset_local(USER)
+        fake_frappe.get_cache().flushall()
+        yield server
+        for key in conf:
+            frappe.conf.pop(key)
+
+
+def test_batch_resumes_open_leave_application():
+    assert "Which type of leave" in get_response("I want to apply leave")["message"]
+
+    # No intent: answered by the open application, as get_response would
+    (response,) = ChatBatch(["because of a family function"]).run()
+    assert "Which type of leave" in response["message"]
+    assert LeaveApplicationFlow.load(USER)["reason"] == "of a family function"
+
+
+def test_batch_charges_every_llm_message(fake_llm):
+    frappe.conf["chatbot_rate_limit_user_burst"] = 2
+    messages = ["What is the remote work policy?", "How do I claim travel expenses?", "what is the dress code"]
+    responses = ChatBatch(messages).run()
+
+    # Each upstream call takes a token from the caller; the one over the limit is not sent
+    busy = BUSY_MESSAGE.split("{")[0]
+    assert sum(r["message"].startswith(busy) for r in responses) == 1
+    assert fake_llm.requests == 2
@@ -0,0 +1,36 @@
+import time
+
+from benchmarks import fake_frappe, seed
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+seed.seed_once(fake_frappe.get_db())
+
+from itchamps.api import chat_jobs  # noqa: E402
+from itchamps.api.chat_jobs import ChatJobs  # noqa: E402
+
+
+def test_slots_are_per_job_and_expire():
+    fake_frappe.reset_local()
+    frappe.conf.update({"chatbot_async_max_jobs_per_user": 2, "chatbot_async_job_timeout": 300})
+    try:
+        assert ChatJobs.reserve("a@example.com", "job-1")
+        assert ChatJobs.reserve("a@example.com", "job-2")
+        assert not ChatJobs.reserve("a@example.com", "job-3")
+
+        # Releasing twice (or a job that was rejected) never frees someone else's slot
+        ChatJobs.release("a@example.com", "job-1")
+        ChatJobs.release("a@example.com", "job-1")
+        assert ChatJobs.reserve("a@example.com", "job-4")
+        assert not ChatJobs.reserve("a@example.com", "job-5")
+
+        # A job that crashed without releasing stops counting after twice the timeout
+        ChatJobs.release("a@example.com", "job-4")
+        user_key = ChatJobs._key(chat_jobs.INFLIGHT_KEY, "a@example.com")
+        frappe.cache().zadd(user_key, {"crashed": time.time() - 601})
+        assert ChatJobs.reserve("a@example.com", "job-6")
+        assert frappe.cache().zcard(user_key) == 2
+    finally:
+        frappe.conf.pop("chatbot_async_max_jobs_per_user")
+        frappe.conf.pop("chatbot_async_job_timeout")
+        fake_frappe.get_cache().flushall()
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from benchmarks import fake_frappe, seed
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+seed.seed_once(fake_frappe.get_db())
+
+from itchamps.api.chatbot import route_intent  # noqa: E402
+from itchamps.api.constants import RoleSet  # noqa: E402
+from itchamps.api.leave_application_flow import LeaveApplicationFlow  # noqa: E402
+from itchamps.api.nlu import IntentParser  # noqa: E402
+
+# role class -> (seeded employee index or None, Frappe roles, heading of the help text)
+ROLES = {
+    "admin": (None, ["System Manager"], "**Admin Capabilities**"),
+    "hr": (97, ["HR Manager", "Employee"], "**HR Manager Capabilities**"),
+    "manager": (8, ["Manager", "Employee"], "**Your Access as a Manager**"),
+    "employee": (3, ["Employee"], "**Your Access as an Employee**"),
+}
+
+
+def user_for(role):
+    index = ROLES[role][0]
+    return seed.user_for(index) if index is not None else "Administrator"
+
+
+def ask(message, role):
+    index, roles, _ = ROLES[role]
+    user = user_for(role)
+    employee = None
+    if index is not None:
+        employee = {"id": f"HR-EMP-{index:06d}", "name": frappe.db.get_value("Employee", f"HR-EMP-{index:06d}", "employee_name")}
+    intent, confidence = IntentParser.detect_intent(message)
+    entities = IntentParser.extract_entities(message, intent)
+    return route_intent(intent, message, entities, user, "Asha", employee, RoleSet(user, roles), confidence)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    fake_frappe.reset_local()
+    fake_frappe.get_cache().flushall()
+
+
+@pytest.mark.parametrize("role", ROLES)
+def test_greeting_only_suggests_answered_questions(role):
+    greeting = ask("hello", role)["message"]
+    questions = re.findall(r'^- "([^"]+)"$', greeting, re.MULTILINE)
+    assert questions
+
+    for question in questions:
+        response = ask(question, role)
+        assert response is not None, question
+        assert "Access Denied" not in response["message"], question
+    LeaveApplicationFlow.clear(user_for(role))
+
+    can_search = role != "employee"
+    assert ('"Search employee John"' in greeting) == can_search
+    assert ('"Who is in my team?"' in greeting) == (role == "manager")
+
+
+@pytest.mark.parametrize("role", ROLES)
+def test_help_matches_the_role(role):
+    help_text = ask("what can you do?", role)["message"]
+    assert help_text.startswith(ROLES[role][2])
+    assert "{{" not in help_text
+
+    # Managers can look up colleagues, so their help must not say otherwise
+    assert ("❌ View other employees' data" in help_text) == (role == "employee")
@@ -0,0 +1,99 @@
+import datetime
+
+import pytest
+
+from benchmarks import fake_frappe, seed
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+seed.seed_once(fake_frappe.get_db())
+
+from itchamps.api.leave_application_flow import LeaveApplicationFlow  # noqa: E402
+
+USER = seed.user_for(5)
+EMPLOYEE_ID = "HR-EMP-000005"
+YEAR = datetime.date.today().year
+
+
+def day(month, day_of_month):
+    return str(datetime.date(YEAR, month, day_of_month))
+
+
+def applications():
+    return frappe.get_all("Leave Application", filters={"employee": EMPLOYEE_ID},
+                          fields=["leave_type", "from_date", "to_date", "description"])
+
+
+@pytest.fixture
+def employee():
+    fake_frappe.reset_local(USER)
+    fake_frappe.get_cache().flushall()
+    frappe.db.delete("Leave Application", {"employee": EMPLOYEE_ID})
+    return {"id": EMPLOYEE_ID, "name": frappe.db.get_value("Employee", EMPLOYEE_ID, "employee_name")}
+
+
+def test_slots_are_filled_over_several_turns(employee):
+    assert "Which type of leave" in LeaveApplicationFlow.start("I want to apply for leave", {}, USER, employee)["message"]
+    assert "For which dates" in LeaveApplicationFlow.resume("casual leave please", USER, employee)["message"]
+
+    response = LeaveApplicationFlow.resume(f"{day(3, 2)} because of a family function", USER, employee)
+    assert "Submit this application? (yes/no)" in response["message"]
+    assert not applications()
+
+    # Not an answer: routed as usual, the application stays open
+    assert LeaveApplicationFlow.resume("who is my manager", USER, employee) is None
+
+    assert "(draft, pending approval)" in LeaveApplicationFlow.resume("yes", USER, employee)["message"]
+    (application,) = applications()
+    assert (application.leave_type, application.from_date, application.to_date) == ("Casual Leave", day(3, 2), day(3, 2))
+    assert application.description == "of a family function"
+    assert LeaveApplicationFlow.load(USER) is None
+
+
+def test_reversed_dates_are_rejected(employee):
+    entities = {"leave_type": "Casual Leave", "from_date": day(3, 5), "to_date": day(3, 3)}
+    response = LeaveApplicationFlow.start("casual leave from the 5th to the 3rd", entities, USER, employee)
+    assert "before the start date" in response["message"]
+    assert LeaveApplicationFlow.load(USER) == {"leave_type": "Casual Leave"}
+
+
+def test_insufficient_balance(employee):
+    entities = {"leave_type": "Casual Leave", "from_date": day(2, 2), "to_date": day(3, 31)}
+    response = LeaveApplicationFlow.start("casual leave for february and march", entities, USER, employee)
+    assert "you only have" in response["message"]
+    assert not applications()
+
+
+def test_overlapping_application(employee):
+    frappe.get_doc({
+        "doctype": "Leave Application", "employee": EMPLOYEE_ID, "leave_type": "Sick Leave",
+        "from_date": day(3, 2), "to_date": day(3, 3), "total_leave_days": 2, "status": "Open",
+    }).insert()
+
+    entities = {"leave_type": "Casual Leave", "from_date": day(3, 3)}
+    response = LeaveApplicationFlow.start("casual leave on the 3rd", entities, USER, employee)
+    assert "overlaps" in response["message"]
+    assert len(applications()) == 1
+
+
+def test_no_abandons_the_application(employee):
+    entities = {"leave_type": "Casual Leave", "from_date": day(3, 2)}
+    assert "yes/no" in LeaveApplicationFlow.start("casual leave on the 2nd", entities, USER, employee)["message"]
+
+    assert "cancelled" in LeaveApplicationFlow.resume("no", USER, employee)["message"]
+    assert LeaveApplicationFlow.load(USER) is None
+    assert not applications()
+
+
+def test_classifier_guess_is_confirmed_first(employee):
+    entities = {"leave_type": "Sick Leave", "from_date": day(3, 2)}
+    response = LeaveApplicationFlow.start("I am sick today", entities, USER, employee, confidence=0.22)
+    assert response["message"] == "Do you want to apply for leave? (yes/no)"
+
+    # Anything but an answer drops the question
+    assert LeaveApplicationFlow.resume("what is the wifi password", USER, employee) is None
+    assert LeaveApplicationFlow.load(USER) is None
+
+    LeaveApplicationFlow.start("I am sick today", entities, USER, employee, confidence=0.22)
+    assert "Submit this application?" in LeaveApplicationFlow.resume("yes", USER, employee)["message"]
+    assert not applications()
@@ -1,17 +1,28 @@
+import re
+import timeit
+import datetime
 from itchamps.api.nlu import IntentParser
+from itchamps.api.entity_extractor import EntityExtractor
+from itchamps.api.response_templates import ResponseTemplates
 
-def test_intents():
-    test_phrases = [
-        "Show my leave balance",
-        "How many leaves do I have?",
-        "Who is my manager?",
-        "Find employee Nusrath",
-        "Search for hr department",
-        "Show my profile",
-        "I want to apply leave",
-        "Show my recent leaves"
-    ]
+test_phrases = [
+    "Show my leave balance",
+    "How many leaves do I have?",
+    "Who is my manager?",
+    "Find employee Nusrath",
+    "Search for hr department",
+    "Show my profile",
+    "I want to apply leave",
+    "Show my recent leaves",
+    "Who are my direct reports?"
+]
+
+expected_intents = [
+    "leave_balance", "leave_balance", "manager_info", "employee_search",
+    "employee_search", "my_info", "leave_apply", "leave_history", "team_info"
+]
 
+def test_intents():
     print(f"{'Phrase':<30} | {'Intent':<15} | {'Score'}")
     print("-" * 60)
     
@@ -23,5 +34,167 @@ def test_intents():
     print(IntentParser.extract_entities("Find employees in Marketing"))
     print(IntentParser.extract_entities("sick leave"))
 
+def test_intent_precedence():
+    for phrase, expected in zip(test_phrases, expected_intents):
+        assert IntentParser.detect_intent(phrase)[0] == expected, phrase
+
+    # Several intents match: every intent is scored, PRIORITY breaks ties
+    assert IntentParser.detect_intent("apply leave, then show my leave balance")[0] == "leave_apply"
+    # A pattern match, so the leave flow starts without "Do you want to apply for leave?"
+    assert IntentParser.detect_intent("Apply sick leave from 3rd to 5th next month") == ("leave_apply", 1.0)
+    scores = IntentParser.score_intents("who is my manager? also show my leave balance")
+    assert scores == {"manager_info": 1.0, "leave_balance": 1.0}
+
+    # "find" alone is not an employee search: these look for documents
+    for phrase in ("where can I find the leave policy", "how do i find my payslip",
+                   "can you find the expense policy", "search for the travel policy"):
+        assert IntentParser.detect_intent(phrase)[0] != "employee_search", phrase
+    assert IntentParser.detect_intent("find someone in sales")[0] == "employee_search"
+
+
+def test_classifier_tier():
+    # No pattern matches these: the local classifier routes them
+    assert IntentParser.detect_intent("How much PTO do I have left?")[0] == "leave_balance"
+    assert IntentParser.detect_intent("who is my supervisor")[0] == "manager_info"
+    assert IntentParser.detect_intent("how many people work under me")[0] == "team_info"
+
+    # Policy questions stay with the LLM even though they mention leave
+    assert IntentParser.detect_intent("Explain the maternity leave policy")[0] is None
+    assert IntentParser.detect_intent("What is the remote work policy?")[0] is None
+
+    # Hard negatives: close to an intent's wording, but that handler would answer something else
+    assert IntentParser.detect_intent("who is the CEO")[0] is None
+    assert IntentParser.detect_intent("who is john")[0] != "manager_info"
+    assert IntentParser.detect_intent("Is my leave approved?")[0] == "leave_history"
+    assert IntentParser.detect_intent("Can my manager see my salary?")[0] is None
+    assert IntentParser.detect_intent("tell me about my team outing budget")[0] is None
+
+
+# Paraphrases that are not in intent_phrases.json. The classifier's
+# DEFAULT_THRESHOLD and DEFAULT_MARGIN are calibrated on them.
+HELD_OUT = {
+    "leave_balance": [
+        "how much vacation do i have remaining", "what is my pto balance right now",
+        "do i still have sick days left", "how many days of annual leave remain", "what's left of my time off",
+    ],
+    "leave_apply": [
+        "i would like to take next friday off", "please book two days of vacation for me",
+        "i need a day off on monday", "put me down for leave on the 5th", "i want to request time off next week",
+    ],
+    "leave_history": [
+        "which leaves did i take last month", "show the time off i have already taken",
+        "did my vacation request get approved", "list my earlier leave requests",
+    ],
+    "manager_info": [
+        "who is my reporting manager", "who do i report into", "who's my supervisor",
+        "who is my direct manager", "what's my boss's name",
+    ],
+    "team_info": [
+        "who are the people reporting to me", "how many direct reports do i have",
+        "who is in my team", "how many people are in my team",
+    ],
+    "employee_search": [
+        "is there someone named omar in sales", "who is wei chen",
+        "get me the email of sara khan", "find the people in finance",
+    ],
+    "my_info": [
+        "what is my job title", "when did i join", "show my employee details", "which department do i belong to",
+    ],
+    "help": [
+        "what can this assistant help with", "what are you able to help me with",
+        "what sort of questions can you answer",
+    ],
+    # For Claude
+    None: [
+        "who is the chairman", "who is the hr head of the company", "can hr see my messages",
+        "what's the budget for the christmas party", "how do i get reimbursed for a team dinner",
+        "is my salary confidential", "does my manager know my bonus", "who runs the finance team here",
+        "can my team work remotely on fridays", "what perks does the team get", "where is the cafeteria",
+        "what is the wifi password", "how do i book a meeting room", "when is the next town hall",
+        "who is the president", "can i bring my dog to work", "what is the leave encashment policy",
+        "when do appraisals happen", "my laptop is broken", "what time does the office open",
+        "is there parking at the office",
+    ],
+}
+
+
+def test_classifier_calibration():
+    wrong, correct, positives = [], 0, 0
+    for expected, phrases in HELD_OUT.items():
+        for phrase in phrases:
+            intent = IntentParser.detect_intent(phrase)[0]
+            if intent is not None and intent != expected:
+                wrong.append((phrase, intent))
+            if expected is not None:
+                positives += 1
+                correct += intent == expected
+
+    # A wrong route gives a confident wrong answer; a missed one only costs a Claude call
+    assert not wrong
+    assert correct / positives >= 0.8
+
+
+def test_entity_extraction():
+    today = datetime.date(2025, 1, 15)
+    entities = EntityExtractor.extract("apply sick leave from 3rd to 5th next month", "leave_apply", today)
+    assert entities == {"from_date": "2025-02-03", "to_date": "2025-02-05", "leave_type": "Sick Leave"}
+
+    entities = EntityExtractor.extract("2 days casual leave from tomorrow", "leave_apply", today)
+    assert (entities["from_date"], entities["to_date"], entities["days"]) == ("2025-01-16", "2025-01-17", 2.0)
+
+    # Department acronyms only count in upper case
+    assert EntityExtractor.extract("who works in IT")["department"] == "Information Technology"
+    assert "department" not in EntityExtractor.extract("can you find it")
+
+
+def test_help_templates():
+    assert IntentParser.detect_intent("Hello!")[0] == "greeting"
+    assert IntentParser.detect_intent("what can you do?")[0] == "help"
+    assert IntentParser.detect_intent("what can this bot do")[0] == "help"
+    # Only bare greetings; a greeting with a question is still answered as the question
+    assert IntentParser.detect_intent("hi, what is the remote work policy?")[0] is None
+
+    values = {"name": "Asha"}
+    assert "Hi Asha!" in ResponseTemplates.capabilities("employee", values)
+    assert ResponseTemplates.capabilities("admin", values).startswith("**Admin Capabilities**")
+    assert "{{" not in ResponseTemplates.greeting(["employee_search", "leave_balance"], values)
+    # Roles without their own denial templates fall back to the employee ones
+    assert "not authorized to search" in ResponseTemplates.access_denied("hr", "search_employees")
+    assert ResponseTemplates.render("{{name}} / {{department}}", values) == "Asha / N/A"
+
+
+def _detect_intent_per_pattern(message):
+    """Previous implementation: one re.search per pattern, first hit wins"""
+    message = message.lower().strip()
+    for intent, data in IntentParser.INTENTS.items():
+        for pattern in data["patterns"]:
+            if re.search(pattern, message):
+                return intent, 1.0
+    return None, 0.0
+
+
+def benchmark_intents(number=20000):
+    """Micro-benchmark: compiled single-pass matcher vs per-pattern re.search"""
+    def per_pattern():
+        for phrase in test_phrases:
+            _detect_intent_per_pattern(phrase)
+
+    def compiled():
+        for phrase in test_phrases:
+            IntentParser.detect_intent(phrase)
+
+    # "cold" flushes the shared re cache first, as happens under mixed traffic
+    for label, purge in (("warm", False), ("cold", True)):
+        timings = []
+        for fn in (per_pattern, compiled):
+            run = (lambda fn=fn: (re.purge(), fn())) if purge else fn
+            timings.append(timeit.timeit(run, number=number))
+
+        old, new = timings
+        print(f"[{label}] per-pattern re.search : {old * 1e6 / number:8.1f} us / {len(test_phrases)} phrases")
+        print(f"[{label}] compiled single pass  : {new * 1e6 / number:8.1f} us / {len(test_phrases)} phrases")
+        print(f"[{label}] speedup               : {old / new:8.1f}x")
+
 if __name__ == "__main__":
     test_intents()
+    benchmark_intents()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from benchmarks import fake_frappe
+
+pytest.importorskip("lupa")     # the fake Redis runs the token bucket script with it
+
+frappe = fake_frappe.install({"chatbot_log_level": "warning"})
+fake_frappe.reset_local()
+
+from itchamps.api.rate_limiter import RateLimited, RateLimiter  # noqa: E402
+from itchamps.api.single_flight import SingleFlight  # noqa: E402
+
+LIMITS = {
+    "chatbot_rate_limit_enabled": 1,
+    "chatbot_rate_limit_user_burst": 2,
+    "chatbot_rate_limit_user_per_minute": 60,    # one token a second
+    "chatbot_rate_limit_site_burst": 3,
+    "chatbot_rate_limit_site_per_minute": 60,
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    fake_frappe.reset_local()
+    fake_frappe.get_cache().flushall()
+    frappe.conf.update(LIMITS)
+    yield
+    for key in LIMITS:
+        frappe.conf.pop(key)
+
+
+def retry_after(user):
+    """None if the call was allowed, else the advertised wait"""
+    try:
+        RateLimiter.check(user)
+    except RateLimited as e:
+        return e.retry_after
+
+
+def test_token_bucket_refills():
+    assert retry_after("a") is None
+    assert retry_after("a") is None
+    assert retry_after("a") == 1.0
+
+    # Half a token back: the wait shrinks accordingly, and a rejected call costs nothing
+    fake_frappe.advance_clock(0.5)
+    assert retry_after("a") == 0.5
+    fake_frappe.advance_clock(0.5)
+    assert retry_after("a") is None
+
+    # Never more than the burst, however long the user was idle
+    fake_frappe.advance_clock(60)
+    assert [retry_after("a") for _ in range(3)] == [None, None, 1.0]
+
+
+def test_site_bucket_is_shared():
+    assert retry_after("a") is None
+    assert retry_after("b") is None
+    assert retry_after("c") is None
+    # "d" has a full bucket of its own, but the site has none left
+    assert retry_after("d") == 1.0
+
+
+def run_flight(user, answer, shareable, started=None, release=None, private=False):
+    """SingleFlight.run on its own thread (a separate request); returns a dict filled in on exit"""
+    result = {"called": False}
+
+    def fn(on_private):
+        result["called"] = True
+        if private:
+            on_private()
+        if started:
+            started.set()
+            release.wait(5)
+        return answer, ["get_leave_balance"]
+
+    def target():
+        fake_frappe.reset_local(user)
+        result["value"] = SingleFlight.run("key", user, fn, lambda a, t: shareable)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    result["thread"] = thread
+    return result
+
+
+@pytest.mark.parametrize("shareable", [False, True])
+def test_single_flight_shares_only_shareable_answers(shareable):
+    started, release = threading.Event(), threading.Event()
+    leader = run_flight("a", "answer for a", shareable, started, release)
+    assert started.wait(5)
+
+    same_user = run_flight("a", "second call of a", shareable)
+    other_user = run_flight("b", "answer for b", shareable)
+    time.sleep(0.2)     # both are now waiting on the leader
+    release.set()
+    for flight in (leader, same_user, other_user):
+        flight["thread"].join(5)
+
+    assert leader["value"][0] == "answer for a"
+    assert same_user["value"][0] == "answer for a" and not same_user["called"]
+    # A per-user answer (e.g. from a leave balance tool) must never reach another user
+    if shareable:
+        assert other_user["value"][0] == "answer for a" and not other_user["called"]
+    else:
+        assert other_user["value"][0] == "answer for b" and other_user["called"]
+
+
+def test_other_users_stop_waiting_for_a_private_answer():
+    started, release = threading.Event(), threading.Event()
+    leader = run_flight("a", "answer for a", False, started, release, private=True)
+    assert started.wait(5)
+
+    same_user = run_flight("a", "second call of a", False)
+    other_user = run_flight("b", "answer for b", False)
+
+    # The leader said its answer is user-specific: "b" calls right away instead of waiting
+    other_user["thread"].join(2)
+    assert not other_user["thread"].is_alive()
+    assert other_user["value"][0] == "answer for b"
+    assert same_user["thread"].is_alive()
+
+    release.set()
+    for flight in (leader, same_user):
+        flight["thread"].join(5)
+    assert same_user["value"][0] == "answer for a" and not same_user["called"]
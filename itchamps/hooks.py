@@ -45,3 +45,97 @@ web_include_js = [
     f"/assets/itchamps/js/chatbot.js?v={app_version}",
     f"/assets/itchamps/js/hide_chat_on_login.js?v={app_version}"
 ]
+
+# Document Events
+# ---------------
+# Keep chatbot caches in sync with the records they are built from
+
+doc_events = {
+    "User": {
+        "on_update": "itchamps.api.context_cache.on_user_update",
+        "on_trash": [
+            "itchamps.api.context_cache.on_user_update",
+            "itchamps.api.employee_resolver.on_user_trash",
+        ],
+    },
+    "Employee": {
+        "on_update": [
+            "itchamps.api.employee_resolver.on_employee_change",
+            "itchamps.api.context_cache.on_employee_update",
+            "itchamps.api.response_cache.on_employee_change",
+            "itchamps.api.employee_search.on_employee_change",
+        ],
+        "on_trash": [
+            "itchamps.api.employee_resolver.on_employee_change",
+            "itchamps.api.context_cache.on_employee_update",
+            "itchamps.api.response_cache.on_employee_change",
+            "itchamps.api.employee_search.on_employee_change",
+        ],
+    },
+    "Has Role": {
+        "on_update": "itchamps.api.context_cache.on_has_role_update",
+        "on_trash": "itchamps.api.context_cache.on_has_role_update",
+    },
+    "Leave Type": {
+        "on_update": "itchamps.api.entity_extractor.on_vocabulary_change",
+        "on_trash": "itchamps.api.entity_extractor.on_vocabulary_change",
+    },
+    "Department": {
+        "on_update": "itchamps.api.entity_extractor.on_vocabulary_change",
+        "on_trash": "itchamps.api.entity_extractor.on_vocabulary_change",
+    },
+    "Holiday List": {
+        "on_update": "itchamps.api.leave_application_flow.on_holiday_list_change",
+        "on_trash": "itchamps.api.leave_application_flow.on_holiday_list_change",
+    },
+    "Leave Allocation": {
+        "on_update": "itchamps.api.response_cache.on_leave_change",
+        "on_submit": [
+            "itchamps.api.leave_balance.on_allocation_change",
+            "itchamps.api.response_cache.on_leave_change",
+        ],
+        "on_cancel": [
+            "itchamps.api.leave_balance.on_allocation_change",
+            "itchamps.api.response_cache.on_leave_change",
+        ],
+        "on_update_after_submit": [
+            "itchamps.api.leave_balance.on_allocation_change",
+            "itchamps.api.response_cache.on_leave_change",
+        ],
+        "on_trash": "itchamps.api.response_cache.on_leave_change",
+    },
+    "Leave Application": {
+        "on_update": "itchamps.api.response_cache.on_leave_change",
+        "on_submit": [
+            "itchamps.api.leave_balance.on_application_change",
+            "itchamps.api.response_cache.on_leave_change",
+        ],
+        "on_cancel": [
+            "itchamps.api.leave_balance.on_application_change",
+            "itchamps.api.response_cache.on_leave_change",
+        ],
+        "on_update_after_submit": "itchamps.api.response_cache.on_leave_change",
+        "on_trash": "itchamps.api.response_cache.on_leave_change",
+    },
+}
+
+# Scheduled Tasks
+# ---------------
+
+scheduler_events = {
+    "daily": [
+        "itchamps.api.leave_balance.reconcile_leave_balances",
+    ],
+    "all": [
+        "itchamps.api.chat_logger.drain_chat_logs",
+    ],
+}
+
+# Request Hooks
+# -------------
+# Sampled chatbot stage timings and buffered chatbot logs are written to Redis once per request
+
+after_request = [
+    "itchamps.api.metrics.flush_trace",
+    "itchamps.api.chat_logger.flush",
+]
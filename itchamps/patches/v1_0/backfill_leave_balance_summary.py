@@ -0,0 +1,6 @@
+from itchamps.api.leave_balance import LeaveBalanceStore
+
+
+def execute():
+    """Build Leave Balance Summary rows for every submitted allocation"""
+    LeaveBalanceStore.reconcile(active_only=False)
@@ -23,6 +23,67 @@
     ui.init();
     ui.resetMessages(); // Show initial welcome message
 
+    // One conversation per browser tab: the server remembers earlier turns of this session
+    const SESSION_KEY = 'itchamps_chatbot_session';
+    let sessionId = sessionStorage.getItem(SESSION_KEY);
+    if (!sessionId) {
+        sessionId = frappe.utils.get_random(16);
+        sessionStorage.setItem(SESSION_KEY, sessionId);
+    }
+
+    // Streaming: LLM answers arrive token by token over Frappe realtime (socket.io)
+    const STREAM_EVENT = 'itchamps_chatbot_stream';
+    const canStream = !!(frappe.realtime && frappe.realtime.on);
+    let activeStreamId = null;
+    let streamStarted = false;
+
+    if (canStream) {
+        frappe.realtime.on(STREAM_EVENT, (data) => {
+            if (!data || data.stream_id !== activeStreamId || !data.delta) return;
+
+            if (!streamStarted) {
+                streamStarted = true;
+                ui.hideLoading();
+                ui.startStreamingMessage();
+            }
+            ui.appendStreamingText(data.delta);
+        });
+    }
+
+    // Async mode: queued answers arrive as a realtime result event, with polling as fallback
+    const RESULT_EVENT = 'itchamps_chatbot_result';
+    const POLL_INTERVAL = 2000;
+    const pendingJobs = {};
+
+    if (canStream) {
+        frappe.realtime.on(RESULT_EVENT, (data) => {
+            const resolve = data && pendingJobs[data.job_id];
+            if (resolve) resolve(data.message);
+        });
+    }
+
+    function waitForJob(jobId) {
+        return new Promise((resolve) => {
+            const timer = setInterval(async () => {
+                const r = await frappe.call({
+                    method: 'itchamps.api.chat_jobs.get_job_result',
+                    args: { job_id: jobId }
+                });
+                const status = r.message?.status;
+                if (status === 'done' || status === 'failed' || status === 'unknown') {
+                    done(r.message.message);
+                }
+            }, POLL_INTERVAL);
+
+            function done(message) {
+                clearInterval(timer);
+                delete pendingJobs[jobId];
+                resolve(message);
+            }
+            pendingJobs[jobId] = done;
+        });
+    }
+
     // logic: Handle sending messages
     ui.onSend(async function (userMsg) {
         if (!userMsg) return;
@@ -33,22 +94,37 @@
         // 2. Show loading state
         ui.showLoading();
 
+        const streamId = canStream ? frappe.utils.get_random(12) : null;
+        activeStreamId = streamId;
+        streamStarted = false;
+
         try {
-            // 3. Call Backend API
+            // 3. Call Backend API (tokens may stream in via realtime meanwhile)
             const response = await frappe.call({
-                method: 'itchamps.api.chatbot.get_response',
-                args: { message: userMsg }
+                method: 'itchamps.api.chat_jobs.get_response_async',
+                args: { message: userMsg, stream_id: streamId, session_id: sessionId }
             });
 
+            // Queued on the server: wait for the job's result
+            let botMsg = response.message?.message;
+            if (response.message?.status === 'queued') {
+                botMsg = await waitForJob(response.message.job_id);
+            }
+
             // 4. Remove loading
             ui.hideLoading();
 
-            // 5. Display Bot Response
-            const botMsg = response.message?.message || "Sorry, I couldn't process that.";
-            ui.addBotMessage(botMsg);
+            // 5. Display Bot Response (the returned text is authoritative)
+            botMsg = botMsg || "Sorry, I couldn't process that.";
+            if (streamStarted) {
+                ui.finishStreamingMessage(botMsg);
+            } else {
+                ui.addBotMessage(botMsg);
+            }
 
         } catch (error) {
             ui.hideLoading();
+            if (streamStarted) ui.finishStreamingMessage();
             console.error('Chatbot API Error:', error);
 
             // Handle specific Frappe error structures if needed
@@ -61,6 +137,9 @@
             }
 
             ui.addErrorMessage(errorText);
+        } finally {
+            activeStreamId = null;
+            streamStarted = false;
         }
     });
 
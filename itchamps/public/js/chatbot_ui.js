@@ -184,6 +184,52 @@ window.ItChampsChatbotUI = class ItChampsChatbotUI {
         this.scrollToBottom();
     }
 
+    /**
+     * Streaming Rendering
+     * A bot bubble that grows as tokens arrive; markdown is re-rendered
+     * at most once per animation frame.
+     */
+    startStreamingMessage() {
+        this.finishStreamingMessage();
+        this.streaming = { text: '', frame: null };
+        this.appendMessageHTML(`
+            <div class="chat-msg bot">
+                <div class="msg-bubble" id="chatbotStreaming"></div>
+            </div>
+        `);
+        this.scrollToBottom();
+    }
+
+    appendStreamingText(delta) {
+        if (!this.streaming) this.startStreamingMessage();
+        this.streaming.text += delta;
+
+        if (this.streaming.frame) return;
+        this.streaming.frame = requestAnimationFrame(() => {
+            this.streaming.frame = null;
+            this.renderStreamingBubble(this.streaming.text);
+        });
+    }
+
+    finishStreamingMessage(finalText) {
+        if (!this.streaming) return;
+        if (this.streaming.frame) cancelAnimationFrame(this.streaming.frame);
+
+        const text = finalText !== undefined ? finalText : this.streaming.text;
+        this.renderStreamingBubble(text);
+
+        const bubble = document.getElementById('chatbotStreaming');
+        if (bubble) bubble.removeAttribute('id');
+        this.streaming = null;
+    }
+
+    renderStreamingBubble(text) {
+        const bubble = document.getElementById('chatbotStreaming');
+        if (!bubble) return;
+        bubble.innerHTML = this.parseMarkdown(text);
+        this.scrollToBottom();
+    }
+
     showLoading() {
         this.appendMessageHTML(`
             <div class="chat-msg bot" id="chatbotLoading">